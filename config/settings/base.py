@@ -100,10 +100,12 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 # Cache :
 # https://docs.djangoproject.com/en/4.2/topics/cache/
 
+REDIS_URL = os.getenv("REDIS_URL")
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": os.getenv("REDIS_URL"),
+        "LOCATION": REDIS_URL,
         "TIMEOUT": None,
     }
 }
@@ -271,8 +273,37 @@ DATA_INCLUSION_STREAM_SOURCES = (lambda s: s.split(",") if s else None)(
     os.getenv("DATA_INCLUSION_STREAM_SOURCES")
 )
 DATA_INCLUSION_TIMEOUT_SECONDS = os.getenv("DATA_INCLUSION_TIMEOUT_SECONDS")
+# Durée maximale d'attente des résultats d·i lors d'une recherche (en secondes) :
+# au-delà, seuls les résultats DORA sont retournés.
+DATA_INCLUSION_SEARCH_DEADLINE_SECONDS = float(
+    os.getenv("DATA_INCLUSION_SEARCH_DEADLINE_SECONDS", 3)
+)
+# Nombre maximum de résultats d·i récupérés lors d'une recherche (pas de limite si vide)
+DATA_INCLUSION_SEARCH_MAX_RESULTS = (lambda s: int(s) if s else None)(
+    os.getenv("DATA_INCLUSION_SEARCH_MAX_RESULTS")
+)
+# Cache des appels à d·i (en secondes, 0 pour désactiver) :
+# une entrée périmée peut encore être utilisée pendant `..._STALE_TTL_SECONDS`
+# en cas d'indisponibilité de d·i.
+DATA_INCLUSION_CACHE_SEARCH_TTL_SECONDS = int(
+    os.getenv("DATA_INCLUSION_CACHE_SEARCH_TTL_SECONDS", 5 * 60)
+)
+DATA_INCLUSION_CACHE_RETRIEVE_TTL_SECONDS = int(
+    os.getenv("DATA_INCLUSION_CACHE_RETRIEVE_TTL_SECONDS", 60 * 60)
+)
+DATA_INCLUSION_CACHE_STALE_TTL_SECONDS = int(
+    os.getenv("DATA_INCLUSION_CACHE_STALE_TTL_SECONDS", 24 * 60 * 60)
+)
 SKIP_DI_INTEGRATION_TESTS = True
 
+# Enregistrement différé des événements analytics (hors recherches) :
+# les événements sont stockés dans Redis, puis enregistrés par la commande `drain_analytics_events`
+STATS_BUFFERED_EVENTS = os.getenv("STATS_BUFFERED_EVENTS") == "true"
+
+# Cache des réponses de la recherche (`0` pour le désactiver) :
+# les réponses expirent au plus tard à minuit (changement de l'ordre des résultats)
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", 60 * 60))
+
 # Send In Blue :
 SIB_ACTIVE = os.getenv("SIB_ACTIVE") == "true"
 SIB_API_KEY = os.getenv("SIB_API_KEY")
@@ -317,6 +348,18 @@ try:
 except Exception:
     NOTIFICATIONS_LIMIT = 0
 
+# nombre de tâches de notification exécutées simultanément,
+# et nombre de threads traitant les notifications de chaque tâche
+try:
+    NOTIFICATIONS_PARALLEL_TASKS = int(os.getenv("NOTIFICATIONS_PARALLEL_TASKS", 1))
+except Exception:
+    NOTIFICATIONS_PARALLEL_TASKS = 1
+
+try:
+    NOTIFICATIONS_TASK_WORKERS = int(os.getenv("NOTIFICATIONS_TASK_WORKERS", 1))
+except Exception:
+    NOTIFICATIONS_TASK_WORKERS = 1
+
 # ces paramètres ne sont pas liés au système de notification
 NUM_DAYS_BEFORE_DRAFT_SERVICE_NOTIFICATION = 7
 NUM_DAYS_BEFORE_ORIENTATIONS_NOTIFICATION = 10
@@ -353,6 +396,9 @@ EMAIL_SUBJECT_PREFIX = os.getenv("EMAIL_SUBJECT_PREFIX")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
 EMAIL_USE_TLS = True
 EMAIL_DOMAIN = os.getenv("EMAIL_DOMAIN")
+# nombre maximal de courriels envoyés par seconde par les envois groupés
+# (voir `dora.core.emails.EmailDispatcher`), 0 : pas de limite
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "10"))
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 SUPPORT_EMAIL = os.getenv("SUPPORT_EMAIL")
 
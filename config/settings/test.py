@@ -32,6 +32,10 @@ AUTH_PASSWORD_VALIDATORS = []
 
 # Configuration nécessaire pour les tests :
 SIB_ACTIVE = False
+# le cache Redis est partagé entre les tests : le cache de la recherche
+# n'est activé que dans ses propres tests
+SEARCH_CACHE_TTL_SECONDS = 0
+EMAIL_RATE_LIMIT = 0
 
 # Nécessaire pour la C.I. : fixe des valeurs par défaut pour les conteneurs
 # faire correspondre les valeurs définies dans la configuration de la CI
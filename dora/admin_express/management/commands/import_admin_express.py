@@ -12,6 +12,7 @@ from django.db.models import F, Func, Value
 from dora.admin_express.models import EPCI, City, Department, Region
 from dora.admin_express.utils import normalize_string_for_search
 from dora.core.utils import code_insee_to_code_dept
+from dora.services.utils import refresh_diffusion_city_codes
 
 EXE_7ZR = "/app/.apt/usr/lib/p7zip/7zr" if not settings.DEBUG else "7zr"
 
@@ -142,6 +143,10 @@ class Command(BaseCommand):
             normalize_model(Region)
             self.stdout.write(self.style.SUCCESS("Done"))
 
+        self.stdout.write(self.style.SUCCESS("Updating services diffusion zones"))
+        num_services = refresh_diffusion_city_codes()
+        self.stdout.write(self.style.SUCCESS(f"{num_services} services updated"))
+
         self.stdout.write(self.style.SUCCESS("VACUUM ANALYZE"))
         cursor = connection.cursor()
         cursor.execute("VACUUM ANALYZE")
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from data_inclusion.schema import Typologie
 from django.contrib.gis.geos import Point
@@ -425,3 +427,44 @@ def test_subcategories_other_excluded(authenticated_user, api_client):
 
     assert 200 == response.status_code
     assert response.json().get("thematiques") == ["numerique--acceder-a-du-materiel"]
+
+
+# API publique : pagination par curseur et export
+
+
+def test_structures_keyset_pagination(authenticated_user, api_client):
+    structures = sorted((make_structure() for _ in range(5)), key=lambda s: s.pk)
+
+    ids = []
+    url = "/api/v2/structures/?cursor=&page_size=2"
+    while url:
+        response = api_client.get(url)
+        assert 200 == response.status_code
+        assert len(response.data["results"]) <= 2
+        ids += [item["id"] for item in response.data["results"]]
+        url = response.data["next"]
+
+    assert ids == [str(s.pk) for s in structures]
+
+
+def test_services_export(authenticated_user, api_client, monkeypatch):
+    # plusieurs lots
+    monkeypatch.setattr("dora.api.views.EXPORT_CHUNK_SIZE", 2)
+    for _ in range(5):
+        make_service(status=ServiceStatus.PUBLISHED)
+    make_service(status=ServiceStatus.DRAFT)
+
+    response = api_client.get("/api/v2/services/export/")
+
+    assert 200 == response.status_code
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line) for line in lines] == (
+        api_client.get("/api/v2/services/").json()
+    )
+
+
+def test_structures_export_need_di_user(api_client):
+    response = api_client.get("/api/v2/structures/export/")
+
+    assert 401 == response.status_code
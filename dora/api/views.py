@@ -1,11 +1,17 @@
+import json
+from itertools import islice
+
 from django.conf import settings
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from djangorestframework_camel_case.render import CamelCaseJSONRenderer
 from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
 from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.versioning import NamespaceVersioning
 
-from dora.core.pagination import OptionalPageNumberPagination
+from dora.core.pagination import OptionalKeysetPagination
 from dora.services.models import (
     Service,
 )
@@ -54,16 +60,57 @@ class PrettyJSONRenderer(JSONRenderer):
         return super().render(data, media_type, renderer_context)
 
 
-class StructureViewSet(viewsets.ReadOnlyModelViewSet):
+class NDJSONRenderer(JSONRenderer):
+    # les données de l'export sont diffusées directement (voir `ExportMixin`) :
+    # ce rendu ne sert qu'aux erreurs, sur une seule ligne
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+EXPORT_CHUNK_SIZE = 500
+
+
+class ExportMixin:
+    """Export complet au format NDJSON (un élément JSON par ligne).
+
+    Les éléments sont lus et sérialisés par lots de `EXPORT_CHUNK_SIZE`
+    (curseur côté serveur, préchargements par lot), et la réponse est diffusée
+    au fil de l'eau : la mémoire utilisée ne dépend pas de la taille de la table.
+    """
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        renderer_classes=[NDJSONRenderer, PrettyJSONRenderer],
+    )
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        def lines():
+            rows = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            while chunk := list(islice(rows, EXPORT_CHUNK_SIZE)):
+                data = serializer_class(chunk, many=True, context=context).data
+                yield "".join(
+                    json.dumps(item, cls=JSONEncoder, ensure_ascii=False) + "\n"
+                    for item in data
+                )
+
+        return StreamingHttpResponse(lines(), content_type=NDJSONRenderer.media_type)
+
+
+class StructureViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
     versioning_class = NamespaceVersioning
     permission_classes = [APIPermission]
     serializer_class = StructureSerializer
     renderer_classes = [PrettyJSONRenderer]
-    pagination_class = OptionalPageNumberPagination
+    pagination_class = OptionalKeysetPagination
 
     def get_queryset(self):
         structures = (
-            Structure.objects.select_related("source")
+            Structure.objects.select_related("source", "parent")
             .prefetch_related("national_labels")
             .all()
         )
@@ -73,7 +120,7 @@ class StructureViewSet(viewsets.ReadOnlyModelViewSet):
         return structures.order_by("pk")
 
 
-class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
+class ServiceViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
     versioning_class = NamespaceVersioning
     queryset = (
         Service.objects.published()
@@ -93,4 +140,4 @@ class ServiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ServiceSerializer
     permission_classes = [APIPermission]
     renderer_classes = [PrettyJSONRenderer]
-    pagination_class = OptionalPageNumberPagination
+    pagination_class = OptionalKeysetPagination
@@ -1,8 +1,12 @@
+import json
+import os
 from unittest.mock import patch
 
 import pytest
 from rest_framework.test import APIClient
 
+from dora.core.enum_registry import registry
+
 
 @pytest.fixture(autouse=True, scope="session")
 def patch_di_client():
@@ -21,6 +25,30 @@ def _use_db(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def _clear_enum_registry():
+    # les énumérations en mémoire ne doivent pas survivre au rollback de la db
+    registry.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
+
+
+def pytest_terminal_summary(terminalreporter):
+    # rapport des budgets de requêtes mesurés (voir `dora.core.test_utils`),
+    # également écrit au format JSON si `QUERY_BUDGET_REPORT` est défini
+    from dora.core.test_utils import query_budget_report
+
+    if not query_budget_report:
+        return
+    terminalreporter.section("budgets de requêtes SQL")
+    for measure in query_budget_report:
+        terminalreporter.write_line(
+            f"{measure.endpoint:<30} {measure.num_rows:>5} éléments "
+            f"{measure.num_queries:>4} requêtes {measure.duration_ms:>8.1f} ms"
+        )
+    if path := os.getenv("QUERY_BUDGET_REPORT"):
+        with open(path, "w") as f:
+            json.dump([m._asdict() for m in query_budget_report], f, indent=2)
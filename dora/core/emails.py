@@ -1,8 +1,42 @@
 import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
 
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from mjml import mjml2html
+
+logger = logging.getLogger("dora.logs.core")
+
+"""
+Envoi groupé de courriels (`EmailDispatcher`) :
+    Utilisé par les commandes d'envoi de relances et d'alertes, et par les tâches
+    de notification. Tant qu'un `EmailDispatcher` est actif, `render_mjml` et `send_mail`
+    ne bloquent pas :
+        - la conversion MJML -> HTML est faite dans un pool de threads
+          (le rendu du template Django, pouvant accéder à la base, reste dans le thread
+          appelant),
+        - les courriels sont envoyés dans l'ordre, via une seule connexion au backend,
+          au plus `EMAIL_RATE_LIMIT` courriels par seconde.
+
+    Les actions à effectuer une fois les courriels envoyés (ex. : date du dernier envoi)
+    sont déclarées via `EmailDispatcher.on_sent`.
+
+    Un même `EmailDispatcher` peut être utilisé depuis plusieurs threads, à condition
+    de leur transmettre le contexte de l'appelant (voir `dora.core.utils.map_in_threads`).
+"""
+
+_active_dispatcher: ContextVar[Optional["EmailDispatcher"]] = ContextVar(
+    "email_dispatcher", default=None
+)
 
 
 def clean_reply_to(emails):
@@ -57,6 +91,15 @@ def send_mail(
                 filename,
                 default_storage.open(attachment).read(),
             )
+    # les courriels avec pièces jointes sont envoyés immédiatement
+    # (les fichiers sont supprimés après l'envoi)
+    if (dispatcher := _active_dispatcher.get()) and attachments is None:
+        dispatcher.enqueue(msg)
+        return
+
+    if isinstance(msg.body, Future):
+        msg.body = msg.body.result()
+
     try:
         msg.send()
     except Exception:
@@ -65,3 +108,203 @@ def send_mail(
         if attachments is not None:
             for attachment in attachments:
                 default_storage.delete(attachment)
+
+
+def render_mjml(template_name, context):
+    """Rendu HTML d'un template MJML.
+
+    Si un `EmailDispatcher` est actif, la conversion est faite en tâche de fond :
+    le résultat (`Future`) peut être passé tel quel comme corps de `send_mail`.
+    """
+    mjml = render_to_string(template_name, context)
+    if dispatcher := _active_dispatcher.get():
+        return dispatcher.render(mjml)
+    return mjml2html(mjml)
+
+
+class DispatchStats:
+    def __init__(self):
+        self.rendered = 0
+        self.sent = 0
+        self.failed = 0
+        self.render_seconds = 0.0
+        self.send_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "nbRendered": self.rendered,
+            "nbSent": self.sent,
+            "nbFailed": self.failed,
+            "renderTimeMs": round(1000 * self.render_seconds / (self.rendered or 1)),
+            "sendTimeMs": round(1000 * self.send_seconds / (self.sent or 1)),
+        }
+
+    def __str__(self):
+        stats = self.as_dict()
+        return (
+            f"{self.rendered} courriel(s) rendu(s) ({stats['renderTimeMs']}ms/courriel), "
+            f"{self.sent} envoyé(s) ({stats['sendTimeMs']}ms/courriel), "
+            f"{self.failed} en erreur"
+        )
+
+
+class _SentCallback:
+    # action déclenchée une fois tous les courriels d'un bloc `on_sent` envoyés
+    def __init__(self, on_sent: Callable, on_failed: Optional[Callable]):
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.pending = 0
+        self.closed = False
+        self.error = None
+
+    def message_done(self, error: Optional[Exception] = None):
+        self.pending -= 1
+        self.error = self.error or error
+        self._resolve()
+
+    def close(self):
+        self.closed = True
+        self._resolve()
+
+    def _resolve(self):
+        if not self.closed or self.pending:
+            return
+        if self.error is None:
+            self.on_sent()
+        elif self.on_failed is not None:
+            self.on_failed(self.error)
+
+
+class EmailDispatcher:
+    """Envoi groupé de courriels (voir plus haut).
+
+    Les erreurs d'envoi sont comptabilisées et journalisées, mais ne sont pas levées :
+    les actions `on_sent` des courriels en erreur ne sont pas exécutées.
+    Les actions `on_sent` et `on_failed` ne doivent pas lever d'exception.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate_limit: Optional[float] = None,
+        max_workers: int = 4,
+        max_pending: int = 100,
+    ):
+        # - `rate_limit` : nombre maximal de courriels envoyés par seconde (0 : pas de limite)
+        # - `max_pending` : nombre maximal de courriels en attente d'envoi
+        self.name = name
+        self.rate_limit = (
+            settings.EMAIL_RATE_LIMIT if rate_limit is None else rate_limit
+        )
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats = DispatchStats()
+        self._stats_lock = threading.Lock()
+        # envois et suivi des actions `on_sent` (utilisation multi-threads)
+        self._lock = threading.RLock()
+        self._pending = deque()
+        self._callbacks: ContextVar[tuple[_SentCallback, ...]] = ContextVar(
+            "email_dispatcher_callbacks", default=()
+        )
+        self._next_send_at = 0.0
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="email-render"
+        )
+        # connexion ouverte au premier envoi
+        self._connection = None
+        self._token = _active_dispatcher.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_dispatcher.reset(self._token)
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            if self._connection is not None:
+                self._connection.close()
+            self._executor.shutdown(cancel_futures=True)
+
+        logger.info(f"email_dispatch:{self.name}", self.stats.as_dict())
+
+    def _render(self, mjml: str) -> str:
+        start = time.perf_counter()
+        html = mjml2html(mjml)
+        with self._stats_lock:
+            self.stats.render_seconds += time.perf_counter() - start
+            self.stats.rendered += 1
+        return html
+
+    def render(self, mjml: str) -> Future:
+        return self._executor.submit(self._render, mjml)
+
+    @contextmanager
+    def on_sent(self, on_sent: Callable, on_failed: Optional[Callable] = None):
+        """Déclare l'action à effectuer une fois envoyés les courriels du bloc.
+
+        L'action est exécutée immédiatement si aucun courriel n'est envoyé dans le bloc,
+        et `on_failed` (si définie) est appelée avec l'erreur si l'un des envois échoue.
+        """
+        callback = _SentCallback(on_sent, on_failed)
+        token = self._callbacks.set((*self._callbacks.get(), callback))
+        try:
+            yield
+        finally:
+            self._callbacks.reset(token)
+        with self._lock:
+            callback.close()
+
+    def enqueue(self, message: EmailMessage):
+        callbacks = self._callbacks.get()
+        with self._lock:
+            for callback in callbacks:
+                callback.pending += 1
+            self._pending.append((message, callbacks))
+
+            while len(self._pending) > self.max_pending:
+                self._send_next()
+
+    def flush(self):
+        with self._lock:
+            while self._pending:
+                self._send_next()
+
+    def _throttle(self):
+        if self.rate_limit <= 0:
+            return
+        if (delay := self._next_send_at - time.monotonic()) > 0:
+            time.sleep(delay)
+        self._next_send_at = time.monotonic() + 1 / self.rate_limit
+
+    def _send_next(self):
+        message, callbacks = self._pending.popleft()
+        error = None
+        try:
+            if isinstance(message.body, Future):
+                message.body = message.body.result()
+            self._throttle()
+            start = time.perf_counter()
+            if self._connection is None:
+                self._connection = get_connection()
+                self._connection.open()
+            # un envoi par appel : permet d'identifier le courriel en erreur,
+            # la connexion restant ouverte entre les envois
+            self._connection.send_messages([message])
+            self.stats.send_seconds += time.perf_counter() - start
+            self.stats.sent += 1
+        except Exception as ex:
+            error = ex
+            self.stats.failed += 1
+            logger.exception(
+                f"email_dispatch_error:{self.name}",
+                {
+                    "subject": message.subject,
+                    "to": list(message.to),
+                    "error": str(ex),
+                },
+            )
+
+        for callback in callbacks:
+            callback.message_done(error)
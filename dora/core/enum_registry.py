@@ -0,0 +1,131 @@
+import itertools
+import time
+import uuid
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+
+from django.core.cache import cache
+
+"""
+Registre des énumérations (`EnumModel`) :
+    Les tables d'énumérations (catégories, sous-catégories, types de service, etc.)
+    sont petites et ne changent (presque) jamais : leur contenu est gardé en mémoire
+    par chaque processus, avec des index par valeur, par identifiant et par préfixe.
+
+    Chaque énumération possède un numéro de version stocké dans le cache Redis,
+    modifié après chaque enregistrement d'une valeur (voir `EnumModel.save`) :
+    les processus (workers gunicorn) rechargent l'énumération quand la version change.
+    La version est vérifiée au plus une fois par `VERSION_CHECK_INTERVAL_SECONDS`,
+    et les énumérations sont rechargées au moins toutes les `MAX_AGE_SECONDS`
+    (modifications ne passant pas par `save`, comme les migrations).
+"""
+
+CACHE_KEY_PREFIX = "enum-registry"
+VERSION_CHECK_INTERVAL_SECONDS = 1
+MAX_AGE_SECONDS = 15 * 60
+
+# numéro unique de chaque chargement d'une énumération
+_generations = itertools.count()
+
+# séparateur entre catégorie et sous-catégorie (ex. : `famille--garde-enfants`)
+PREFIX_SEPARATOR = "--"
+
+
+class EnumEntry(NamedTuple):
+    id: int
+    value: str
+    label: str
+
+
+class EnumValues:
+    """Valeurs d'une énumération, ordonnées par identifiant."""
+
+    def __init__(self, entries: Iterable[EnumEntry]):
+        self.generation = next(_generations)
+        self.entries = tuple(entries)
+        self.by_value = {entry.value: entry for entry in self.entries}
+        self.by_id = {entry.id: entry for entry in self.entries}
+        self._by_prefix = defaultdict(list)
+        for entry in self.entries:
+            if PREFIX_SEPARATOR in entry.value:
+                prefix = entry.value.split(PREFIX_SEPARATOR)[0]
+                self._by_prefix[prefix].append(entry)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, value: str):
+        return value in self.by_value
+
+    def filter(self, values: Optional[Iterable[str]]) -> list[EnumEntry]:
+        # les valeurs inconnues sont ignorées, comme avec `filter(value__in=...)`
+        values = set(values or [])
+        return [entry for entry in self.entries if entry.value in values]
+
+    def ids(self, values: Optional[Iterable[str]]) -> list[int]:
+        return [entry.id for entry in self.filter(values)]
+
+    def label(self, id: int) -> Optional[str]:
+        entry = self.by_id.get(id)
+        return entry.label if entry else None
+
+    def with_prefix(self, prefix: str) -> list[EnumEntry]:
+        # ex. : sous-catégories d'une catégorie
+        return list(self._by_prefix.get(prefix, []))
+
+
+class _Snapshot(NamedTuple):
+    version: str
+    loaded_at: float
+    checked_at: float
+    values: EnumValues
+
+
+def _version_key(model) -> str:
+    return f"{CACHE_KEY_PREFIX}:{model._meta.label_lower}:version"
+
+
+class EnumRegistry:
+    def __init__(self):
+        self._snapshots: dict[str, _Snapshot] = {}
+
+    def get(self, model) -> EnumValues:
+        key = model._meta.label_lower
+        now = time.monotonic()
+        snapshot = self._snapshots.get(key)
+
+        if snapshot and now - snapshot.loaded_at < MAX_AGE_SECONDS:
+            if now - snapshot.checked_at < VERSION_CHECK_INTERVAL_SECONDS:
+                return snapshot.values
+            if cache.get(_version_key(model)) == snapshot.version:
+                self._snapshots[key] = snapshot._replace(checked_at=now)
+                return snapshot.values
+
+        # la version est lue *avant* le chargement : une modification concurrente
+        # entraînera un nouveau chargement lors de la prochaine vérification
+        cache.add(_version_key(model), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_version_key(model))
+        values = EnumValues(
+            EnumEntry(*row)
+            for row in model.objects.order_by("pk").values_list("pk", "value", "label")
+        )
+        self._snapshots[key] = _Snapshot(version, now, now, values)
+        return values
+
+    def invalidate(self, model):
+        cache.set(_version_key(model), uuid.uuid4().hex, timeout=None)
+        self._snapshots.pop(model._meta.label_lower, None)
+
+    def clear(self):
+        self._snapshots.clear()
+
+
+registry = EnumRegistry()
+
+
+def get_enum(model) -> EnumValues:
+    """Valeurs de l'énumération `model` (sous-classe d'`EnumModel`)."""
+    return registry.get(model)
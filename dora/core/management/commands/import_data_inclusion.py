@@ -1,19 +1,26 @@
-import json
 import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain
 
 import requests
 from data_inclusion.schema import Typologie
 from django.conf import settings
 from django.contrib.gis.geos import Point
 from django.core.management.base import BaseCommand
+from django.db import DatabaseError, transaction
 from django.utils import timezone
-from django.utils.text import Truncator
+from django.utils.text import Truncator, slugify
 from furl import furl
 
+from dora.admin_express.utils import get_clean_city_name
 from dora.core import utils
 from dora.core.constants import WGS84
+from dora.core.enum_registry import get_enum
 from dora.core.models import ModerationStatus
-from dora.core.notify import send_moderation_notification
+from dora.core.notify import build_moderation_notification
+from dora.data_inclusion.pages import PAGE_SIZE, PageFetcher
 from dora.services.models import (
     ConcernedPublic,
     Credential,
@@ -23,8 +30,10 @@ from dora.services.models import (
     ServiceCategory,
     ServiceFee,
     ServiceKind,
+    ServiceModel,
     ServiceSource,
     ServiceSubCategory,
+    get_diffusion_zone_city_codes,
 )
 from dora.sirene.models import Establishment
 from dora.structures.models import Structure, StructureNationalLabel, StructureSource
@@ -32,6 +41,21 @@ from dora.users.models import User
 
 logger = logging.getLogger(__name__)
 
+"""
+Import des structures et services data·inclusion :
+    L'import se fait page par page (les données ne sont pas chargées en mémoire),
+    en plusieurs étapes pour chaque page :
+        - `fetch` : téléchargement de la page (voir `PageFetcher`: la page suivante
+          est chargée pendant le traitement de la page courante),
+        - `resolve` : recherche en masse (`IN`) des SIRET et identifiants d·i déjà connus,
+          des établissements, des structures et des valeurs de référence,
+        - `insert` : insertion en masse (`bulk_create`) des structures ou services,
+          de leurs relations M2M et des notes de modération.
+    En cas d'erreur lors de l'insertion d'une page, ses lignes sont insérées une à une :
+    seules les lignes en erreur sont ignorées.
+    Le nombre de lignes traitées par seconde est affiché pour chaque étape.
+    Un import interrompu reprend après la dernière page traitée (sauf `--restart`).
+"""
 
 # Documentation DI : https://data-inclusion-api-prod.osc-secnum-fr1.scalingo.io/api/v0/docs
 
@@ -46,12 +70,69 @@ def clean_field(value, max_length, default_value):
     return Truncator(value).chars(max_length)
 
 
+def m2m_rows(instance, field_name, target_ids):
+    # lignes de la table de liaison d'une relation M2M (pour `bulk_create`)
+    field = instance._meta.get_field(field_name)
+    through = field.remote_field.through
+    return [
+        through(
+            **{
+                f"{field.m2m_field_name()}_id": instance.pk,
+                f"{field.m2m_reverse_field_name()}_id": target_id,
+            }
+        )
+        for target_id in target_ids
+    ]
+
+
+class ImportStats:
+    # durée et nombre de lignes traitées de chaque étape
+    def __init__(self):
+        self.rows = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name, rows=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.rows[name] += rows
+
+    def timed(self, name, pages):
+        # durée de chargement de chaque page d'un itérateur
+        pages = iter(pages)
+        while True:
+            with self.phase(name):
+                page = next(pages, None)
+            if page is None:
+                return
+            self.rows[name] += len(page)
+            yield page
+
+    def as_dict(self):
+        return {
+            name: {
+                "rows": self.rows[name],
+                "seconds": round(seconds, 2),
+                "rowsPerSecond": round(self.rows[name] / seconds) if seconds else 0,
+            }
+            for name, seconds in self.seconds.items()
+        }
+
+
 class Command(BaseCommand):
     help = "Importe les nouvelles structures Data Inclusion qui n'existent pas encore dans Dora"
 
     def add_arguments(self, parser):
         parser.add_argument("source", type=str)
         parser.add_argument("--department", type=str)
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore le point de reprise d'un import interrompu",
+        )
 
     def handle(self, *args, **options):
         department = options["department"]
@@ -66,17 +147,23 @@ class Command(BaseCommand):
             sys.exit(-1)
 
         self.stdout.write(self.style.SUCCESS(f"Import de la source: {source}"))
+        self.stats = ImportStats()
+        self.restart = options["restart"]
         try:
-            structures = self.get_structures(source, department)
-            self.import_structures(source, structures)
-            services = self.get_services(source, department)
-            self.import_services(source, services)
+            self.import_structures(source, self.get_structures(source, department))
+            self.import_services(source, self.get_services(source, department))
         except requests.exceptions.RequestException as e:
             self.stderr.write(self.style.ERROR(e))
 
+        for name, phase in self.stats.as_dict().items():
+            self.stdout.write(
+                f"{name} : {phase['rows']} lignes en {phase['seconds']}s"
+                f" ({phase['rowsPerSecond']} lignes/s)"
+            )
+
     def get_structures(self, source, department):
-        structures = []
-        args = {"source": source, "size": 100}
+        # itérateur sur les pages de structures
+        args = {"source": source, "size": PAGE_SIZE}
         if department:
             args["departement"] = department
 
@@ -84,15 +171,11 @@ class Command(BaseCommand):
             path="structures/",
             args=args,
         )
-
-        for results in self.get_pages(url):
-            structures += results
-
-        return structures
+        return self.stats.timed("structures:fetch", self.get_pages(url, "structures"))
 
     def get_services(self, source, department):
-        services = []
-        args = {"source": source, "size": 100}
+        # itérateur sur les pages de services
+        args = {"source": source, "size": PAGE_SIZE}
         if department:
             args["departement"] = department
 
@@ -100,42 +183,79 @@ class Command(BaseCommand):
             path="services/",
             args=args,
         )
+        return self.stats.timed("services:fetch", self.get_pages(url, "services"))
+
+    def get_pages(self, url, resource):
+        source = url.args["source"]
+        department = url.args.get("departement", "")
+        fetcher = PageFetcher(
+            url,
+            checkpoint=f"{source}:{department}:{resource}",
+            # l'index des structures lues est nécessaire à l'import des services
+            state=STRUCTURES_INDEX if resource == "structures" else None,
+        )
+        if self.restart:
+            fetcher.clear_checkpoint()
+        return fetcher
+
+    def insert_rows(self, rows, phase):
+        """Insère en masse les objets de chaque ligne.
+
+        Chaque ligne est une liste d'objets à créer, dans l'ordre des dépendances
+        (ex. : structure, labels, note de modération).
+        Retourne le nombre de lignes insérées.
+        """
+
+        def insert(objects):
+            by_model = defaultdict(list)
+            for obj in objects:
+                by_model[type(obj)].append(obj)
+            for model, model_objects in by_model.items():
+                model.objects.bulk_create(model_objects)
+
+        def insert_all():
+            try:
+                with transaction.atomic():
+                    insert(chain.from_iterable(rows))
+                return len(rows)
+            except DatabaseError as e:
+                self.stderr.write(
+                    self.style.ERROR(f"Erreur d'insertion, import ligne à ligne : {e}")
+                )
 
-        for results in self.get_pages(url):
-            services += results
-
-        return services
-
-    def get_pages(self, url):
-        page = 1
-        while True:
-            paginated_url = url.copy().add({"page": page})
-            self.stdout.write(f"Chargement de {paginated_url}")
-            response = requests.get(
-                paginated_url,
-                params={},
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                    "Authorization": f"Bearer {settings.DATA_INCLUSION_IMPORT_API_KEY}",
-                },
+            num_inserted = 0
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        insert(row)
+                    num_inserted += 1
+                except DatabaseError as e:
+                    self.stderr.write(self.style.ERROR(f"{row[0]} : {e}"))
+            return num_inserted
+
+        with self.stats.phase(phase):
+            num_inserted = insert_all()
+        # seules les lignes effectivement insérées sont comptabilisées
+        self.stats.rows[phase] += num_inserted
+        return num_inserted
+
+    def resolve_national_labels(self, values):
+        labels = {entry.value: entry.id for entry in get_enum(StructureNationalLabel)}
+        for value in set(values) - labels.keys():
+            new_label, _created = StructureNationalLabel.objects.get_or_create(
+                value=value
             )
-            if response.status_code != 200:
-                self.stderr.write(
+            if _created:
+                self.stdout.write(
                     self.style.ERROR(
-                        f"Erreur dans la récupération des données\n{url}: {response.status_code}"
+                        f"Label national: {value} inexistant. Pensez à le compléter dans l'interface "
+                        f"d'administration"
                     )
                 )
-                return
+            labels[value] = new_label.id
+        return labels
 
-            result = json.loads(response.content)["items"]
-            if len(result):
-                yield result
-                page += 1
-            else:
-                return
-
-    def import_structures(self, source_value, structures):
+    def import_structures(self, source_value, pages):
         bot_user = User.objects.get_dora_bot()
         source, _created = StructureSource.objects.get_or_create(
             value=f"di-{source_value}",
@@ -150,24 +270,44 @@ class Command(BaseCommand):
             )
         num_imported = 0
 
-        for s in structures:
-            if not s["siret"]:
-                continue
+        for page in pages:
+            with self.stats.phase("structures:resolve", len(page)):
+                rows = self.build_structures(page, source, bot_user)
+            num_imported += self.insert_rows(rows, "structures:insert")
+
+        self.stdout.write(self.style.SUCCESS(f"{num_imported} structures importées"))
+
+    def build_structures(self, page, source, bot_user):
+        page = [s for s in page if s["siret"]]
+        for s in page:
             STRUCTURES_INDEX[s["id"]] = s["siret"]
 
-            if Structure.objects.filter(siret=s["siret"]).exists():
+        sirets = {s["siret"] for s in page}
+        existing_sirets = set(
+            Structure.objects.filter(siret__in=sirets).values_list("siret", flat=True)
+        )
+        establishments = Establishment.objects.in_bulk(sirets - existing_sirets)
+        labels = self.resolve_national_labels(
+            chain.from_iterable(s["labels_nationaux"] or [] for s in page)
+        )
+
+        structures = []
+        for s in page:
+            if s["siret"] in existing_sirets:
                 continue
-            try:
-                establishment = Establishment.objects.get(siret=s["siret"])
-            except Establishment.DoesNotExist:
+            establishment = establishments.get(s["siret"])
+            if establishment is None:
                 self.stdout.write(
                     self.style.NOTICE(
                         f"Siret incorrect, ignoré : {s['siret']} ({s['nom']})"
                     )
                 )
                 continue
+            # un même SIRET peut apparaître plusieurs fois : seule la première
+            # structure est importée
+            existing_sirets.add(s["siret"])
             try:
-                structure = Structure.objects.create_from_establishment(establishment)
+                structure = Structure.objects.build_from_establishment(establishment)
                 structure.creator = bot_user
                 structure.last_editor = bot_user
                 structure.source = source
@@ -188,41 +328,45 @@ class Command(BaseCommand):
                         typo_di,
                     )
                 structure.accesslibre_url = s["accessibilite"]
-                structure.save()
-
-                for label in s["labels_nationaux"] or []:
-                    new_label, _created = StructureNationalLabel.objects.get_or_create(
-                        value=label
+                # voir `Structure.save`
+                if structure.city_code:
+                    structure.department = utils.code_insee_to_code_dept(
+                        structure.city_code
                     )
-                    if _created:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f"Label national: {label} inexistant. Pensez à le compléter dans l'interface "
-                                f"d'administration"
-                            )
-                        )
-                    structure.national_labels.add(new_label)
-
-                send_moderation_notification(
-                    structure,
-                    bot_user,
-                    f"Structure importée de Data Inclusion ({source})",
-                    ModerationStatus.VALIDATED,
-                )
-                num_imported += 1
-
+                    structure.city = get_clean_city_name(structure.city_code)
+                structures.append((structure, s))
             except Exception as e:
-                print(s)
-                self.stderr.write(s)
+                self.stderr.write(str(s))
                 self.stderr.write(self.style.ERROR(e))
-        self.stdout.write(self.style.SUCCESS(f"{num_imported} structures importées"))
 
-    def import_services(self, source_value, services):
-        def cust_choice_to_objects(Model, values):
-            if values:
-                return Model.objects.filter(name__in=values)
-            return []
+        slugs = utils.make_unique_slugs(
+            [slugify(structure.name)[:20] for structure, _s in structures],
+            [Structure.objects],
+        )
+
+        rows = []
+        for (structure, s), slug in zip(structures, slugs):
+            structure.slug = slug
+            log_item = build_moderation_notification(
+                structure,
+                bot_user,
+                f"Structure importée de Data Inclusion ({source})",
+                ModerationStatus.VALIDATED,
+            )
+            rows.append(
+                [
+                    structure,
+                    *m2m_rows(
+                        structure,
+                        "national_labels",
+                        {labels[label] for label in s["labels_nationaux"] or []},
+                    ),
+                    log_item,
+                ]
+            )
+        return rows
 
+    def import_services(self, source_value, pages):
         bot_user = User.objects.get_dora_bot()
         source, _created = ServiceSource.objects.get_or_create(
             value=f"di-{source_value}",
@@ -236,32 +380,73 @@ class Command(BaseCommand):
                 )
             )
         num_imported = 0
-        for s in services:
-            if Service.objects.filter(
-                data_inclusion_id=s["id"],
-                data_inclusion_source=s["source"],
-            ).exists():
+        # codes INSEE des zones de diffusion, par zone
+        diffusion_zones = {}
+
+        for page in pages:
+            with self.stats.phase("services:resolve", len(page)):
+                rows = self.build_services(page, source, bot_user, diffusion_zones)
+            num_imported += self.insert_rows(rows, "services:insert")
+
+        self.stdout.write(self.style.SUCCESS(f"{num_imported} services importés"))
+
+    def build_services(self, page, source, bot_user, diffusion_zones):
+        def cust_choices_by_name(Model, field):
+            # comme `Model.objects.filter(name__in=values)`, pour toute la page
+            names = set(chain.from_iterable(s[field] or [] for s in page))
+            choices = defaultdict(list)
+            for name, id in Model.objects.filter(name__in=names).values_list(
+                "name", "id"
+            ):
+                choices[name].append(id)
+            return choices
+
+        def cust_choice_ids(choices, values):
+            return {id for value in values or [] for id in choices[value]}
+
+        existing_services = set(
+            Service.objects.filter(
+                data_inclusion_id__in={s["id"] for s in page}
+            ).values_list("data_inclusion_id", "data_inclusion_source")
+        )
+        structures = Structure.objects.only("id", "slug", "siret").in_bulk(
+            {
+                STRUCTURES_INDEX[s["structure_id"]]
+                for s in page
+                if s["structure_id"] in STRUCTURES_INDEX
+            },
+            field_name="siret",
+        )
+        concerned_publics = cust_choices_by_name(ConcernedPublic, "profils")
+        requirements = cust_choices_by_name(Requirement, "pre_requis")
+        credentials = cust_choices_by_name(Credential, "justificatifs")
+
+        services = []
+        for s in page:
+            if (s["id"], s["source"]) in existing_services:
                 continue
             siret = STRUCTURES_INDEX.get(s["structure_id"])
             if not siret:
-                self.style.ERROR(f"Impossible de trouver le siret correspondant à {s}")
+                self.stderr.write(
+                    self.style.ERROR(
+                        f"Impossible de trouver le siret correspondant à {s}"
+                    )
+                )
                 continue
-            structures = Structure.objects.filter(siret=siret)
-            if not structures:
+            structure = structures.get(siret)
+            if structure is None:
                 self.stdout.write(
                     self.style.ERROR(
                         f"La structure correspondant au service {s['id']}, de siret {siret}, n'a pas été créée"
                     )
                 )
                 continue
-            if len(structures) > 1:
-                main_structures = structures.filter(parent=None)
-                if main_structures:
-                    structures = main_structures
+            # un même service peut apparaître plusieurs fois : seul le premier
+            # est importé
+            existing_services.add((s["id"], s["source"]))
 
-            structure = structures[0]
             try:
-                service = Service.objects.create(
+                service = Service(
                     data_inclusion_id=s["id"],
                     data_inclusion_source=s["source"],
                     structure=structure,
@@ -297,50 +482,72 @@ class Command(BaseCommand):
                 # service.status = ServiceStatus.PUBLISHED
                 # service.publication_date = timezone.now()
 
-                service.concerned_public.set(
-                    cust_choice_to_objects(ConcernedPublic, s["profils"])
-                )
-                service.requirements.set(
-                    cust_choice_to_objects(Requirement, s["pre_requis"])
-                )
-                service.credentials.set(
-                    cust_choice_to_objects(Credential, s["justificatifs"])
-                )
-
-                subcats = s["thematiques"]
-                cats = [s.split("--")[0] for s in subcats]
-                service.categories.set(self._values_to_objects(ServiceCategory, cats))
-                service.subcategories.set(
-                    self._values_to_objects(ServiceSubCategory, subcats)
+                service.fee_condition_id = next(
+                    iter(self._values_to_ids(ServiceFee, s["frais"])), None
                 )
 
-                service.kinds.set(self._values_to_objects(ServiceKind, s["types"]))
-                service.fee_condition = ServiceFee.objects.filter(
-                    value__in=s["frais"]
-                ).first()
-                service.location_kinds.set(
-                    self._values_to_objects(LocationKind, s["modes_accueil"])
+                # voir `Service.save` (les services importés ne sont pas publiés :
+                # pas d'invalidation du cache de recherche)
+                service.city = get_clean_city_name(service.city_code)
+                diffusion_zone = (
+                    service.diffusion_zone_type,
+                    service.diffusion_zone_details,
                 )
+                if diffusion_zone not in diffusion_zones:
+                    diffusion_zones[diffusion_zone] = get_diffusion_zone_city_codes(
+                        *diffusion_zone
+                    )
+                service.diffusion_city_codes = diffusion_zones[diffusion_zone]
 
-                service.save()
-                send_moderation_notification(
-                    service,
-                    bot_user,
-                    f"Structure importée de Data Inclusion ({source})",
-                    ModerationStatus.VALIDATED,
-                )
-                num_imported += 1
-
+                subcats = s["thematiques"] or []
+                cats = [s.split("--")[0] for s in subcats]
+                relations = {
+                    "concerned_public": cust_choice_ids(
+                        concerned_publics, s["profils"]
+                    ),
+                    "requirements": cust_choice_ids(requirements, s["pre_requis"]),
+                    "credentials": cust_choice_ids(credentials, s["justificatifs"]),
+                    "categories": self._values_to_ids(ServiceCategory, cats),
+                    "subcategories": self._values_to_ids(ServiceSubCategory, subcats),
+                    "kinds": self._values_to_ids(ServiceKind, s["types"]),
+                    "location_kinds": self._values_to_ids(
+                        LocationKind, s["modes_accueil"]
+                    ),
+                }
+                services.append((service, relations))
             except Exception as e:
-                print(e)
-                print(s)
-                self.stderr.write(s)
+                self.stderr.write(str(s))
                 self.stderr.write(self.style.ERROR(e))
                 continue
 
-        self.stdout.write(self.style.SUCCESS(f"{num_imported} services importés"))
+        slugs = utils.make_unique_slugs(
+            [
+                service.structure.slug + "-" + slugify(service.name)[:20]
+                for service, _relations in services
+            ],
+            [Service.objects, ServiceModel.objects],
+        )
+
+        rows = []
+        for (service, relations), slug in zip(services, slugs):
+            service.slug = slug
+            log_item = build_moderation_notification(
+                service,
+                bot_user,
+                f"Structure importée de Data Inclusion ({source})",
+                ModerationStatus.VALIDATED,
+            )
+            rows.append(
+                [
+                    service,
+                    *chain.from_iterable(
+                        m2m_rows(service, field_name, ids)
+                        for field_name, ids in relations.items()
+                    ),
+                    log_item,
+                ]
+            )
+        return rows
 
-    def _values_to_objects(self, Model, values):
-        if values:
-            return Model.objects.filter(value__in=values)
-        return []
+    def _values_to_ids(self, Model, values):
+        return get_enum(Model).ids(values)
@@ -1,4 +1,4 @@
-import json
+from itertools import chain
 
 import requests
 from django.conf import settings
@@ -11,10 +11,12 @@ from furl import furl
 from dora.admin_express.models import AdminDivisionType, City
 from dora.core import utils
 from dora.core.constants import WGS84
+from dora.core.enum_registry import get_enum
 from dora.core.models import ModerationStatus
 from dora.core.notify import send_moderation_notification
 from dora.core.utils import code_insee_to_code_dept
 from dora.data_inclusion.mappings import DI_TO_DORA_DIFFUSION_ZONE_TYPE_MAPPING
+from dora.data_inclusion.pages import PAGE_SIZE, PageFetcher
 from dora.services.enums import ServiceStatus
 from dora.services.models import (
     BeneficiaryAccessMode,
@@ -58,10 +60,16 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--department", type=str)
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore le point de reprise d'un import interrompu",
+        )
 
     def handle(self, *args, **options):
         department = options["department"]
         source = "mediation-numerique"
+        self.restart = options["restart"]
 
         self.stdout.write(self.style.SUCCESS(f"Import de la source: {source}"))
         try:
@@ -73,8 +81,8 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(e))
 
     def get_structures(self, source, department):
-        structures = []
-        args = {"source": source, "size": 100}
+        # itérateur sur les structures, chargées page par page
+        args = {"source": source, "size": PAGE_SIZE}
         if department:
             args["departement"] = department
 
@@ -82,15 +90,11 @@ class Command(BaseCommand):
             path="structures/",
             args=args,
         )
-
-        for results in self.get_pages(url):
-            structures += results
-
-        return structures
+        return chain.from_iterable(self.get_pages(url, "structures"))
 
     def get_services(self, source, department):
-        services = []
-        args = {"source": source, "size": 100}
+        # itérateur sur les services, chargés page par page
+        args = {"source": source, "size": PAGE_SIZE}
         if department:
             args["departement"] = department
 
@@ -98,39 +102,20 @@ class Command(BaseCommand):
             path="services/",
             args=args,
         )
-
-        for results in self.get_pages(url):
-            services += results
-
-        return services
-
-    def get_pages(self, url):
-        page = 1
-        while True:
-            paginated_url = url.copy().add({"page": page})
-            response = requests.get(
-                paginated_url,
-                params={},
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                    "Authorization": f"Bearer {settings.DATA_INCLUSION_IMPORT_API_KEY}",
-                },
-            )
-            if response.status_code != 200:
-                self.stderr.write(
-                    self.style.ERROR(
-                        f"Erreur dans la récupération des données\n{url}: {response.status_code}"
-                    )
-                )
-                return
-
-            result = json.loads(response.content)["items"]
-            if len(result):
-                yield result
-                page += 1
-            else:
-                return
+        return chain.from_iterable(self.get_pages(url, "services"))
+
+    def get_pages(self, url, resource):
+        # voir `PageFetcher` : un import interrompu reprend après la dernière page traitée
+        department = url.args.get("departement", "")
+        fetcher = PageFetcher(
+            url,
+            checkpoint=f"mediation-numerique:{department}:{resource}",
+            # l'index des structures lues est nécessaire à l'import des services
+            state=STRUCTURES_INDEX if resource == "structures" else None,
+        )
+        if self.restart:
+            fetcher.clear_checkpoint()
+        return fetcher
 
     def set_or_update_labels(self, structure, label_values):
         for label_value in label_values:
@@ -311,17 +296,17 @@ class Command(BaseCommand):
 
                 subcats = s["thematiques"]
                 cats = [s.split("--")[0] for s in subcats]
-                service.categories.set(self._values_to_objects(ServiceCategory, cats))
+                service.categories.set(self._values_to_ids(ServiceCategory, cats))
                 service.subcategories.set(
-                    self._values_to_objects(ServiceSubCategory, subcats)
+                    self._values_to_ids(ServiceSubCategory, subcats)
                 )
 
-                service.kinds.set(self._values_to_objects(ServiceKind, s["types"]))
-                service.fee_condition = ServiceFee.objects.filter(
-                    value__in=s["frais"]
-                ).first()
+                service.kinds.set(self._values_to_ids(ServiceKind, s["types"]))
+                service.fee_condition_id = next(
+                    iter(self._values_to_ids(ServiceFee, s["frais"])), None
+                )
                 service.location_kinds.set(
-                    self._values_to_objects(LocationKind, s["modes_accueil"])
+                    self._values_to_ids(LocationKind, s["modes_accueil"])
                 )
 
                 self._presave_mednum_services(service, labels_nationaux)
@@ -344,10 +329,8 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(f"{num_imported} services importés"))
 
-    def _values_to_objects(self, Model, values):
-        if values:
-            return Model.objects.filter(value__in=values)
-        return []
+    def _values_to_ids(self, Model, values):
+        return get_enum(Model).ids(values)
 
     def _presave_mednum_services(self, service, label_nationaux):
         service.use_inclusion_numerique_scheme = True
@@ -375,17 +358,18 @@ class Command(BaseCommand):
                 )
 
         service.coach_orientation_modes.add(
-            CoachOrientationMode.objects.get(value="telephoner"),
-            CoachOrientationMode.objects.get(value="envoyer-un-mail"),
+            *self._values_to_ids(
+                CoachOrientationMode, ["telephoner", "envoyer-un-mail"]
+            )
         )
 
         service.beneficiaries_access_modes.add(
-            BeneficiaryAccessMode.objects.get(value="telephoner"),
+            *self._values_to_ids(BeneficiaryAccessMode, ["telephoner"])
         )
 
         if not service.appointment_link:
             service.beneficiaries_access_modes.add(
-                BeneficiaryAccessMode.objects.get(value="se-presenter"),
+                *self._values_to_ids(BeneficiaryAccessMode, ["se-presenter"])
             )
 
         if label_nationaux:
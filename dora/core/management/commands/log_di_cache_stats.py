@@ -0,0 +1,25 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from dora.data_inclusion import get_cache_stats, reset_cache_stats
+
+logger = logging.getLogger("dora.logs.core")
+
+
+class Command(BaseCommand):
+    help = (
+        "Journalise les compteurs d'utilisation du cache d·i "
+        "depuis le dernier relevé, puis les remet à zéro"
+    )
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        logger.info("di_cache:stats", stats)
+        reset_cache_stats(stats)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(f"{name} : {value}" for name, value in stats.items())
+            )
+        )
@@ -1,5 +1,7 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+
+from .enum_registry import registry
 
 
 class EnumModel(models.Model):
@@ -12,6 +14,21 @@ class EnumModel(models.Model):
     def __str__(self):
         return self.label
 
+    def _invalidate_registry(self):
+        # une fois la transaction validée : un autre processus ne doit pas
+        # recharger les anciennes valeurs sous la nouvelle version
+        model = type(self)
+        transaction.on_commit(lambda: registry.invalidate(model))
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._invalidate_registry()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._invalidate_registry()
+        return result
+
 
 class ModerationStatus(models.TextChoices):
     NEED_INITIAL_MODERATION = (
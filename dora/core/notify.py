@@ -8,3 +8,15 @@ def send_moderation_notification(entity, user, msg, new_status):
     entity.moderation_status = new_status
     entity.moderation_date = timezone.now()
     entity.save()
+
+
+def build_moderation_notification(entity, user, msg, new_status):
+    # comme `send_moderation_notification`, sans écriture en base (imports en masse) :
+    # l'entité est modifiée, et la note de modération à enregistrer est retournée
+    from dora.core.models import LogItem
+
+    if new_status != entity.moderation_status:
+        msg += f"\nNouveau statut de modération : {new_status.label}"
+    entity.moderation_status = new_status
+    entity.moderation_date = timezone.now()
+    return LogItem(**{entity._meta.model_name: entity}, user=user, message=msg.strip())
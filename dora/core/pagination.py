@@ -12,3 +12,34 @@ class OptionalPageNumberPagination(pagination.PageNumberPagination):
         if self.page_size_query_param in request.query_params:
             return super().get_page_size(request)
         return None
+
+
+class KeysetPagination(pagination.CursorPagination):
+    # Pagination par curseur, sur la clé primaire :
+    # les pages suivantes sont filtrées sur la dernière clé lue (pas d'`OFFSET`).
+    ordering = "pk"
+    page_size = 500
+    page_size_query_param = "page_size"
+    max_page_size = 5000
+
+
+class OptionalKeysetPagination(OptionalPageNumberPagination):
+    # Pagination optionnelle par numéro de page (voir ci-dessus),
+    # ou par curseur si `cursor` est présent dans les paramètres de l'URL
+    # (`?cursor=` pour la première page, puis le lien `next` de chaque page).
+
+    cursor_query_param = "cursor"
+
+    def __init__(self):
+        self.keyset_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.keyset_pagination = KeysetPagination()
+            return self.keyset_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_pagination:
+            return self.keyset_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
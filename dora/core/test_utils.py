@@ -1,5 +1,9 @@
 import random
+import time
+from typing import Callable, NamedTuple
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from model_bakery import baker
@@ -126,3 +130,50 @@ def make_orientation(**kwargs):
         **kwargs,
     )
     return orientation
+
+
+# Budget de requêtes SQL des endpoints de liste :
+# le nombre de requêtes ne doit pas dépendre du nombre d'éléments listés.
+# Les mesures sont regroupées dans `query_budget_report`
+# (affiché en fin de session pytest, voir `dora/conftest.py`).
+
+
+class QueryBudgetMeasure(NamedTuple):
+    endpoint: str
+    num_rows: int
+    num_queries: int
+    duration_ms: float
+
+
+query_budget_report: list[QueryBudgetMeasure] = []
+
+
+def measure_endpoint(client, url, num_rows) -> QueryBudgetMeasure:
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = client.get(url)
+        duration_ms = (time.perf_counter() - start) * 1000
+    assert response.status_code == 200, response.content
+    measure = QueryBudgetMeasure(url, num_rows, len(ctx.captured_queries), duration_ms)
+    query_budget_report.append(measure)
+    return measure
+
+
+def assert_query_budget(client, url, seed: Callable[[int], None], n=2, factor=10):
+    """Vérifie que le nombre de requêtes de `url` est le même pour n et factor·n éléments.
+
+    `seed(count)` crée `count` éléments supplémentaires, visibles par `client`.
+    """
+    seed(n)
+    # première requête non mesurée : remplissage des caches (énumérations, etc.)
+    client.get(url)
+    small = measure_endpoint(client, url, n)
+
+    seed(n * factor - n)
+    large = measure_endpoint(client, url, n * factor)
+
+    assert large.num_queries <= small.num_queries, (
+        f"{url} : {small.num_queries} requêtes pour {n} éléments, "
+        f"{large.num_queries} pour {n * factor}"
+    )
+    return small, large
@@ -0,0 +1,159 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from dora.core.models import LogItem, ModerationStatus
+from dora.core.test_utils import make_structure
+from dora.data_inclusion.pages import PageFetcher
+from dora.services.models import Service, ServiceCategory, ServiceSubCategory
+from dora.structures.models import Structure
+
+
+def make_di_structure(**kwargs):
+    return {
+        "id": "di-structure",
+        "source": "test",
+        "siret": "12345678901234",
+        "nom": "Structure",
+        "courriel": "structure@example.com",
+        "telephone": "01 02 03 04 05",
+        "site_web": "",
+        "presentation_detail": "",
+        "presentation_resume": "",
+        "typologie": "ASSO",
+        "accessibilite": "",
+        "labels_nationaux": [],
+        **kwargs,
+    }
+
+
+def make_di_service(**kwargs):
+    return {
+        "id": "di-service",
+        "source": "test",
+        "structure_id": "di-structure",
+        "nom": "Service",
+        "presentation_resume": "",
+        "presentation_detail": "",
+        "frais_autres": "",
+        "cumulable": True,
+        "formulaire_en_ligne": "",
+        "code_postal": "",
+        "code_insee": "",
+        "adresse": "",
+        "complement_adresse": "",
+        "recurrence": "",
+        "date_suspension": None,
+        "telephone": "",
+        "courriel": "",
+        "contact_public": True,
+        "zone_diffusion_type": "",
+        "zone_diffusion_code": "",
+        "longitude": None,
+        "latitude": None,
+        "profils": [],
+        "pre_requis": [],
+        "justificatifs": [],
+        "thematiques": [],
+        "types": [],
+        "frais": [],
+        "modes_accueil": [],
+        **kwargs,
+    }
+
+
+class DataInclusionImportTestCase(APITestCase):
+    def call_command(self, structure_pages, service_pages):
+        def fetch(fetcher, page):
+            pages = (
+                structure_pages if "structures" in str(fetcher.url) else service_pages
+            )
+            return pages[page - 1] if page <= len(pages) else []
+
+        out = StringIO()
+        with mock.patch.object(PageFetcher, "fetch", fetch):
+            call_command(
+                "import_data_inclusion",
+                "test",
+                restart=True,
+                stdout=out,
+                stderr=StringIO(),
+            )
+        return out.getvalue()
+
+    def test_import_structures_and_services(self):
+        for idx in range(3):
+            baker.make(
+                "Establishment",
+                siret=f"1234567890123{idx}",
+                name=f"Établissement {idx}",
+            )
+        existing = make_structure(siret="12345678901232")
+        category, _ = ServiceCategory.objects.get_or_create(
+            value="famille", defaults={"label": "Famille"}
+        )
+        subcategory, _ = ServiceSubCategory.objects.get_or_create(
+            value="famille--garde-enfants", defaults={"label": "Garde d'enfants"}
+        )
+
+        structure_pages = [
+            [
+                make_di_structure(id="s0", siret="12345678901230"),
+                make_di_structure(
+                    id="s1", siret="12345678901231", labels_nationaux=["nouveau"]
+                ),
+            ],
+            [
+                # déjà présente, siret inconnu, siret manquant
+                make_di_structure(id="s2", siret="12345678901232"),
+                make_di_structure(id="s3", siret="99999999999999"),
+                make_di_structure(id="s4", siret=None),
+            ],
+        ]
+        service_pages = [
+            [
+                make_di_service(
+                    id=f"service-{idx}",
+                    structure_id=structure_id,
+                    thematiques=["famille--garde-enfants"],
+                )
+                for idx, structure_id in enumerate(["s0", "s0", "s1", "s2", "s3"])
+            ]
+            # service en double dans la même page
+            + [make_di_service(id="service-0", structure_id="s1")]
+        ]
+
+        out = self.call_command(structure_pages, service_pages)
+
+        self.assertIn("2 structures importées", out)
+        self.assertIn("4 services importés", out)
+        self.assertIn("structures:insert : 2 lignes", out)
+        self.assertIn("services:insert : 4 lignes", out)
+
+        structure = Structure.objects.get(siret="12345678901231")
+        self.assertEqual(structure.moderation_status, ModerationStatus.VALIDATED)
+        self.assertEqual(
+            list(structure.national_labels.values_list("value", flat=True)),
+            ["nouveau"],
+        )
+        self.assertEqual(LogItem.objects.filter(structure=structure).count(), 1)
+
+        services = Service.objects.filter(data_inclusion_source="test")
+        self.assertEqual(services.filter(structure=existing).count(), 1)
+        self.assertEqual(
+            services.get(data_inclusion_id="service-0").structure.siret,
+            "12345678901230",
+        )
+        # slugs uniques, y compris au sein d'une même page
+        self.assertEqual(len({service.slug for service in services}), 4)
+        for service in services:
+            self.assertEqual(list(service.categories.all()), [category])
+            self.assertEqual(list(service.subcategories.all()), [subcategory])
+            self.assertEqual(LogItem.objects.filter(service=service).count(), 1)
+
+        # les services déjà importés sont ignorés
+        out = self.call_command(structure_pages, service_pages)
+        self.assertIn("0 services importés", out)
@@ -0,0 +1,89 @@
+from unittest import mock
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+
+from dora.core.emails import EmailDispatcher, send_mail
+from dora.logs.models import ActionLog
+
+MJML = """
+<mjml>
+  <mj-body>
+    <mj-section>
+      <mj-column>
+        <mj-text>Bonjour</mj-text>
+      </mj-column>
+    </mj-section>
+  </mj-body>
+</mjml>
+"""
+
+
+def test_dispatcher_sends_after_rendering():
+    sent = []
+
+    with EmailDispatcher("test") as dispatcher:
+        for i in range(3):
+            with dispatcher.on_sent(lambda i=i: sent.append(i)):
+                send_mail(f"Courriel {i}", "test@example.com", dispatcher.render(MJML))
+                send_mail(f"Copie {i}", "copie@example.com", "<p>Copie</p>")
+        # pas de courriel envoyé sans action de la part de l'appelant :
+        # bloc sans courriel, action immédiate
+        with dispatcher.on_sent(lambda: sent.append("vide")):
+            pass
+
+    assert sent == ["vide", 0, 1, 2]
+    assert [m.subject for m in mail.outbox] == [
+        "Courriel 0",
+        "Copie 0",
+        "Courriel 1",
+        "Copie 1",
+        "Courriel 2",
+        "Copie 2",
+    ]
+    assert "Bonjour" in mail.outbox[0].body
+    assert (dispatcher.stats.rendered, dispatcher.stats.sent) == (3, 6)
+    assert dispatcher.stats.failed == 0
+
+
+def test_dispatcher_isolates_failures():
+    send_messages = EmailBackend.send_messages
+
+    def failing_send_messages(self, messages):
+        if any(m.subject == "Erreur" for m in messages):
+            raise ConnectionError("envoi impossible")
+        return send_messages(self, messages)
+
+    sent, failed = [], []
+    with mock.patch.object(EmailBackend, "send_messages", failing_send_messages):
+        with EmailDispatcher("test") as dispatcher:
+            for subject in ("OK", "Erreur", "OK"):
+                with dispatcher.on_sent(
+                    lambda s=subject: sent.append(s), on_failed=failed.append
+                ):
+                    send_mail(subject, "test@example.com", "<p>Test</p>")
+
+    assert sent == ["OK", "OK"]
+    assert len(failed) == 1 and isinstance(failed[0], ConnectionError)
+    assert len(mail.outbox) == 2
+    assert (dispatcher.stats.sent, dispatcher.stats.failed) == (2, 1)
+
+    log = ActionLog.objects.get(msg="email_dispatch_error:test")
+    assert log.payload == {
+        "subject": "Erreur",
+        "to": ["test@example.com"],
+        "error": "envoi impossible",
+    }
+
+
+@pytest.mark.parametrize("rate_limit,expected_sleeps", [(0, 0), (5, 2)])
+def test_dispatcher_rate_limit(rate_limit, expected_sleeps):
+    with mock.patch("dora.core.emails.time.sleep") as sleep:
+        with EmailDispatcher("test", rate_limit=rate_limit):
+            for _ in range(3):
+                send_mail("Test", "test@example.com", "<p>Test</p>")
+
+    assert len(mail.outbox) == 3
+    # aucune attente avant le premier envoi
+    assert sleep.call_count == expected_sleeps
@@ -0,0 +1,56 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from dora.core import enum_registry
+from dora.core.enum_registry import EnumRegistry, get_enum
+from dora.services.models import ServiceCategory, ServiceSubCategory
+
+
+def test_enum_values_are_loaded_once():
+    cat = baker.make("ServiceCategory", value="cat1", label="Catégorie 1")
+
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(3):
+            categories = get_enum(ServiceCategory)
+
+    assert len(queries) == 1
+    assert categories.ids(["cat1", "inconnue"]) == [cat.pk]
+    assert categories.label(cat.pk) == "Catégorie 1"
+    assert "cat1" in categories
+
+
+def test_enum_prefix_index():
+    sub1 = baker.make("ServiceSubCategory", value="cat1--sub1")
+    sub2 = baker.make("ServiceSubCategory", value="cat1--sub2")
+    baker.make("ServiceSubCategory", value="cat10--sub1")
+
+    subcategories = get_enum(ServiceSubCategory)
+
+    assert [s.id for s in subcategories.with_prefix("cat1")] == [sub1.pk, sub2.pk]
+    assert subcategories.with_prefix("cat2") == []
+
+
+def test_enum_registry_is_invalidated_on_save(
+    monkeypatch, django_capture_on_commit_callbacks
+):
+    # pas de délai entre deux vérifications de la version
+    monkeypatch.setattr(enum_registry, "VERSION_CHECK_INTERVAL_SECONDS", 0)
+    cat = baker.make("ServiceCategory", value="cat1", label="Catégorie 1")
+
+    # registre d'un autre processus
+    other_registry = EnumRegistry()
+    assert other_registry.get(ServiceCategory).label(cat.pk) == "Catégorie 1"
+
+    cat.label = "Nouveau label"
+    with django_capture_on_commit_callbacks(execute=True):
+        cat.save()
+        # version inchangée tant que la transaction n'est pas validée
+        assert other_registry.get(ServiceCategory).label(cat.pk) == "Catégorie 1"
+
+    assert get_enum(ServiceCategory).label(cat.pk) == "Nouveau label"
+    assert other_registry.get(ServiceCategory).label(cat.pk) == "Nouveau label"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        cat.delete()
+    assert "cat1" not in other_registry.get(ServiceCategory)
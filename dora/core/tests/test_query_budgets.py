@@ -0,0 +1,139 @@
+import pytest
+from django.conf import settings
+from django.utils import timezone
+from model_bakery import baker
+
+from dora.admin_express.models import AdminDivisionType
+from dora.core.test_utils import (
+    assert_query_budget,
+    make_model,
+    make_published_service,
+    make_service,
+    make_structure,
+    make_user,
+)
+from dora.services.enums import ServiceStatus
+from dora.services.models import ServiceCategory, ServiceKind, ServiceSubCategory
+
+# Le nombre de requêtes SQL des endpoints de liste ne doit pas dépendre
+# du nombre d'éléments listés : chaque élément créé ici comporte les relations
+# lues par les serializers (modèle, antenne, thématiques, etc.).
+
+
+@pytest.fixture
+def staff_client(api_client):
+    api_client.force_authenticate(user=make_user(is_staff=True))
+    return api_client
+
+
+@pytest.fixture
+def di_client(api_client):
+    api_client.force_authenticate(user=make_user(email=settings.DATA_INCLUSION_EMAIL))
+    return api_client
+
+
+@pytest.fixture
+def category():
+    category, _ = ServiceCategory.objects.get_or_create(
+        value="famille", defaults={"label": "Famille"}
+    )
+    return category
+
+
+@pytest.fixture
+def subcategory():
+    subcategory, _ = ServiceSubCategory.objects.get_or_create(
+        value="famille--garde-enfants", defaults={"label": "Garde d'enfants"}
+    )
+    return subcategory
+
+
+def seed_branches(count):
+    parent = make_structure()
+    for _ in range(count):
+        make_structure(user=make_user(), parent=parent)
+
+
+def seed_services(category, subcategory):
+    model = make_model()
+
+    def seed(count):
+        for _ in range(count):
+            service = make_service(
+                status=ServiceStatus.PUBLISHED,
+                model=model,
+                structure=make_structure(parent=model.structure),
+                diffusion_zone_type=AdminDivisionType.COUNTRY,
+            )
+            service.categories.add(category)
+            service.subcategories.add(subcategory)
+
+    return seed
+
+
+def test_structures_list(api_client):
+    assert_query_budget(api_client, "/structures/", seed_branches)
+
+
+def test_services_list(api_client, category, subcategory):
+    assert_query_budget(api_client, "/services/", seed_services(category, subcategory))
+
+
+def test_structures_admin_list(staff_client):
+    def seed(count):
+        for _ in range(count):
+            structure = make_structure(user=make_user())
+            make_published_service(structure=structure)
+            make_service(structure=structure, status=ServiceStatus.DRAFT)
+
+    assert_query_budget(staff_client, "/structures-admin/", seed)
+
+
+def test_services_admin_list(staff_client, category, subcategory):
+    assert_query_budget(
+        staff_client, "/services-admin/", seed_services(category, subcategory)
+    )
+
+
+def test_bookmarks_list(api_client):
+    user = make_user()
+    api_client.force_authenticate(user=user)
+
+    def seed(count):
+        for _ in range(count):
+            baker.make("Bookmark", user=user, service=make_published_service())
+
+    assert_query_budget(api_client, "/bookmarks/", seed)
+
+
+def test_saved_searches_list(api_client, category, subcategory):
+    user = make_user()
+    api_client.force_authenticate(user=user)
+    kind, _ = ServiceKind.objects.get_or_create(
+        value="accompagnement", defaults={"label": "Accompagnement"}
+    )
+
+    def seed(count):
+        for _ in range(count):
+            saved_search = baker.make(
+                "SavedSearch",
+                user=user,
+                category=category,
+                city_code="58211",
+                # nombre de nouveaux services à jour : pas de recherche à la demande
+                new_services_count_date=timezone.localdate(),
+            )
+            saved_search.subcategories.add(subcategory)
+            saved_search.kinds.add(kind)
+
+    assert_query_budget(api_client, "/saved-searches/", seed)
+
+
+def test_api_structures_list(di_client):
+    assert_query_budget(di_client, "/api/v2/structures/", seed_branches)
+
+
+def test_api_services_list(di_client, category, subcategory):
+    assert_query_budget(
+        di_client, "/api/v2/services/", seed_services(category, subcategory)
+    )
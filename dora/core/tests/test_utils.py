@@ -1,3 +1,5 @@
+import contextvars
+import threading
 import unittest
 
 from dora.core import utils
@@ -39,3 +41,27 @@ class UtilsTestCase(unittest.TestCase):
                 expected_number,
                 utils.normalize_phone_number(input_number),
             )
+
+    def test_map_in_threads(self):
+        for max_workers in (1, 4):
+            self.assertEqual(
+                utils.map_in_threads(lambda x: x * 2, range(10), max_workers),
+                [x * 2 for x in range(10)],
+            )
+
+    def test_map_in_threads_context_and_errors(self):
+        var = contextvars.ContextVar("var")
+        var.set("valeur")
+        threads = set()
+
+        def func(x):
+            threads.add(threading.get_ident())
+            if x == 3:
+                raise ValueError("erreur")
+            return var.get()
+
+        self.assertEqual(utils.map_in_threads(func, range(3), 2), ["valeur"] * 3)
+        self.assertNotIn(threading.get_ident(), threads)
+
+        with self.assertRaisesRegex(ValueError, "erreur"):
+            utils.map_in_threads(func, range(10), 2)
@@ -1,9 +1,13 @@
+import contextvars
 import logging
 import re
-from typing import Tuple
+import threading
+from typing import Callable, Iterable, Tuple
 
+from django.db import connections
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.crypto import get_random_string
 from django.utils.text import Truncator
 
 logger = logging.getLogger(__name__)
@@ -50,3 +54,83 @@ def get_object_or_none(klass, *args, **kwargs):
         return get_object_or_404(klass, *args, **kwargs)
     except Http404:
         return None
+
+
+def map_in_threads(func: Callable, items: Iterable, max_workers: int = 1) -> list:
+    """Applique `func` à chaque élément, dans au plus `max_workers` threads.
+
+    Chaque thread utilise sa propre connexion à la base (fermée en fin de traitement)
+    et une copie du contexte (`contextvars`) de l'appelant.
+    Les résultats sont retournés dans l'ordre des éléments ; en cas d'erreur, plus aucun
+    élément n'est traité et la première exception est levée.
+    """
+    if max_workers <= 1:
+        return [func(item) for item in items]
+
+    pending = list(enumerate(items))
+    results = [None] * len(pending)
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    if errors or not pending:
+                        return
+                    idx, item = pending.pop(0)
+                try:
+                    results[idx] = func(item)
+                except Exception as ex:
+                    with lock:
+                        errors.append(ex)
+                    return
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=contextvars.copy_context().run, args=(worker,))
+        for _ in range(min(max_workers, len(pending)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+def make_unique_slugs(base_slugs: list[str], querysets: Iterable) -> list[str]:
+    """Équivalent de `make_unique_slug` pour un ensemble de slugs (imports en masse).
+
+    Les slugs déjà utilisés (dans l'un des `querysets`, ou dans la liste elle-même)
+    reçoivent un suffixe aléatoire : une requête par queryset et par tour.
+    """
+    querysets = list(querysets)
+    slugs = list(base_slugs)
+    to_check = list(range(len(slugs)))
+    while to_check:
+        candidates = {slugs[idx] for idx in to_check}
+        taken = set()
+        for queryset in querysets:
+            taken.update(
+                queryset.filter(slug__in=candidates).values_list("slug", flat=True)
+            )
+        checking = set(to_check)
+        seen = {slug for idx, slug in enumerate(slugs) if idx not in checking}
+        conflicts = []
+        for idx in to_check:
+            if slugs[idx] in taken or slugs[idx] in seen:
+                conflicts.append(idx)
+            else:
+                seen.add(slugs[idx])
+        for idx in conflicts:
+            slugs[idx] = (
+                base_slugs[idx]
+                + "-"
+                + get_random_string(4, "abcdefghijklmnopqrstuvwxyz")
+            )
+        to_check = conflicts
+    return slugs
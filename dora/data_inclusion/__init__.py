@@ -1,9 +1,17 @@
+from dora.data_inclusion.cache import (
+    CachedDataInclusionClient,
+    get_cache_stats,
+    reset_cache_stats,
+)
 from dora.data_inclusion.client import DataInclusionClient, di_client_factory
 from dora.data_inclusion.mappings import map_search_result, map_service
 
 __all__ = [
     "di_client_factory",
+    "CachedDataInclusionClient",
     "DataInclusionClient",
+    "get_cache_stats",
     "map_search_result",
     "map_service",
+    "reset_cache_stats",
 ]
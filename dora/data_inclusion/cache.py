@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+import requests
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "di-cache"
+
+# précision des coordonnées utilisées pour la clé de cache (~100m)
+COORDINATES_PRECISION = 3
+
+# compteurs exposés par `get_cache_stats`
+# (journalisés périodiquement par la commande `log_di_cache_stats`)
+HITS, MISSES, STALE_HITS = "hits", "misses", "stale_hits"
+
+
+def _normalize_list(values: Optional[list[str]]) -> Optional[list[str]]:
+    return sorted(set(values)) if values is not None else None
+
+
+def _make_key(kind: str, params: dict) -> str:
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{kind}:{digest}"
+
+
+def _incr_counter(name: str, delta: int = 1):
+    if not delta:
+        return
+    key = f"{CACHE_KEY_PREFIX}:stats:{name}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # clé expirée ou supprimée entre temps
+        pass
+
+
+def get_cache_stats() -> dict[str, int]:
+    """Compteurs d'utilisation du cache d·i (depuis la dernière remise à zéro)."""
+    keys = {
+        name: f"{CACHE_KEY_PREFIX}:stats:{name}" for name in (HITS, MISSES, STALE_HITS)
+    }
+    values = cache.get_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+def reset_cache_stats(stats: dict[str, int]):
+    """Retranche des compteurs les valeurs `stats` déjà relevées.
+
+    Les incréments survenus depuis le relevé sont conservés.
+    """
+    for name, value in stats.items():
+        _incr_counter(name, -value)
+
+
+class CachedDataInclusionClient:
+    """Cache des appels au client data.inclusion.
+
+    Enveloppe un ``DataInclusionClient`` (ou tout objet ayant la même interface)
+    et met en cache les résultats de ``search_services`` et ``retrieve_service``
+    dans le cache Django (Redis).
+
+    * les entrées restent fraîches pendant ``search_ttl`` / ``retrieve_ttl`` secondes,
+    * une entrée périmée reste disponible pendant ``stale_ttl`` secondes :
+      elle est rafraîchie par un seul appelant, et retournée en cas d'indisponibilité de d·i,
+    * un verrou évite que des appels identiques simultanés soient tous transmis à d·i :
+      si l'appel de son détenteur échoue, les appelants en attente obtiennent ``None``.
+
+    Les réponses en erreur (``None``) ne sont pas mises en cache.
+    """
+
+    def __init__(
+        self,
+        client,
+        search_ttl: int,
+        retrieve_ttl: int,
+        stale_ttl: int = 0,
+        lock_timeout: float = 5,
+    ) -> None:
+        self.client = client
+        self.search_ttl = search_ttl
+        self.retrieve_ttl = retrieve_ttl
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+
+    def __getattr__(self, name):
+        # les autres méthodes du client ne sont pas mises en cache
+        return getattr(self.client, name)
+
+    def _fetch_and_store(self, key: str, ttl: int, fetch: Callable):
+        value = fetch()
+        if value is not None:
+            cache.set(
+                key,
+                {"value": value, "expires_at": time.time() + ttl},
+                timeout=ttl + self.stale_ttl,
+            )
+        return value
+
+    def _wait_for_entry(self, key: str) -> Optional[dict]:
+        """Attend le résultat de l'appelant qui détient le verrou.
+
+        Retourne ``None`` si son appel à d·i a échoué ou n'a pas abouti à temps.
+        """
+        failed_key = f"{key}:failed"
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entries = cache.get_many([key, failed_key])
+            if key in entries:
+                return entries[key]
+            if failed_key in entries:
+                return None
+        return None
+
+    def _get_or_fetch(self, key: str, ttl: int, fetch: Callable):
+        if ttl <= 0:
+            return fetch()
+
+        entry = cache.get(key)
+
+        if entry is not None and entry["expires_at"] > time.time():
+            _incr_counter(HITS)
+            return entry["value"]
+
+        lock_key = f"{key}:lock"
+        got_lock = cache.add(lock_key, 1, timeout=self.lock_timeout)
+
+        if entry is not None:
+            # entrée périmée : un seul appelant la rafraîchit,
+            # les autres (et tous en cas d'erreur de d·i) utilisent l'ancienne valeur
+            _incr_counter(STALE_HITS)
+            if not got_lock:
+                return entry["value"]
+            try:
+                value = self._fetch_and_store(key, ttl, fetch)
+            except requests.RequestException as err:
+                logger.warning("d·i indisponible, utilisation du cache : %s", err)
+                value = None
+            finally:
+                cache.delete(lock_key)
+            return value if value is not None else entry["value"]
+
+        _incr_counter(MISSES)
+        if not got_lock:
+            # un appel identique est en cours : on attend son résultat,
+            # sans solliciter d·i une seconde fois s'il échoue (d·i indisponible)
+            entry = self._wait_for_entry(key)
+            return entry["value"] if entry is not None else None
+
+        # en cas d'échec, un marqueur de courte durée libère les appelants en attente
+        failed_key = f"{key}:failed"
+        cache.delete(failed_key)
+        try:
+            value = self._fetch_and_store(key, ttl, fetch)
+            if value is None:
+                cache.set(failed_key, 1, timeout=self.lock_timeout)
+            return value
+        except Exception:
+            cache.set(failed_key, 1, timeout=self.lock_timeout)
+            raise
+        finally:
+            cache.delete(lock_key)
+
+    def retrieve_service(self, source: str, id: str) -> Optional[dict]:
+        key = _make_key("retrieve", {"source": source, "id": id})
+        return self._get_or_fetch(
+            key,
+            self.retrieve_ttl,
+            lambda: self.client.retrieve_service(source=source, id=id),
+        )
+
+    def retrieve_services(
+        self, ids: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], Optional[dict]]:
+        if self.retrieve_ttl <= 0:
+            return self.client.retrieve_services(ids)
+
+        keys = {
+            (source, id): _make_key("retrieve", {"source": source, "id": id})
+            for source, id in ids
+        }
+        entries = cache.get_many(keys.values())
+        now = time.time()
+
+        results = {}
+        to_fetch = []
+        for source_and_id, key in keys.items():
+            entry = entries.get(key)
+            if entry is not None and entry["expires_at"] > now:
+                results[source_and_id] = entry["value"]
+            else:
+                to_fetch.append(source_and_id)
+
+        _incr_counter(HITS, len(results))
+        if not to_fetch:
+            return results
+
+        fetched = self.client.retrieve_services(to_fetch)
+        cache.set_many(
+            {
+                keys[source_and_id]: {
+                    "value": value,
+                    "expires_at": now + self.retrieve_ttl,
+                }
+                for source_and_id, value in fetched.items()
+                if value is not None
+            },
+            timeout=self.retrieve_ttl + self.stale_ttl,
+        )
+
+        num_stale_hits = 0
+        for source_and_id in to_fetch:
+            value = fetched.get(source_and_id)
+            stale_entry = entries.get(keys[source_and_id])
+            if value is None and stale_entry is not None:
+                value = stale_entry["value"]
+                num_stale_hits += 1
+            results[source_and_id] = value
+
+        _incr_counter(MISSES, len(to_fetch) - num_stale_hits)
+        _incr_counter(STALE_HITS, num_stale_hits)
+        return results
+
+    def search_services(
+        self,
+        sources: Optional[list[str]] = None,
+        code_insee: Optional[str] = None,
+        thematiques: Optional[list[str]] = None,
+        types: Optional[list[str]] = None,
+        frais: Optional[list[str]] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        max_items: Optional[int] = None,
+    ) -> Optional[list[dict]]:
+        # les paramètres sont normalisés avant d'être transmis à d·i,
+        # afin que le résultat corresponde toujours à la clé de cache
+        params = {
+            "sources": _normalize_list(sources),
+            "code_insee": code_insee,
+            "thematiques": _normalize_list(thematiques),
+            "types": _normalize_list(types),
+            "frais": _normalize_list(frais),
+            "lat": round(lat, COORDINATES_PRECISION) if lat is not None else None,
+            "lon": round(lon, COORDINATES_PRECISION) if lon is not None else None,
+            "max_items": max_items,
+        }
+        key = _make_key("search", params)
+        return self._get_or_fetch(
+            key,
+            self.search_ttl,
+            lambda: self.client.search_services(**params),
+        )
@@ -1,12 +1,15 @@
 import functools
+import itertools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from typing import Optional
+from typing import Iterator, Optional
 
 import furl
 import requests
 from django.conf import settings
 
+from .cache import CachedDataInclusionClient
 from .constants import THEMATIQUES_MAPPING_DORA_TO_DI
 
 logger = logging.getLogger(__name__)
@@ -21,10 +24,15 @@ def log_and_raise(resp: requests.Response, *args, **kwargs):
 
 
 def di_client_factory():
-    return DataInclusionClient(
-        base_url=settings.DATA_INCLUSION_URL,
-        token=settings.DATA_INCLUSION_STREAM_API_KEY,
-        timeout_seconds=settings.DATA_INCLUSION_TIMEOUT_SECONDS,
+    return CachedDataInclusionClient(
+        DataInclusionClient(
+            base_url=settings.DATA_INCLUSION_URL,
+            token=settings.DATA_INCLUSION_STREAM_API_KEY,
+            timeout_seconds=settings.DATA_INCLUSION_TIMEOUT_SECONDS,
+        ),
+        search_ttl=settings.DATA_INCLUSION_CACHE_SEARCH_TTL_SECONDS,
+        retrieve_ttl=settings.DATA_INCLUSION_CACHE_RETRIEVE_TTL_SECONDS,
+        stale_ttl=settings.DATA_INCLUSION_CACHE_STALE_TTL_SECONDS,
     )
 
 
@@ -44,6 +52,9 @@ def log_conn_error(func):
 
 
 class DataInclusionClient:
+    # nombre maximum de requêtes simultanées (pages, services)
+    max_concurrent_requests = 4
+
     def __init__(
         self, base_url: str, token: str, timeout_seconds: Optional[int] = None
     ) -> None:
@@ -60,20 +71,67 @@ class DataInclusionClient:
     def _get(self, url: furl.furl):
         return self.session.get(url, timeout=self.timeout_timedelta.total_seconds())
 
-    def _get_pages(self, url: furl.furl):
-        page = 1
-        data = []
-
-        while True:
-            next_url = url.copy().add({"page": page})
-            response = self._get(next_url)
-            response_data = response.json()
-            data += response_data["items"]
+    def _get_page(self, url: furl.furl, page: int) -> dict:
+        return self._get(url.copy().add({"page": page})).json()
+
+    def _iter_pages(
+        self, url: furl.furl, max_items: Optional[int] = None
+    ) -> Iterator[dict]:
+        """Itère sur les éléments de toutes les pages de résultats.
+
+        Le nombre de pages est lu dans les métadonnées de la première réponse
+        (`pages`), les pages suivantes sont alors récupérées en parallèle.
+        Les éléments sont retournés dans l'ordre des pages, au fur et à mesure
+        de leur arrivée, dans la limite de `max_items` éléments.
+
+        En l'absence de métadonnées de pagination, les pages sont parcourues
+        une à une jusqu'à l'obtention d'une page vide.
+        """
+        if max_items is not None and max_items <= 0:
+            return
+
+        first_page = self._get_page(url, 1)
+        if not first_page["items"]:
+            return
+
+        num_pages = first_page.get("pages")
+        executor = None
+
+        if num_pages is None:
+            # pas de métadonnées : parcours séquentiel jusqu'à une page vide
+            def next_pages():
+                for page in itertools.count(2):
+                    response_data = self._get_page(url, page)
+                    if not response_data["items"]:
+                        return
+                    yield response_data
+
+            pages = next_pages()
+        elif num_pages > 1:
+            executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrent_requests,
+                thread_name_prefix="di-pages",
+            )
+            pages = executor.map(
+                functools.partial(self._get_page, url), range(2, num_pages + 1)
+            )
+        else:
+            pages = []
 
-            if len(response_data["items"]) > 0:
-                page += 1
-            else:
-                return data
+        try:
+            num_items = 0
+            for response_data in itertools.chain([first_page], pages):
+                for item in response_data["items"]:
+                    yield item
+                    num_items += 1
+                    if max_items is not None and num_items >= max_items:
+                        return
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_pages(self, url: furl.furl, max_items: Optional[int] = None):
+        return list(self._iter_pages(url, max_items=max_items))
 
     @log_conn_error
     def list_services(self, source: Optional[str] = None) -> Optional[list[dict]]:
@@ -101,6 +159,35 @@ class DataInclusionClient:
         except requests.ReadTimeout:
             return None
 
+    def retrieve_services(
+        self, ids: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], Optional[dict]]:
+        """Récupère plusieurs services en parallèle, avec la même session HTTP.
+
+        Args:
+            ids: une liste de couples (source, id)
+
+        Returns:
+            Les services indexés par (source, id) : ``None`` si le service
+            est introuvable ou si d·i est en erreur.
+        """
+
+        def retrieve(source_and_id):
+            try:
+                return self.retrieve_service(*source_and_id)
+            except requests.RequestException:
+                return None
+
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrent_requests, len(ids)),
+            thread_name_prefix="di-retrieve",
+        ) as executor:
+            return dict(zip(ids, executor.map(retrieve, ids)))
+
     @log_conn_error
     def search_services(
         self,
@@ -111,6 +198,7 @@ class DataInclusionClient:
         frais: Optional[list[str]] = None,
         lat: Optional[float] = None,
         lon: Optional[float] = None,
+        max_items: Optional[int] = None,
     ) -> Optional[list[dict]]:
         url = self.base_url.copy()
         url = url / "search/services"
@@ -141,7 +229,7 @@ class DataInclusionClient:
             url.args["lon"] = lon
 
         try:
-            return self._get_pages(url)
+            return self._get_pages(url, max_items=max_items)
         except requests.HTTPError:
             return None
         except requests.ReadTimeout:
@@ -3,6 +3,7 @@ from django.conf import settings
 from django.utils import dateparse, timezone
 
 from dora.admin_express.models import AdminDivisionType
+from dora.core.enum_registry import get_enum
 from dora.core.utils import code_insee_to_code_dept
 from dora.services.enums import ServiceStatus
 from dora.services.models import (
@@ -120,18 +121,16 @@ def map_service(service_data: dict, is_authenticated: bool) -> dict:
             THEMATIQUES_MAPPING_DI_TO_DORA.get(thematique, thematique)
             for thematique in service_data["thematiques"]
         ]
-        categories = ServiceCategory.objects.filter(value__in=thematiques)
-        subcategories = ServiceSubCategory.objects.filter(value__in=thematiques)
+        categories = get_enum(ServiceCategory).filter(thematiques)
+        subcategories = get_enum(ServiceSubCategory).filter(thematiques)
 
     location_kinds = None
     if service_data["modes_accueil"] is not None:
-        location_kinds = LocationKind.objects.filter(
-            value__in=service_data["modes_accueil"]
-        )
+        location_kinds = get_enum(LocationKind).filter(service_data["modes_accueil"])
 
     kinds = None
     if service_data["types"] is not None:
-        kinds = ServiceKind.objects.filter(value__in=service_data["types"])
+        kinds = get_enum(ServiceKind).filter(service_data["types"])
 
     zone_diffusion_type = DI_TO_DORA_DIFFUSION_ZONE_TYPE_MAPPING.get(
         service_data["zone_diffusion_type"], None
@@ -166,14 +165,14 @@ def map_service(service_data: dict, is_authenticated: bool) -> dict:
 
     beneficiaries_access_modes = None
     if service_data["modes_orientation_beneficiaire"] is not None:
-        beneficiaries_access_modes = BeneficiaryAccessMode.objects.filter(
-            value__in=service_data["modes_orientation_beneficiaire"]
+        beneficiaries_access_modes = get_enum(BeneficiaryAccessMode).filter(
+            service_data["modes_orientation_beneficiaire"]
         )
 
     coach_orientation_modes = None
     if service_data["modes_orientation_accompagnateur"] is not None:
-        coach_orientation_modes = CoachOrientationMode.objects.filter(
-            value__in=service_data["modes_orientation_accompagnateur"]
+        coach_orientation_modes = get_enum(CoachOrientationMode).filter(
+            service_data["modes_orientation_accompagnateur"]
         )
 
     profils = None
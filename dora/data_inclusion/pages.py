@@ -0,0 +1,144 @@
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import furl
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+logger = logging.getLogger(__name__)
+
+"""
+Lecture paginée de l'API data·inclusion pour les imports (`import_data_inclusion`, `import_mednum`) :
+    - les pages sont chargées via une session HTTP réutilisée, avec nouvelles tentatives
+      (et délai croissant) en cas d'erreur de connexion ou d'erreur serveur,
+    - la page suivante est chargée en tâche de fond pendant le traitement de la page courante,
+    - un point de reprise (dernière page traitée, et état éventuel de l'import)
+      est enregistré dans le cache après le traitement de chaque page :
+      un import interrompu reprend à la page suivante.
+      Seuls les éléments ajoutés à l'état pendant la page sont enregistrés
+      (une clé par page) : l'état complet n'est pas réécrit après chaque page.
+      Le point de reprise est supprimé une fois toutes les pages traitées.
+"""
+
+CHECKPOINT_KEY_PREFIX = "di-import-checkpoint"
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600
+
+PAGE_SIZE = 100
+TIMEOUT_SECONDS = 30
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1
+
+
+def make_import_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    session.headers.update(
+        {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {settings.DATA_INCLUSION_IMPORT_API_KEY}",
+        }
+    )
+    return session
+
+
+class PageFetcher:
+    """Itère sur les pages (listes d'éléments) d'une ressource de l'API d·i.
+
+    - `checkpoint` : nom du point de reprise (pas de reprise si non défini),
+    - `state` : dictionnaire enregistré avec le point de reprise, et restauré à la reprise
+      (ex. : index des structures déjà lues) ; seuls les ajouts de clés sont enregistrés.
+    """
+
+    def __init__(
+        self,
+        url: furl.furl,
+        checkpoint: Optional[str] = None,
+        state: Optional[dict] = None,
+        session: Optional[requests.Session] = None,
+    ):
+        self.url = url
+        self.checkpoint_key = (
+            f"{CHECKPOINT_KEY_PREFIX}:{checkpoint}" if checkpoint else None
+        )
+        self.state = state if state is not None else {}
+        # nombre d'éléments de l'état déjà enregistrés
+        self._saved_state_size = 0
+        self.session = session or make_import_session()
+
+    def _state_key(self, page: int) -> str:
+        return f"{self.checkpoint_key}:state:{page}"
+
+    def get_checkpoint(self) -> int:
+        # dernière page traitée (0 si aucune)
+        if not self.checkpoint_key:
+            return 0
+        checkpoint = cache.get(self.checkpoint_key)
+        if not checkpoint:
+            return 0
+        page = checkpoint["page"]
+        keys = [self._state_key(num) for num in range(1, page + 1)]
+        states = cache.get_many(keys)
+        for key in keys:
+            self.state.update(states.get(key, {}))
+        self._saved_state_size = len(self.state)
+        return page
+
+    def save_checkpoint(self, page: int):
+        if not self.checkpoint_key:
+            return
+        # les éléments ajoutés pendant le traitement de la page
+        # (l'ordre d'insertion du dictionnaire est conservé)
+        new_state = dict(
+            itertools.islice(self.state.items(), self._saved_state_size, None)
+        )
+        if new_state:
+            cache.set(self._state_key(page), new_state, CHECKPOINT_TTL_SECONDS)
+        self._saved_state_size = len(self.state)
+        cache.set(self.checkpoint_key, {"page": page}, CHECKPOINT_TTL_SECONDS)
+
+    def clear_checkpoint(self):
+        if not self.checkpoint_key:
+            return
+        if checkpoint := cache.get(self.checkpoint_key):
+            cache.delete_many(
+                [self._state_key(num) for num in range(1, checkpoint["page"] + 1)]
+            )
+        cache.delete(self.checkpoint_key)
+
+    def fetch(self, page: int) -> list[dict]:
+        paginated_url = self.url.copy().add({"page": page})
+        logger.info("Chargement de %s", paginated_url)
+        response = self.session.get(paginated_url, timeout=TIMEOUT_SECONDS)
+        # erreur levée après les nouvelles tentatives : le point de reprise est conservé
+        response.raise_for_status()
+        return response.json()["items"]
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        page = self.get_checkpoint() + 1
+        if page > 1:
+            logger.info("Reprise de l'import à la page %s : %s", page, self.url)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            next_page = executor.submit(self.fetch, page)
+            while items := next_page.result():
+                # chargement de la page suivante pendant le traitement de la page courante
+                next_page = executor.submit(self.fetch, page + 1)
+                yield items
+                # la page a été traitée par l'appelant
+                self.save_checkpoint(page)
+                page += 1
+
+        self.clear_checkpoint()
@@ -85,6 +85,11 @@ class FakeDataInclusionClient:
             (s for s in self.services if s["source"] == source and s["id"] == id), None
         )
 
+    def retrieve_services(
+        self, ids: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], Optional[dict]]:
+        return {(source, id): self.retrieve_service(source, id) for source, id in ids}
+
     def search_services(
         self,
         sources: Optional[str] = None,
@@ -94,6 +99,7 @@ class FakeDataInclusionClient:
         frais: Optional[list[str]] = None,
         lat: Optional[float] = None,
         lon: Optional[float] = None,
+        max_items: Optional[int] = None,
     ) -> Optional[list[dict]]:
         services = self.services
 
@@ -140,6 +146,6 @@ class FakeDataInclusionClient:
                     "service": s,
                 }
                 for s in services
-            ]
+            ][:max_items]
         else:
-            return [{"distance": 30, "service": s} for s in services]
+            return [{"distance": 30, "service": s} for s in services][:max_items]
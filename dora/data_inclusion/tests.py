@@ -1,7 +1,20 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import furl
 import pytest
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from freezegun import freeze_time
+
+from dora.logs.models import ActionLog
 
+from .cache import CachedDataInclusionClient, get_cache_stats
+from .client import DataInclusionClient
 from .constants import THEMATIQUES_MAPPING_DI_TO_DORA
 from .mappings import map_service
+from .pages import CHECKPOINT_KEY_PREFIX, PageFetcher
 from .test_utils import FakeDataInclusionClient, make_di_service_data
 
 
@@ -50,3 +63,232 @@ def test_di_client_search_thematiques_mapping(thematiques_dora, thematiques_di):
     results = di_client.search_services(thematiques=thematiques_dora)
 
     assert len(results) == 1
+
+
+@pytest.fixture
+def di_client():
+    return DataInclusionClient(base_url="https://di.test/api/v0/", token="token")
+
+
+def mock_di_pages(requests_mock, pages, with_metadata=True):
+    # une page vide est ajoutée à la suite des pages de résultats
+    for num, items in enumerate([*pages, []], start=1):
+        data = {"items": items}
+        if with_metadata:
+            data |= {"total": sum(map(len, pages)), "page": num, "pages": len(pages)}
+        requests_mock.get(
+            f"https://di.test/api/v0/search/services?page={num}", json=data
+        )
+
+
+@pytest.mark.parametrize("with_metadata", [True, False])
+def test_di_client_search_fetches_all_pages(requests_mock, di_client, with_metadata):
+    pages = [[{"id": f"{p}-{i}"} for i in range(3)] for p in range(5)]
+    mock_di_pages(requests_mock, pages, with_metadata)
+
+    results = di_client.search_services()
+
+    # les résultats sont retournés dans l'ordre des pages
+    assert [r["id"] for r in results] == [s["id"] for page in pages for s in page]
+    # la page vide n'est demandée qu'en l'absence de métadonnées de pagination
+    assert requests_mock.call_count == (5 if with_metadata else 6)
+
+
+def test_di_client_search_max_items(requests_mock, di_client):
+    pages = [[{"id": f"{p}-{i}"} for i in range(3)] for p in range(5)]
+    mock_di_pages(requests_mock, pages)
+
+    results = di_client.search_services(max_items=4)
+
+    assert [r["id"] for r in results] == ["0-0", "0-1", "0-2", "1-0"]
+
+
+def test_di_client_iter_pages_is_lazy(requests_mock, di_client):
+    first_page = requests_mock.get(
+        "https://di.test/api/v0/services?page=1",
+        json={"items": [{"id": "a"}, {"id": "b"}], "pages": 1},
+    )
+
+    items = di_client._iter_pages(di_client.base_url / "services")
+    assert not first_page.called
+
+    assert next(items) == {"id": "a"}
+    assert first_page.call_count == 1
+
+
+class CountingDataInclusionClient(FakeDataInclusionClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_calls = 0
+        self.available = True
+        self.delay = 0
+
+    def search_services(self, **kwargs):
+        self.num_calls += 1
+        time.sleep(self.delay)
+        if not self.available:
+            raise requests.ConnectionError("d·i indisponible")
+        return super().search_services(**kwargs)
+
+    def retrieve_service(self, source, id):
+        self.num_calls += 1
+        return super().retrieve_service(source, id)
+
+
+@pytest.fixture
+def counting_di_client():
+    cache.clear()
+    client = CountingDataInclusionClient()
+    client.services.append(make_di_service_data(thematiques=["famille"]))
+    return client
+
+
+def test_cached_di_client_search(counting_di_client):
+    di_client = CachedDataInclusionClient(
+        counting_di_client, search_ttl=60, retrieve_ttl=60
+    )
+
+    results = di_client.search_services(
+        thematiques=["famille"], frais=["gratuit", "payant"], lat=48.85661, lon=2.35222
+    )
+    assert len(results) == 1
+    assert counting_di_client.num_calls == 1
+    assert get_cache_stats() == {"hits": 0, "misses": 1, "stale_hits": 0}
+
+    # même recherche, paramètres dans un ordre différent et coordonnées proches
+    assert (
+        di_client.search_services(
+            thematiques=["famille"],
+            frais=["payant", "gratuit"],
+            lat=48.85659,
+            lon=2.35218,
+        )
+        == results
+    )
+    assert counting_di_client.num_calls == 1
+    assert get_cache_stats()["hits"] == 1
+
+    di_client.search_services(thematiques=["numerique"])
+    assert counting_di_client.num_calls == 2
+
+
+def test_cached_di_client_retrieve(counting_di_client):
+    di_client = CachedDataInclusionClient(
+        counting_di_client, search_ttl=60, retrieve_ttl=60
+    )
+    service = counting_di_client.services[0]
+
+    for _ in range(3):
+        assert di_client.retrieve_service(service["source"], service["id"]) == service
+    assert counting_di_client.num_calls == 1
+
+    # les résultats vides ne sont pas mis en cache
+    for _ in range(2):
+        assert di_client.retrieve_service(service["source"], "inconnu") is None
+    assert counting_di_client.num_calls == 3
+
+
+def test_cached_di_client_serves_stale_results(counting_di_client):
+    di_client = CachedDataInclusionClient(
+        counting_di_client, search_ttl=60, retrieve_ttl=60, stale_ttl=3600
+    )
+
+    with freeze_time("2024-01-01 12:00"):
+        results = di_client.search_services(thematiques=["famille"])
+
+    # d·i devient indisponible après l'expiration de l'entrée
+    counting_di_client.available = False
+    with freeze_time("2024-01-01 12:05"):
+        assert di_client.search_services(thematiques=["famille"]) == results
+
+    assert counting_di_client.num_calls == 2
+    assert get_cache_stats()["stale_hits"] == 1
+
+
+def test_cached_di_client_concurrent_misses_with_di_down(counting_di_client):
+    di_client = CachedDataInclusionClient(
+        counting_di_client, search_ttl=60, retrieve_ttl=60, lock_timeout=5
+    )
+    counting_di_client.available = False
+    counting_di_client.delay = 0.3
+
+    def search(_):
+        try:
+            return di_client.search_services(thematiques=["famille"])
+        except requests.ConnectionError:
+            return "erreur"
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(search, range(4)))
+
+    # seul le détenteur du verrou a appelé d·i :
+    # les autres appelants n'attendent pas l'échéance du verrou pour abandonner
+    assert counting_di_client.num_calls == 1
+    assert sorted(results, key=str) == [None, None, None, "erreur"]
+    assert time.monotonic() - start < 5
+
+    # d·i est de nouveau disponible : l'échec n'est pas mis en cache
+    counting_di_client.available = True
+    counting_di_client.delay = 0
+    assert len(di_client.search_services(thematiques=["famille"])) == 1
+
+
+def test_log_di_cache_stats(counting_di_client):
+    di_client = CachedDataInclusionClient(
+        counting_di_client, search_ttl=60, retrieve_ttl=60
+    )
+    for _ in range(3):
+        di_client.search_services(thematiques=["famille"])
+
+    call_command("log_di_cache_stats")
+
+    log = ActionLog.objects.get(msg="di_cache:stats")
+    assert log.payload == {"hits": 2, "misses": 1, "stale_hits": 0}
+    # les compteurs repartent de zéro après chaque relevé
+    assert get_cache_stats() == {"hits": 0, "misses": 0, "stale_hits": 0}
+
+
+@pytest.fixture
+def page_fetcher_url(requests_mock):
+    url = furl.furl("https://di.test/api/v0/structures/")
+    for num, items in enumerate([[{"id": "a"}], [{"id": "b"}], []], start=1):
+        requests_mock.get(f"{url}?page={num}", json={"items": items})
+    PageFetcher(url, checkpoint="test").clear_checkpoint()
+    return url
+
+
+def test_page_fetcher_resumes_from_checkpoint(page_fetcher_url):
+    state = {}
+    pages = iter(PageFetcher(page_fetcher_url, checkpoint="test", state=state))
+
+    assert next(pages) == [{"id": "a"}]
+    state["a"] = 1
+    assert next(pages) == [{"id": "b"}]
+    # seuls les ajouts à l'état pendant la page sont enregistrés
+    assert cache.get(f"{CHECKPOINT_KEY_PREFIX}:test") == {"page": 1}
+    assert cache.get(f"{CHECKPOINT_KEY_PREFIX}:test:state:1") == {"a": 1}
+    state["b"] = 2
+    # interruption pendant le traitement de la seconde page
+    pages.close()
+
+    resumed_state = {}
+    resumed = PageFetcher(page_fetcher_url, checkpoint="test", state=resumed_state)
+    assert list(resumed) == [[{"id": "b"}]]
+    assert resumed_state == {"a": 1}
+
+    # import terminé : le point de reprise est supprimé
+    assert list(PageFetcher(page_fetcher_url, checkpoint="test")) == [
+        [{"id": "a"}],
+        [{"id": "b"}],
+    ]
+    assert cache.get(f"{CHECKPOINT_KEY_PREFIX}:test:state:1") is None
+
+
+def test_page_fetcher_keeps_checkpoint_on_error(requests_mock, page_fetcher_url):
+    requests_mock.get(f"{page_fetcher_url}?page=2", status_code=500)
+
+    with pytest.raises(requests.HTTPError):
+        list(PageFetcher(page_fetcher_url, checkpoint="test"))
+
+    assert PageFetcher(page_fetcher_url, checkpoint="test").get_checkpoint() == 1
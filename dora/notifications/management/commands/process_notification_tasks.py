@@ -4,6 +4,7 @@ import time
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from dora.core.utils import map_in_threads
 from dora.notifications.tasks.core import Task
 
 """
@@ -18,6 +19,12 @@ d'environnement sur l'environnement cible :
     - NOTIFICATIONS_ENABLED    : notifications activées seulement si `true` (par défaut: non)
     - NOTIFICATIONS_TASK_TYPES : sélectionne les notifications à lancer, équivalent de `--types` (défaut: tous les types activés)
     - NOTIFICATIONS_LIMIT      : nombre limite de notifications traitées en une fois pour chaque tâche (défaut: 0, pas de limite)
+    - NOTIFICATIONS_PARALLEL_TASKS : nombre de tâches exécutées simultanément, équivalent de `--parallel` (défaut: 1)
+    - NOTIFICATIONS_TASK_WORKERS   : nombre de threads traitant les notifications d'une tâche, équivalent de `--workers` (défaut: 1)
+
+Les notifications sont réservées par lots le temps du traitement (voir `Task.run`) :
+deux exécutions simultanées de la commande n'envoient pas deux fois la même notification,
+et les compteurs sont enregistrés après chaque lot.
 
 Ces variables sont définies dans les `settings` de Django.
 """
@@ -60,6 +67,20 @@ class Command(BaseCommand):
             default=settings.NOTIFICATIONS_TASK_TYPES,
         )
 
+        parser.add_argument(
+            "--parallel",
+            type=int,
+            help="Nombre de tâches exécutées simultanément",
+            default=settings.NOTIFICATIONS_PARALLEL_TASKS,
+        )
+
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Nombre de threads traitant les notifications de chaque tâche",
+            default=settings.NOTIFICATIONS_TASK_WORKERS,
+        )
+
         parser.add_argument(
             "--force",
             action="store_true",
@@ -80,6 +101,8 @@ class Command(BaseCommand):
         wet_run = options["wet_run"]
         limit = options["limit"]
         types = options["types"]
+        parallel = max(options["parallel"], 1)
+        workers = max(options["workers"], 1)
 
         if wet_run:
             self.stdout.write(self.style.WARNING("PRODUCTION RUN"))
@@ -106,6 +129,13 @@ class Command(BaseCommand):
                 self.style.WARNING(f" - limite de notifications par tâche : {limit}")
             )
 
+        if parallel > 1 or workers > 1:
+            self.stdout.write(
+                self.style.WARNING(
+                    f" - tâches simultanées : {parallel}, threads par tâche : {workers}"
+                )
+            )
+
         self.stdout.write()
 
         if not Task.registered_tasks():
@@ -113,7 +143,7 @@ class Command(BaseCommand):
             return
 
         # Par défaut, tous les types de tâches enregistrés sont sélectionnés
-        selected_types = Task.registered_tasks()
+        selected_types = list(Task.registered_tasks())
 
         if types:
             selected_types = [
@@ -130,27 +160,55 @@ class Command(BaseCommand):
             )
             return
 
-        total_timer = 0
+        # les tâches exécutées simultanément se partagent le débit d'envoi des courriels
+        rate_limit = settings.EMAIL_RATE_LIMIT / min(parallel, len(selected_types))
 
-        for task_class in selected_types:
+        def run_task(task_class):
             task = task_class()
+            nb_candidates = task.candidates().count()
 
+            timer = time.time()
+            ok, errors, obsolete = task.run(
+                strict=True,
+                dry_run=not wet_run,
+                limit=limit,
+                workers=workers,
+                rate_limit=rate_limit,
+            )
+            timer = time.time() - timer
+
+            if wet_run:
+                logger.info(
+                    f"process_notification_tasks:{task_class.task_type()}",
+                    {
+                        "taskType": task_class.task_type(),
+                        "nbCandidates": nb_candidates,
+                        "nbProcessed": ok,
+                        "nbObsolete": obsolete,
+                        "nbErrors": errors,
+                        "nbWorkers": workers,
+                        "processingTimeSecs": round(timer, 2),
+                        "throughput": round(ok / timer, 2) if timer else 0,
+                    },
+                )
+
+            return nb_candidates, ok, errors, obsolete, timer
+
+        total_timer = time.time()
+        results = map_in_threads(run_task, selected_types, parallel)
+        total_timer = time.time() - total_timer
+
+        for task_class, (nb_candidates, ok, errors, obsolete, timer) in zip(
+            selected_types, results
+        ):
             self.stdout.write(
                 self.style.NOTICE(
                     f"> {task_class.__name__} ({task_class.task_type()}) :"
                 )
             )
             self.stdout.write(
-                self.style.WARNING(
-                    f" > nombre d'éléments candidats : {len(task.candidates())}"
-                )
-            )
-
-            timer = time.time()
-            ok, errors, obsolete = task.run(
-                strict=True, dry_run=not wet_run, limit=limit
+                self.style.WARNING(f" > nombre d'éléments candidats : {nb_candidates}")
             )
-            timer = time.time() - timer
 
             if ok:
                 self.stdout.write(
@@ -158,7 +216,6 @@ class Command(BaseCommand):
                         f" > {ok} notification(s) traitée(s) en {timer:.2f}s"
                     )
                 )
-                total_timer += timer
             else:
                 self.stdout.write(" > aucune notification traitée")
 
@@ -180,17 +237,15 @@ class Command(BaseCommand):
 
             self.stdout.write()
 
-            if wet_run:
-                logger.info(
-                    f"process_notification_tasks:{task_class.task_type()}",
-                    {
-                        "taskType": task_class.task_type(),
-                        "nbCandidates": len(task.candidates()),
-                        "nbProcessed": ok,
-                        "nbObsolete": obsolete,
-                        "nbErrors": errors,
-                        "processingTimeSecs": round(timer, 2),
-                    },
-                )
+        if wet_run:
+            logger.info(
+                "process_notification_tasks",
+                {
+                    "nbTasks": len(selected_types),
+                    "nbParallelTasks": parallel,
+                    "nbProcessed": sum(result[1] for result in results),
+                    "processingTimeSecs": round(total_timer, 2),
+                },
+            )
 
         self.stdout.write(self.style.NOTICE(f"Terminé en {total_timer:.2f}s !"))
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0006_alter_notificationlog_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="claimed_until",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="réservée jusqu'au"
+            ),
+        ),
+    ]
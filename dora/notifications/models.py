@@ -56,6 +56,10 @@ class Notification(NotificationMixin):
     expires_at = models.DateTimeField(
         null=True, blank=True, verbose_name="date d'expiration"
     )
+    # réservation par une exécution de la tâche en cours (voir `Task.run`)
+    claimed_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="réservée jusqu'au"
+    )
 
     # propriétaires potentiels :
     # chaque type de propriétaire de notification doit avoir :
@@ -161,6 +165,32 @@ class Notification(NotificationMixin):
             counter=self.counter,
         ).save()
 
+    @classmethod
+    def bulk_trigger(cls, notifications: list["Notification"]):
+        # équivalent de `trigger` pour un ensemble de notifications (sans validation) :
+        # une requête pour les compteurs, une pour l'historique
+        if not notifications:
+            return
+
+        now = timezone.now()
+        for notification in notifications:
+            notification.updated_at = now
+            notification.counter += 1
+
+        cls.objects.bulk_update(notifications, ["updated_at", "counter"])
+        NotificationLog.objects.bulk_create(
+            [
+                NotificationLog(
+                    notification=notification,
+                    owner=str(notification.owner)[:150],
+                    task_type=notification.task_type,
+                    status=notification.status,
+                    counter=notification.counter,
+                )
+                for notification in notifications
+            ]
+        )
+
     def complete(self):
         if self.status in (NotificationStatus.COMPLETE, NotificationStatus.EXPIRED):
             return
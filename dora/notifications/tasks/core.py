@@ -1,7 +1,28 @@
 import abc
-
-from django.db import models
-
+import operator
+import threading
+from datetime import datetime, timedelta
+from functools import partial, reduce
+from typing import Optional
+
+from dateutil.relativedelta import relativedelta
+from django.db import models, transaction
+from django.db.models import (
+    DateTimeField,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    Func,
+    OuterRef,
+    Q,
+    Value,
+)
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from dora.core.emails import EmailDispatcher
+from dora.core.utils import map_in_threads
 from dora.notifications.enums import NotificationStatus, TaskType
 from dora.notifications.models import Notification
 
@@ -13,6 +34,9 @@ Tasks:
         - `should_trigger` : contient l'implémentation de la planification de la tâche,
         - `process` : enrobe l'action à effectuer si une notification est déclenchée.
 
+    Plutôt que d'implémenter `should_trigger`, une tâche peut déclarer sa planification
+    via `trigger_schedule` : les notifications à déclencher sont alors sélectionnées en SQL.
+
     `run` effectue principalement 3 opérations :
         - marquage des notifications obsolètes : pour les objets qui ne sont plus des "candidats",
         - création des nouvelles notifications : en vérifiant si il existe toujours une
@@ -24,10 +48,32 @@ Tasks:
 """
 
 
+# nombre de notifications réservées et enregistrées à la fois
+BATCH_SIZE = 100
+# durée de la réservation d'un lot (libéré après traitement, ou à expiration
+# si l'exécution est interrompue)
+CLAIM_DURATION = timedelta(hours=1)
+
+
 class TaskError(Exception):
     pass
 
 
+def _interval(delay: relativedelta | timedelta) -> Func:
+    # délai sous forme d'intervalle PostgreSQL
+    if isinstance(delay, timedelta):
+        delay = relativedelta(days=delay.days, seconds=delay.seconds)
+    delay = delay.normalized()
+    return Func(
+        Value(
+            f"{delay.years} years {delay.months} months {delay.days} days "
+            f"{delay.hours} hours {delay.minutes} minutes {delay.seconds} seconds"
+        ),
+        template="%(expressions)s::interval",
+        output_field=DurationField(),
+    )
+
+
 class Task(abc.ABC):
     _registered_tasks = set()
 
@@ -44,10 +90,43 @@ class Task(abc.ABC):
         pass
 
     @classmethod
-    @abc.abstractmethod
+    def trigger_schedule(cls) -> Optional[dict[int, relativedelta | timedelta]]:
+        # planification des déclenchements : pour chaque valeur du compteur,
+        # délai depuis la création de la notification
+        return None
+
+    @classmethod
     def should_trigger(cls, notification: Notification) -> bool:
         # indique si cette notification doit être déclenchée (code)
-        pass
+        schedule = cls.trigger_schedule()
+        if schedule is None:
+            raise NotImplementedError(
+                "`should_trigger` ou `trigger_schedule` doit être implémentée"
+            )
+        delay = schedule.get(notification.counter)
+        return delay is not None and notification.created_at + delay <= timezone.now()
+
+    @classmethod
+    def trigger_filter(cls, now: datetime) -> Optional[Q]:
+        # équivalent SQL de `should_trigger`, si la tâche déclare sa planification :
+        # l'arithmétique des intervalles PostgreSQL est celle de `relativedelta`
+        schedule = cls.trigger_schedule()
+        if schedule is None:
+            return None
+        return reduce(
+            operator.or_,
+            (
+                Q(counter=counter)
+                & LessThanOrEqual(
+                    ExpressionWrapper(
+                        F("created_at") + _interval(delay),
+                        output_field=DateTimeField(),
+                    ),
+                    Value(now),
+                )
+                for counter, delay in schedule.items()
+            ),
+        )
 
     @classmethod
     @abc.abstractmethod
@@ -107,47 +186,66 @@ class Task(abc.ABC):
 
         return n
 
-    def _create_run_querysets(self) -> tuple[models.QuerySet, models.QuerySet]:
+    def _create_run_querysets(self) -> tuple[list[Notification], models.QuerySet]:
         # création des querysets nécessaires à l'execution
         # le plus tard possible pour éviter des modifications entre
         # la création de la tâche et l'exécution proprement dites
         current_candidates = self.candidates()
 
-        # liste des objets déjà rattachés à une notification active :
-        notifications_already_created = Notification.objects.filter(
-            task_type=self.task_type()
-        )
-        objects_with_notification = models.QuerySet(
-            model=current_candidates.model
-        ).filter(
-            pk__in=notifications_already_created.values_list(self._model_key, flat=True)
-        )
+        # notifications de ce type de tâche
+        task_notifications = Notification.objects.filter(task_type=self.task_type())
 
-        # liste des objets non concernés par une notification :
-        obsolete_objects = objects_with_notification.difference(
-            current_candidates
-        ).values_list("pk", flat=True)
-        # le queryset est filtré dynamiquement sur le type de modèles des objets candidats
-        # on ne garde que les notifications actives
-        diff = {self._model_key + "__in": obsolete_objects}
-        obsolete_notifications = notifications_already_created.pending().filter(**diff)
+        # notifications actives des objets n'étant plus candidats (anti-jointure) :
+        obsolete_notifications = task_notifications.pending().exclude(
+            **{f"{self._model_key}__in": current_candidates.values("pk")}
+        )
 
-        # notifications à créer pour les nouveaux candidats :
+        # notifications à créer pour les candidats sans notification (anti-jointure) :
         new_candidates = [
-            self._new_notification(obj)
-            for obj in current_candidates.difference(objects_with_notification)
+            self._new_notification_for_id(pk)
+            for pk in current_candidates.exclude(
+                Exists(task_notifications.filter(**{self._model_key: OuterRef("pk")}))
+            ).values_list("pk", flat=True)
         ]
 
         # - les notifications devant être créées
         # - les notifications actuellement obsolètes (à clore)
         return new_candidates, obsolete_notifications
 
+    def _new_notification_for_id(self, owner_id) -> Notification:
+        # comme `_new_notification`, à partir de la clé primaire du propriétaire
+        return Notification(task_type=self.task_type(), **{self._model_key: owner_id})
+
+    def _claim(self, notifications: models.QuerySet, pks: list) -> list[Notification]:
+        # réserve les notifications encore à traiter parmi `pks` :
+        # une exécution simultanée ignore les notifications réservées ou verrouillées
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                notifications.filter(pk__in=pks)
+                .filter(Q(claimed_until=None) | Q(claimed_until__lt=now))
+                .select_for_update(skip_locked=True, of=("self",))
+            )
+            Notification.objects.filter(pk__in=[n.pk for n in batch]).update(
+                claimed_until=now + CLAIM_DURATION
+            )
+        return batch
+
     def run(
-        self, *, strict=True, dry_run=False, limit=None, **kwargs
+        self,
+        *,
+        strict=True,
+        dry_run=False,
+        limit=None,
+        workers=1,
+        rate_limit=None,
+        **kwargs,
     ) -> tuple[int, int, int]:
         # - `strict`: lève une exception à la première erreur de traitement (par défaut)
         # - `dry_run`: un tour pour pour rien
         # - `limit` : nombre de notifications à traiter (toutes par défaut)
+        # - `workers` : nombre de threads traitant les notifications (1 par défaut)
+        # - `rate_limit` : nombre maximal de courriels envoyés par seconde (voir `EmailDispatcher`)
         # retourne le nombre de notifications correctement traitées, en erreur et obsolètes
         if limit is not None:
             if not isinstance(limit, int):
@@ -165,40 +263,109 @@ class Task(abc.ABC):
                 )
 
             # création des nouvelles notifications
+            # (éventuellement déjà créées par une exécution simultanée)
             if new_candidates:
-                Notification.objects.bulk_create(new_candidates)
+                Notification.objects.bulk_create(new_candidates, ignore_conflicts=True)
 
         # traitement des notifications actives et en attente :
         notifications = (
             Notification.objects.pending()
             .filter(task_type=self.task_type())
-            .order_by("updated_at")
+            .select_related(self._model_key.removesuffix("_id"))
         )
 
+        # sélection en SQL des notifications à déclencher, si possible
+        # (`should_trigger` reste vérifiée pour chaque notification)
+        if (trigger_filter := self.trigger_filter(timezone.now())) is not None:
+            notifications = notifications.filter(trigger_filter)
+
         # notifications ordonnées par date de maj en cas d'utilisation de la limite
-        notifications = notifications[:limit] if limit else notifications
+        notifications = notifications.order_by("updated_at")
+        selected = notifications[:limit] if limit else notifications
 
-        for n in notifications:
-            if self.should_trigger(n):
+        if dry_run:
+            for n in selected:
+                if self.should_trigger(n):
+                    ok += 1
+            return ok, errors, nb_obsolete
+
+        triggered = []
+        # erreurs d'envoi, levées après l'envoi des courriels du lot en mode strict
+        # (les actions du `EmailDispatcher` ne doivent pas lever d'exception)
+        send_failures = []
+        lock = threading.Lock()
+
+        def on_sent(n: Notification):
+            nonlocal ok
+            # si tout s'est bien passé (courriels compris), la notification
+            # sera marquée comme ayant été activée (incrément du compteur)
+            with lock:
+                triggered.append(n)
+                ok += 1
+
+        def on_failed(n: Notification, ex: Exception):
+            nonlocal errors
+            with lock:
+                send_failures.append((n, ex))
+                errors += 1
+
+        def process(n: Notification):
+            nonlocal errors
+            if not self.should_trigger(n):
+                return
+            try:
+                with dispatcher.on_sent(
+                    partial(on_sent, n), on_failed=partial(on_failed, n)
+                ):
+                    self.process(self._check(n))
+            except Exception as ex:
+                if strict:
+                    # mode strict (par défaut) : on sort à la première exception
+                    raise TaskError(
+                        f"Erreur d'exécution de l'action pour : {n}"
+                    ) from ex
+                with lock:
+                    errors += 1
+
+        # les notifications sont traitées par lots : chaque lot est réservé
+        # (transaction courte), traité sans transaction ouverte (les actions
+        # peuvent modifier les notifications depuis d'autres threads), puis
+        # les compteurs et l'historique du lot sont enregistrés
+        pks = list(selected.values_list("pk", flat=True))
+
+        # les courriels envoyés lors du traitement sont groupés (voir `EmailDispatcher`) :
+        # une notification n'est marquée comme activée qu'une fois ses courriels envoyés
+        with EmailDispatcher(
+            f"notifications:{self.task_type()}", rate_limit=rate_limit
+        ) as dispatcher:
+            for idx in range(0, len(pks), BATCH_SIZE):
+                batch = self._claim(notifications, pks[idx : idx + BATCH_SIZE])
+                failure = None
                 try:
-                    if not dry_run:
-                        self.process(self._check(n))
-                except Exception as ex:
-                    if strict:
-                        # mode strict (par défaut) : on sort à la première exception
+                    map_in_threads(process, batch, workers)
+                    dispatcher.flush()
+                    if strict and send_failures:
+                        n, ex = send_failures[0]
                         raise TaskError(
-                            f"Erreur d'exécution de l'action pour : {n}"
+                            f"Erreur d'envoi du courriel pour : {n}"
                         ) from ex
-                    errors += 1
-                else:
-                    if not dry_run:
-                        # si tout s'est bien passé, on marque la notification comme ayant
-                        # été activée (incrément du compteur)
-                        n.trigger()
-
-                        # traitement à posteriori
-                        self.post_process(n)
-                    ok += 1
+                except Exception as ex:
+                    # levée après la mise à jour des notifications traitées
+                    failure = ex
+
+                with transaction.atomic():
+                    Notification.bulk_trigger(triggered)
+                    Notification.objects.filter(pk__in=[n.pk for n in batch]).update(
+                        claimed_until=None
+                    )
+
+                # traitement à posteriori, une fois les notifications libérées
+                for n in triggered:
+                    self.post_process(n)
+                triggered.clear()
+
+                if failure is not None:
+                    raise failure
 
         # (traitées correctement, en erreur, obsolètes / objet candidat sorti du scope)
         return ok, errors, nb_obsolete
@@ -36,26 +36,16 @@ class InvitedUsersTask(Task):
         )
 
     @classmethod
-    def should_trigger(cls, notification: Notification) -> bool:
-        now = timezone.now()
-
-        match notification.counter:
-            case 0:
-                return notification.created_at + relativedelta(days=1) <= now
-            case 1:
-                return notification.created_at + relativedelta(days=5) <= now
-            case 2:
-                return notification.created_at + relativedelta(days=10) <= now
-            case 3:
-                return notification.created_at + relativedelta(days=15) <= now
-            case 4:
-                return notification.created_at + relativedelta(days=20) <= now
-            case 5:
-                return notification.created_at + relativedelta(days=90) <= now
-            case 6:
-                return notification.created_at + relativedelta(days=120) <= now
-            case _:
-                return False
+    def trigger_schedule(cls):
+        return {
+            0: relativedelta(days=1),
+            1: relativedelta(days=5),
+            2: relativedelta(days=10),
+            3: relativedelta(days=15),
+            4: relativedelta(days=20),
+            5: relativedelta(days=90),
+            6: relativedelta(days=120),
+        }
 
     @classmethod
     def process(cls, notification: Notification):
@@ -150,20 +140,13 @@ class SelfInvitedUsersTask(Task):
         )
 
     @classmethod
-    def should_trigger(cls, notification: Notification) -> bool:
-        now = timezone.now()
-
-        match notification.counter:
-            case 0:
-                return notification.created_at + relativedelta(days=1) <= now
-            case 1:
-                return notification.created_at + relativedelta(days=3) <= now
-            case 2:
-                return notification.created_at + relativedelta(days=5) <= now
-            case 3:
-                return notification.created_at + relativedelta(days=7) <= now
-            case _:
-                return False
+    def trigger_schedule(cls):
+        return {
+            0: relativedelta(days=1),
+            1: relativedelta(days=3),
+            2: relativedelta(days=5),
+            3: relativedelta(days=7),
+        }
 
     @classmethod
     def process(cls, notification: Notification):
@@ -26,22 +26,14 @@ class OrphanStructuresTask(Task):
         return Structure.objects.orphans().exclude(email="")
 
     @classmethod
-    def should_trigger(cls, notification: Notification) -> bool:
-        now = timezone.now()
-
-        # il y a plus concis, mais cette version est plus lisible :
+    def trigger_schedule(cls):
         # une notification tout de suite, puis 3 notifications à 2 semaines d'intervalle
-        match notification.counter:
-            case 0:
-                return notification.created_at < now
-            case 1:
-                return notification.created_at + timedelta(weeks=2) <= now
-            case 2:
-                return notification.created_at + timedelta(weeks=4) <= now
-            case 3:
-                return notification.created_at + timedelta(weeks=6) <= now
-            case _:
-                return False
+        return {
+            0: timedelta(),
+            1: timedelta(weeks=2),
+            2: timedelta(weeks=4),
+            3: timedelta(weeks=6),
+        }
 
     @classmethod
     def process(cls, notification: Notification):
@@ -78,23 +70,14 @@ class StructureServiceActivationTask(Task):
         )
 
     @classmethod
-    def should_trigger(cls, notification: Notification) -> bool:
-        now = timezone.now()
-        match notification.counter:
-            # note : `dateutil.relativedelta` utilisé pour plus de clarté,
-            # mais `timedelta` exprimé en semaines est possible aussi
-            case 0:
-                return notification.created_at <= now
-            case 1:
-                return notification.created_at + relativedelta(months=1) <= now
-            case 2:
-                return notification.created_at + relativedelta(months=2) <= now
-            case 3:
-                return notification.created_at + relativedelta(months=3) <= now
-            case 4:
-                return notification.created_at + relativedelta(months=4) <= now
-            case _:
-                return False
+    def trigger_schedule(cls):
+        return {
+            0: relativedelta(),
+            1: relativedelta(months=1),
+            2: relativedelta(months=2),
+            3: relativedelta(months=3),
+            4: relativedelta(months=4),
+        }
 
     @classmethod
     def process(cls, notification: Notification):
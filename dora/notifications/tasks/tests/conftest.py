@@ -1,6 +1,10 @@
+from datetime import timedelta
+
 import pytest
+from dateutil.relativedelta import relativedelta
 from django.db import models
 
+from dora.core.emails import send_mail
 from dora.notifications.models import Notification
 from dora.structures.models import Structure
 
@@ -62,3 +66,54 @@ def fake_task():
 @pytest.fixture
 def structure_task():
     return StructureTask()
+
+
+class CompletingStructureTask(StructureTask):
+    @classmethod
+    def process(cls, notification):
+        # modification de la notification pendant le traitement
+        # (comme la plupart des tâches réelles)
+        notification.complete()
+
+
+@pytest.fixture
+def completing_structure_task():
+    return CompletingStructureTask()
+
+
+class MailingStructureTask(StructureTask):
+    @classmethod
+    def process(cls, notification):
+        send_mail(
+            "Erreur" if notification.counter == 7 else "OK",
+            "test@example.com",
+            "<p>Test</p>",
+        )
+
+
+@pytest.fixture
+def mailing_structure_task():
+    return MailingStructureTask()
+
+
+class ScheduledStructureTask(Task):
+    @classmethod
+    def task_type(cls):
+        return "generic_task"
+
+    @classmethod
+    def candidates(cls):
+        return Structure.objects.filter(members=None)
+
+    @classmethod
+    def trigger_schedule(cls):
+        return {0: relativedelta(), 1: relativedelta(months=1), 2: timedelta(weeks=2)}
+
+    @classmethod
+    def process(cls, notification):
+        print("processed scheduled structure!")
+
+
+@pytest.fixture
+def scheduled_structure_task():
+    return ScheduledStructureTask()
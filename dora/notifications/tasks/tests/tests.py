@@ -1,8 +1,18 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
 import pytest
+from dateutil.relativedelta import relativedelta
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connections, transaction
+from django.utils import timezone
+from freezegun import freeze_time
 
 from dora.core.test_utils import make_structure, make_user
 from dora.notifications.enums import NotificationStatus
-from dora.notifications.models import Notification
+from dora.notifications.models import Notification, NotificationLog
 from dora.structures.models import Structure
 
 from ..core import Task, TaskError
@@ -237,3 +247,180 @@ def test_post_process(structure_task):
     n = structure_task._new_notification(owner=make_structure(), counter=43)
     with pytest.raises(Exception, match="post-process failed"):
         structure_task.post_process(n)
+
+
+@pytest.mark.parametrize(
+    "counter,delay,expected",
+    [
+        (0, relativedelta(), True),
+        (1, relativedelta(days=28), False),
+        (1, relativedelta(months=1), True),
+        (2, timedelta(days=13), False),
+        (2, timedelta(weeks=2), True),
+        (3, relativedelta(years=1), False),
+    ],
+)
+def test_trigger_filter(scheduled_structure_task, counter, delay, expected):
+    # la sélection SQL doit être équivalente à `should_trigger`
+    with freeze_time("2024-01-31 12:00"):
+        n = scheduled_structure_task._new_notification(
+            owner=make_structure(), counter=counter
+        )
+        n.save()
+
+    with freeze_time(n.created_at + delay):
+        now = timezone.now()
+        selected = Notification.objects.filter(
+            scheduled_structure_task.trigger_filter(now)
+        ).exists()
+
+        assert scheduled_structure_task.should_trigger(n) == expected
+        assert selected == expected
+
+
+def test_run_triggers_in_bulk(scheduled_structure_task):
+    notifications = [
+        scheduled_structure_task._new_notification(owner=make_structure())
+        for _ in range(3)
+    ]
+    for n in notifications:
+        n.save()
+    # pas encore déclenchable
+    notifications[0].counter = 1
+    notifications[0].save()
+
+    ok, errors, obsolete = scheduled_structure_task.run()
+
+    assert (ok, errors, obsolete) == (2, 0, 0)
+    assert sorted(Notification.objects.values_list("counter", flat=True)) == [1, 1, 1]
+    assert NotificationLog.objects.filter(counter=1).count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_with_workers(structure_task):
+    for _ in range(5):
+        structure_task._new_notification(owner=make_structure()).save()
+
+    ok, errors, _ = structure_task.run(workers=3)
+
+    assert (ok, errors) == (5, 0)
+    assert set(Notification.objects.values_list("counter", flat=True)) == {1}
+    assert NotificationLog.objects.count() == 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_with_workers_completing_notifications(completing_structure_task):
+    # les actions modifient les notifications depuis les threads de traitement :
+    # aucune ne doit rester verrouillée par l'exécution
+    for _ in range(5):
+        completing_structure_task._new_notification(owner=make_structure()).save()
+
+    ok, errors, _ = completing_structure_task.run(workers=3)
+
+    assert (ok, errors) == (5, 0)
+    assert set(Notification.objects.values_list("status", "counter")) == {
+        (NotificationStatus.COMPLETE, 1)
+    }
+    assert not Notification.objects.exclude(claimed_until=None).exists()
+
+
+def test_run_commits_each_batch(structure_task, monkeypatch):
+    monkeypatch.setattr("dora.notifications.tasks.core.BATCH_SIZE", 2)
+    # échec dans le deuxième lot
+    notifications = [
+        structure_task._new_notification(
+            owner=make_structure(), counter=42 if idx == 3 else 0
+        )
+        for idx in range(5)
+    ]
+    for n in notifications:
+        n.save()
+
+    with pytest.raises(TaskError):
+        structure_task.run()
+
+    counters = [Notification.objects.get(pk=n.pk).counter for n in notifications]
+    assert counters == [1, 1, 1, 42, 0]
+    assert NotificationLog.objects.count() == 3
+    assert not Notification.objects.exclude(claimed_until=None).exists()
+
+
+@pytest.mark.parametrize("strict", [True, False])
+def test_run_with_send_failure(mailing_structure_task, strict):
+    send_messages = EmailBackend.send_messages
+
+    def failing_send_messages(self, messages):
+        if any(m.subject == "Erreur" for m in messages):
+            raise ConnectionError("envoi impossible")
+        return send_messages(self, messages)
+
+    # échec de l'envoi du courriel de la deuxième notification
+    notifications = [
+        mailing_structure_task._new_notification(
+            owner=make_structure(), counter=7 if idx == 1 else 0
+        )
+        for idx in range(3)
+    ]
+    for n in notifications:
+        n.save()
+
+    with mock.patch.object(EmailBackend, "send_messages", failing_send_messages):
+        if strict:
+            with pytest.raises(TaskError, match="Erreur d'envoi du courriel"):
+                mailing_structure_task.run(strict=strict)
+        else:
+            assert mailing_structure_task.run(strict=strict) == (2, 1, 0)
+
+    # les autres courriels du lot sont envoyés et leurs notifications activées
+    assert len(mail.outbox) == 2
+    counters = [Notification.objects.get(pk=n.pk).counter for n in notifications]
+    assert counters == [1, 7, 1]
+    assert not Notification.objects.exclude(claimed_until=None).exists()
+
+
+def test_run_skips_claimed_notifications(structure_task):
+    claimed = structure_task._new_notification(owner=make_structure())
+    claimed.claimed_until = timezone.now() + timedelta(minutes=5)
+    claimed.save()
+    expired_claim = structure_task._new_notification(owner=make_structure())
+    expired_claim.claimed_until = timezone.now() - timedelta(minutes=5)
+    expired_claim.save()
+
+    ok, _, _ = structure_task.run()
+
+    claimed.refresh_from_db()
+    expired_claim.refresh_from_db()
+    assert ok == 1
+    assert (claimed.counter, expired_claim.counter) == (0, 1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_skips_locked_notifications(structure_task):
+    locked = structure_task._new_notification(owner=make_structure())
+    locked.save()
+    structure_task._new_notification(owner=make_structure()).save()
+
+    # une autre exécution, simultanée, traite déjà la notification `locked`
+    is_locked, release = threading.Event(), threading.Event()
+
+    def concurrent_run():
+        try:
+            with transaction.atomic():
+                Notification.objects.select_for_update().get(pk=locked.pk)
+                is_locked.set()
+                release.wait(timeout=10)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=concurrent_run)
+    thread.start()
+    is_locked.wait(timeout=10)
+    try:
+        ok, _, _ = structure_task.run()
+    finally:
+        release.set()
+        thread.join()
+
+    locked.refresh_from_db()
+    assert ok == 1
+    assert locked.counter == 0
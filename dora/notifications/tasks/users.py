@@ -38,21 +38,14 @@ class UsersWithoutStructureTask(Task):
         )
 
     @classmethod
-    def should_trigger(cls, notification: Notification) -> bool:
-        now = timezone.now()
-        match notification.counter:
-            case 0:
-                return notification.created_at + relativedelta(days=1) <= now
-            case 1:
-                return notification.created_at + relativedelta(days=5) <= now
-            case 2:
-                return notification.created_at + relativedelta(days=10) <= now
-            case 3:
-                return notification.created_at + relativedelta(days=15) <= now
-            case 4:
-                return notification.created_at + relativedelta(months=4) <= now
-            case _:
-                return False
+    def trigger_schedule(cls):
+        return {
+            0: relativedelta(days=1),
+            1: relativedelta(days=5),
+            2: relativedelta(days=10),
+            3: relativedelta(days=15),
+            4: relativedelta(months=4),
+        }
 
     @classmethod
     def process(cls, notification: Notification):
@@ -107,17 +100,12 @@ class UserAccountDeletionTask(Task):
         )
 
     @classmethod
-    def should_trigger(cls, notification: Notification) -> bool:
-        now = timezone.now()
-
-        match notification.counter:
-            case 0:
-                # on notifie immédiatement :
-                return notification.created_at <= now
-            case 1:
-                return notification.created_at + relativedelta(days=30) <= now
-            case _:
-                return False
+    def trigger_schedule(cls):
+        # on notifie immédiatement, puis 30 jours plus tard
+        return {
+            0: relativedelta(),
+            1: relativedelta(days=30),
+        }
 
     @classmethod
     def process(cls, notification: Notification):
@@ -1,10 +1,8 @@
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.template.loader import render_to_string
 from django.utils import timezone
-from mjml import mjml2html
 
-from dora.core.emails import send_mail
+from dora.core.emails import render_mjml, send_mail
 from dora.orientations.models import ContactPreference
 
 debug = settings.ORIENTATION_EMAILS_DEBUG
@@ -55,7 +53,7 @@ def send_orientation_created_to_structure(orientation, context=None):
     send_mail(
         f"{'[Envoyée - Structure porteuse] ' if debug else ''}Nouvelle demande d’orientation reçue",
         orientation.get_contact_email(),
-        mjml2html(render_to_string("orientation-created-structure.mjml", context)),
+        render_mjml("orientation-created-structure.mjml", context),
         from_email=(
             f"{orientation.prescriber.get_full_name()} via DORA",
             settings.DEFAULT_FROM_EMAIL,
@@ -72,7 +70,7 @@ def send_orientation_created_to_prescriber(orientation, context=None):
     send_mail(
         f"{'[Envoyée - Prescripteur] ' if debug else ''}Votre demande a bien été transmise !",
         orientation.prescriber.email,
-        mjml2html(render_to_string("orientation-created-prescriber.mjml", context)),
+        render_mjml("orientation-created-prescriber.mjml", context),
         tags=["orientation"],
         reply_to=[orientation.get_contact_email()],
     )
@@ -89,7 +87,7 @@ def send_orientation_created_to_referent(orientation, context=None):
         send_mail(
             f"{'[Envoyée - Conseiller référent] ' if debug else ''}Notification d’une demande d’orientation",
             orientation.referent_email,
-            mjml2html(render_to_string("orientation-created-referent.mjml", context)),
+            render_mjml("orientation-created-referent.mjml", context),
             tags=["orientation"],
             reply_to=[orientation.prescriber.email],
         )
@@ -103,9 +101,7 @@ def send_orientation_created_to_beneficiary(orientation, context=None):
         send_mail(
             f"{'[Envoyée - Bénéficiaire] ' if debug else ''}Une orientation a été effectuée en votre nom",
             orientation.beneficiary_email,
-            mjml2html(
-                render_to_string("orientation-created-beneficiary.mjml", context)
-            ),
+            render_mjml("orientation-created-beneficiary.mjml", context),
             from_email=(
                 f"{orientation.prescriber.get_full_name()} via DORA",
                 settings.DEFAULT_FROM_EMAIL,
@@ -146,7 +142,7 @@ def send_orientation_accepted_emails(
     send_mail(
         f"{'[Validée - Structure porteuse] ' if debug else ''}Vous venez de valider une demande 🎉",
         [orientation.get_contact_email()],
-        mjml2html(render_to_string("orientation-accepted-structure.mjml", context)),
+        render_mjml("orientation-accepted-structure.mjml", context),
         tags=["orientation"],
     )
 
@@ -154,7 +150,7 @@ def send_orientation_accepted_emails(
     send_mail(
         f"{'[Validée - Prescripteur] ' if debug else ''}Votre demande a été acceptée ! 🎉",
         orientation.prescriber.email,
-        mjml2html(render_to_string("orientation-accepted-prescriber.mjml", context)),
+        render_mjml("orientation-accepted-prescriber.mjml", context),
         from_email=(
             f"{orientation.get_structure_name()} via DORA",
             settings.DEFAULT_FROM_EMAIL,
@@ -170,7 +166,7 @@ def send_orientation_accepted_emails(
         send_mail(
             f"{'[Validée - Conseiller référent] ' if debug else ''}Notification de l’acceptation d’une demande d’orientation",
             orientation.referent_email,
-            mjml2html(render_to_string("orientation-accepted-referent.mjml", context)),
+            render_mjml("orientation-accepted-referent.mjml", context),
             from_email=(
                 f"{orientation.get_structure_name()} via DORA",
                 settings.DEFAULT_FROM_EMAIL,
@@ -183,9 +179,7 @@ def send_orientation_accepted_emails(
         send_mail(
             f"{'[Validée - Bénéficiaire] ' if debug else ''}Votre demande a été acceptée ! 🎉",
             orientation.beneficiary_email,
-            mjml2html(
-                render_to_string("orientation-accepted-beneficiary.mjml", context)
-            ),
+            render_mjml("orientation-accepted-beneficiary.mjml", context),
             from_email=(
                 f"{orientation.get_structure_name()} via DORA",
                 settings.DEFAULT_FROM_EMAIL,
@@ -207,7 +201,7 @@ def send_orientation_rejected_emails(orientation, message):
     send_mail(
         f"{'[Refusée - Structure porteuse] ' if debug else ''}Vous venez de refuser une demande",
         [orientation.get_contact_email()],
-        mjml2html(render_to_string("orientation-rejected-structure.mjml", context)),
+        render_mjml("orientation-rejected-structure.mjml", context),
         tags=["orientation"],
     )
 
@@ -215,7 +209,7 @@ def send_orientation_rejected_emails(orientation, message):
     send_mail(
         f"{'[Refusée - Prescripteur] ' if debug else ''}Votre demande d’orientation a été refusée",
         [orientation.prescriber.email],
-        mjml2html(render_to_string("orientation-rejected-prescriber.mjml", context)),
+        render_mjml("orientation-rejected-prescriber.mjml", context),
         from_email=(
             f"{orientation.get_structure_name()} via DORA",
             settings.DEFAULT_FROM_EMAIL,
@@ -232,9 +226,7 @@ def send_orientation_rejected_emails(orientation, message):
         send_mail(
             f"{'[Refusée - Conseiller référent] ' if debug else ''}Votre demande d’orientation a été refusée",
             [orientation.referent_email],
-            mjml2html(
-                render_to_string("orientation-rejected-prescriber.mjml", context)
-            ),
+            render_mjml("orientation-rejected-prescriber.mjml", context),
             from_email=(
                 f"{orientation.get_structure_name()} via DORA",
                 settings.DEFAULT_FROM_EMAIL,
@@ -254,7 +246,7 @@ def send_message_to_prescriber(orientation, message, cc):
     send_mail(
         f"{'[Contact - Prescripteur] ' if debug else ''}Vous avez un nouveau message 📩",
         orientation.prescriber.email,
-        mjml2html(render_to_string("contact-prescriber.mjml", context)),
+        render_mjml("contact-prescriber.mjml", context),
         from_email=(
             f"{orientation.get_structure_name()} via DORA",
             settings.DEFAULT_FROM_EMAIL,
@@ -276,7 +268,7 @@ def send_message_to_beneficiary(orientation, message, cc):
     send_mail(
         f"{'[Contact - Bénéficiaire] ' if debug else ''}Vous avez un nouveau message 📩",
         orientation.beneficiary_email,
-        mjml2html(render_to_string("contact-beneficiary.mjml", context)),
+        render_mjml("contact-beneficiary.mjml", context),
         from_email=(
             f"{orientation.get_structure_name()} via DORA",
             settings.DEFAULT_FROM_EMAIL,
@@ -306,7 +298,7 @@ def send_orientation_reminder_emails(orientation):
     send_mail(
         f"{'[Notification - Structure] ' if debug else ''}Relance – Demande d’orientation en attente",
         orientation.get_contact_email(),
-        mjml2html(render_to_string("notification-structure.mjml", context)),
+        render_mjml("notification-structure.mjml", context),
         tags=["orientation"],
     )
     cc = []
@@ -319,7 +311,7 @@ def send_orientation_reminder_emails(orientation):
     send_mail(
         f"{'[Notification - Prescripteur] ' if debug else ''}Relance envoyée – Demande d’orientation en attente",
         orientation.prescriber.email,
-        mjml2html(render_to_string("notification-prescriber.mjml", context)),
+        render_mjml("notification-prescriber.mjml", context),
         tags=["orientation"],
         cc=cc,
     )
@@ -1,10 +1,12 @@
 from datetime import timedelta
+from functools import partial
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from django.utils import timezone
 
+from dora.core.emails import EmailDispatcher
 from dora.orientations.emails import send_orientation_reminder_emails
 from dora.orientations.models import Orientation, OrientationStatus
 
@@ -42,8 +44,16 @@ class Command(BaseCommand):
         )
 
         self.stdout.write(f"{orientations.count()} orientations concernées")
-        for orientation in orientations:
-            if not dry_run:
-                send_orientation_reminder_emails(orientation)
-                orientation.last_reminder_email_sent = timezone.now()
-                orientation.save()
+        if dry_run:
+            return
+
+        with EmailDispatcher("send_orientations_reminders") as dispatcher:
+            for orientation in orientations:
+                with dispatcher.on_sent(partial(mark_reminder_sent, orientation)):
+                    send_orientation_reminder_emails(orientation)
+        self.stdout.write(str(dispatcher.stats))
+
+
+def mark_reminder_sent(orientation):
+    orientation.last_reminder_email_sent = timezone.now()
+    orientation.save()
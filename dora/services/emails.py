@@ -3,9 +3,8 @@ import datetime
 from django.conf import settings
 from django.template.loader import render_to_string
 from furl import furl
-from mjml import mjml2html
 
-from dora.core.emails import send_mail
+from dora.core.emails import render_mjml, send_mail
 
 
 def send_service_feedback_email(service, full_name, email, message):
@@ -108,7 +107,7 @@ def send_service_sharing_email(
     send_mail(
         "On vous a recommandé une solution solidaire",
         recipient_email,
-        mjml2html(render_to_string("sharing-email.mjml", context)),
+        render_mjml("sharing-email.mjml", context),
         tags=["service-sharing"],
     )
 
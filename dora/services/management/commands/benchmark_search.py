@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+
+from dora.admin_express.models import City
+from dora.services.search import (
+    _get_dora_services,
+    _project_search_results,
+    _serialize_search_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les performances de la projection des résultats de recherche "
+        "avec la sérialisation par `SearchResultSerializer`"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("city_code", help="code INSEE de la commune recherchée")
+        parser.add_argument("--categories", nargs="*", default=None)
+        parser.add_argument("--iterations", type=int, default=5)
+
+    def handle(self, *args, **options):
+        city = City.objects.get_from_code(options["city_code"])
+        if not city:
+            self.stderr.write(self.style.ERROR("Commune introuvable"))
+            return
+
+        services = _get_dora_services(
+            city_code=city.code,
+            city=city,
+            categories=options["categories"],
+            lat=city.geom.centroid.y if city.geom else None,
+            lon=city.geom.centroid.x if city.geom else None,
+        )
+
+        for label, fn in (
+            ("sérialiseur", lambda: _serialize_search_results(None, services.all())),
+            ("projection", lambda: _project_search_results(services.all())),
+        ):
+            timings = []
+            connection.force_debug_cursor = True
+            try:
+                for _ in range(options["iterations"]):
+                    reset_queries()
+                    start = time.perf_counter()
+                    results = fn()
+                    timings.append(time.perf_counter() - start)
+                num_queries = len(connection.queries)
+            finally:
+                connection.force_debug_cursor = False
+                reset_queries()
+
+            self.stdout.write(
+                f"{label} : {len(results)} résultats, {num_queries} requêtes, "
+                f"min {min(timings) * 1000:.1f} ms, "
+                f"moyenne {sum(timings) / len(timings) * 1000:.1f} ms"
+            )
@@ -0,0 +1,31 @@
+from itertools import batched
+
+from django.core.management.base import BaseCommand
+
+from ...models import SavedSearch
+from ...saved_searches import get_saved_searches_di_client, refresh_new_services_counts
+
+
+class Command(BaseCommand):
+    help = "Met à jour le nombre de nouveaux services des recherches sauvegardées"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        di_client = get_saved_searches_di_client()
+        saved_searches = (
+            SavedSearch.objects.select_related("category")
+            .prefetch_related("subcategories", "kinds", "fees", "location_kinds")
+            .order_by("city_code", "pk")
+        )
+
+        num_saved_searches = 0
+        for batch in batched(
+            saved_searches.iterator(chunk_size=options["batch_size"]),
+            options["batch_size"],
+        ):
+            refresh_new_services_counts(list(batch), di_client, wait_for_di=True)
+            num_saved_searches += len(batch)
+
+        self.stdout.write(f"{num_saved_searches} recherches sauvegardées mises à jour")
@@ -1,103 +1,119 @@
 from datetime import timedelta
+from functools import partial
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.template.loader import render_to_string
+from django.db.models import Q
 from django.utils import timezone
-from mjml import mjml2html
 
-from dora.core.emails import send_mail
-from dora.services.models import LocationKind
+from dora.core.emails import EmailDispatcher, render_mjml, send_mail
 
 from ...models import SavedSearch, SavedSearchFrequency
+from ...saved_searches import (
+    get_recent_services_by_saved_search,
+    get_saved_searches_di_client,
+)
 
 
 def get_saved_search_notifications_to_send():
-    # Notifications toutes les deux semaines
-    two_weeks_notifications = SavedSearch.objects.filter(
-        frequency=SavedSearchFrequency.TWO_WEEKS,
-        last_notification_date__lte=timezone.now() - timedelta(days=14),
-    )
-
-    # Notifications mensuelles
-    monthly_notifications = SavedSearch.objects.filter(
-        frequency=SavedSearchFrequency.MONTHLY,
-        last_notification_date__lte=timezone.now() - timedelta(days=30),
+    return SavedSearch.objects.filter(
+        # Notifications toutes les deux semaines
+        Q(
+            frequency=SavedSearchFrequency.TWO_WEEKS,
+            last_notification_date__lte=timezone.now() - timedelta(days=14),
+        )
+        # Notifications mensuelles
+        | Q(
+            frequency=SavedSearchFrequency.MONTHLY,
+            last_notification_date__lte=timezone.now() - timedelta(days=30),
+        )
     )
 
-    return two_weeks_notifications.union(monthly_notifications)
-
 
 class Command(BaseCommand):
     help = (
         "Envoi les notifications liées aux recherches sauvegardées par les utilisateurs"
     )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.on_site = LocationKind.objects.get(value="en-presentiel")
-        self.remote = LocationKind.objects.get(value="a-distance")
-
     def handle(self, *args, **options):
         self.stdout.write("Vérification des notifications de recherches sauvegardées")
-        saved_searches = get_saved_search_notifications_to_send()
+        saved_searches = list(
+            get_saved_search_notifications_to_send()
+            .select_related("user", "category")
+            .prefetch_related("subcategories", "kinds", "fees", "location_kinds")
+        )
         tracking_params = (
             "mtm_campaign=MailsTransactionnels&mtm_kwd=AlertesNouveauxServices"
         )
-        num_emails_sent = 0
-        for saved_search in saved_searches:
-            # On garde les contenus qui ont été publiés depuis la dernière notification
-            new_services = saved_search.get_recent_services(
-                saved_search.last_notification_date
-            )
 
-            if new_services:
-                # Envoi de l'email
-                context = {
-                    "search_label": self.compute_search_label(saved_search),
-                    "updated_services": new_services,
-                    "alert_link": f"{settings.FRONTEND_URL}/mes-alertes/{saved_search.id}",
-                    "tracking_params": tracking_params,
-                }
-
-                num_emails_sent += 1
-                send_mail(
-                    "Il y a de nouveaux services correspondant à votre alerte",
-                    saved_search.user.email,
-                    mjml2html(
-                        render_to_string("saved-search-notification.mjml", context)
-                    ),
-                    from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
-                    tags=["saved-search-notification"],
-                )
+        # On garde les contenus qui ont été publiés depuis la dernière notification
+        # (une seule recherche pour les recherches sauvegardées ayant les mêmes critères)
+        recent_services = get_recent_services_by_saved_search(
+            saved_searches, get_saved_searches_di_client(), wait_for_di=True
+        )
 
-            # Mise à jour de la date de dernière notification
-            saved_search.last_notification_date = timezone.now()
-            saved_search.save()
+        num_emails_sent = num_skipped = 0
+        with EmailDispatcher("send_saved_searches_notifications") as dispatcher:
+            for saved_search in saved_searches:
+                if saved_search.pk not in recent_services:
+                    # résultats d·i incomplets : pas d'alerte partielle,
+                    # la date de dernière notification est conservée
+                    num_skipped += 1
+                    continue
+                new_services = recent_services[saved_search.pk]
+
+                # Mise à jour de la date de dernière notification, une fois l'email envoyé
+                with dispatcher.on_sent(partial(mark_notified, saved_search)):
+                    if new_services:
+                        # Envoi de l'email
+                        context = {
+                            "search_label": self.compute_search_label(saved_search),
+                            "updated_services": new_services,
+                            "alert_link": f"{settings.FRONTEND_URL}/mes-alertes/{saved_search.id}",
+                            "tracking_params": tracking_params,
+                        }
+
+                        num_emails_sent += 1
+                        send_mail(
+                            "Il y a de nouveaux services correspondant à votre alerte",
+                            saved_search.user.email,
+                            render_mjml("saved-search-notification.mjml", context),
+                            from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
+                            tags=["saved-search-notification"],
+                        )
         self.stdout.write(f"{num_emails_sent} courriels envoyés")
+        if num_skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{num_skipped} alertes reportées (résultats d·i incomplets)"
+                )
+            )
+        self.stdout.write(str(dispatcher.stats))
 
     def compute_search_label(self, saved_search):
-        on_site_only = self.on_site in saved_search.location_kinds.all()
-        remote_only = self.remote in saved_search.location_kinds.all()
+        # utilise les relations M2M préchargées
+        location_kinds = [lk.value for lk in saved_search.location_kinds.all()]
         location_txt = ""
-        if on_site_only:
+        if "en-presentiel" in location_kinds:
             location_txt = "en présentiel"
-        elif remote_only:
+        elif "a-distance" in location_kinds:
             location_txt = "à distance"
         text = f'Services d’insertion {location_txt}{" " if location_txt else ""}à proximité de {saved_search.city_label}'
         if saved_search.category:
             text += f', pour la thématique "{saved_search.category.label}"'
 
-        if saved_search.subcategories.exists():
-            labels = saved_search.subcategories.values_list("label", flat=True)
+        if labels := [s.label for s in saved_search.subcategories.all()]:
             text += f", pour le(s) besoin(s) : {', '.join(labels)}"
 
-        if saved_search.kinds.exists():
-            labels = saved_search.kinds.values_list("label", flat=True)
+        if labels := [k.label for k in saved_search.kinds.all()]:
             text += f", pour le(s) type(s) de service : {', '.join(labels)}"
 
-        if saved_search.fees.exists():
-            labels = saved_search.fees.values_list("label", flat=True)
+        if labels := [f.label for f in saved_search.fees.all()]:
             text += f", avec comme frais à charge : {', '.join(labels)}"
 
         return text
+
+
+def mark_notified(saved_search):
+    saved_search.last_notification_date = timezone.now()
+    saved_search.save(update_fields=["last_notification_date"])
@@ -1,14 +1,20 @@
 from collections import defaultdict
 from datetime import timedelta
+from functools import partial
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
 
+from dora.core.emails import EmailDispatcher
 from dora.services.emails import send_service_reminder_email
-from dora.services.models import Service, ServiceStatus
+from dora.services.models import (
+    Service,
+    ServiceModificationHistoryItem,
+    ServiceStatus,
+)
 from dora.structures.models import StructureMember
-from dora.users.models import User
 
 
 class Command(BaseCommand):
@@ -65,58 +71,68 @@ class Command(BaseCommand):
         user_list = (
             list(users.items()) if limit is None else list(users.items())[:limit]
         )
-        for user, structures in user_list:
-            mails_count += 1
-
-            if not dry_run:
-                send_service_reminder_email(
-                    user.email,
-                    user.get_short_name(),
-                    structures["to_update"],
-                    structures["draft"],
-                )
-                user.last_service_reminder_email_sent = timezone.now()
-                user.save()
+        with EmailDispatcher("send_services_reminders") as dispatcher:
+            for user, structures in user_list:
+                mails_count += 1
+
+                if not dry_run:
+                    with dispatcher.on_sent(partial(mark_reminder_sent, user)):
+                        send_service_reminder_email(
+                            user.email,
+                            user.get_short_name(),
+                            structures["to_update"],
+                            structures["draft"],
+                        )
 
         self.stdout.write(
             f"{mails_count} courriels{' seraient ' if dry_run else ' '}envoyés"
         )
+        if not dry_run:
+            self.stdout.write(str(dispatcher.stats))
+
+
+def mark_reminder_sent(user):
+    user.last_service_reminder_email_sent = timezone.now()
+    user.save()
 
 
 def store_users_to_notify(services, users_to_notify, category):
-    for service in services:
-        pertinent_users = set()
-
-        # Créateur
-        if service.creator:
-            pertinent_users.add(service.creator)
-
-        # Dernier éditeur
-        if service.last_editor:
-            pertinent_users.add(service.last_editor)
-
-        # Tous les éditeurs
-        for history_items in service.history_item.exclude(user=None):
-            pertinent_users.add(history_items.user)
-
-        # Administrateurs
-        for admin in StructureMember.objects.filter(
-            structure=service.structure, is_admin=True
-        ):
-            pertinent_users.add(admin.user)
-
-        # Référents
-        if service.contact_email:
-            user_in_charge = User.objects.filter(
-                is_valid=True, is_active=True, email=service.contact_email
-            ).first()
-            if user_in_charge:
-                pertinent_users.add(user_in_charge)
-
-        for user in pertinent_users:
-            if service.structure.is_member(user) and (
-                not user.last_service_reminder_email_sent
-                or user.last_service_reminder_email_sent
-                < timezone.now() - timedelta(days=25)
-            ):
-                users_to_notify[user][category].add(service.structure)
+    # utilisateurs à notifier, pour chaque structure concernée :
+    # membres de la structure, ayant un lien avec l'un de ses services
+    # et n'ayant pas été notifiés récemment
+    structure_services = services.filter(structure=OuterRef("structure"))
+    memberships = (
+        StructureMember.objects.filter(structure__in=services.values("structure"))
+        .filter(
+            Q(user__last_service_reminder_email_sent=None)
+            | Q(
+                user__last_service_reminder_email_sent__lt=timezone.now()
+                - timedelta(days=25)
+            )
+        )
+        .filter(
+            # Administrateurs
+            Q(is_admin=True)
+            # Créateur
+            | Exists(structure_services.filter(creator=OuterRef("user")))
+            # Dernier éditeur
+            | Exists(structure_services.filter(last_editor=OuterRef("user")))
+            # Tous les éditeurs
+            | Exists(
+                ServiceModificationHistoryItem.objects.filter(
+                    service__in=services,
+                    service__structure=OuterRef("structure"),
+                    user=OuterRef("user"),
+                )
+            )
+            # Référents
+            | (
+                Exists(structure_services.filter(contact_email=OuterRef("user__email")))
+                & Q(user__is_valid=True, user__is_active=True)
+            )
+        )
+        .select_related("user", "structure")
+    )
+
+    for membership in memberships:
+        users_to_notify[membership.user][category].add(membership.structure)
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-17 10:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def get_diffusion_zone_city_codes(City, diffusion_zone_type, diffusion_zone_details):
+    # copie de `dora.services.models.get_diffusion_zone_city_codes`
+    # à la date de la migration
+    if diffusion_zone_type == "city":
+        return [diffusion_zone_details]
+
+    if diffusion_zone_type == "epci":
+        cities = City.objects.filter(epcis__contains=[diffusion_zone_details])
+    elif diffusion_zone_type == "department":
+        cities = City.objects.filter(department=diffusion_zone_details)
+    elif diffusion_zone_type == "region":
+        cities = City.objects.filter(region=diffusion_zone_details)
+    else:
+        # France entière : pas de communes
+        return []
+
+    return sorted(cities.values_list("code", flat=True))
+
+
+def populate_diffusion_city_codes(apps, schema_editor):
+    Service = apps.get_model("services", "Service")
+    City = apps.get_model("admin_express", "City")
+
+    city_codes_by_zone = {}
+    to_update = []
+    for service in (
+        Service.objects.exclude(diffusion_zone_details="")
+        .only("id", "diffusion_zone_type", "diffusion_zone_details")
+        .iterator(chunk_size=1000)
+    ):
+        zone = (service.diffusion_zone_type, service.diffusion_zone_details)
+        if zone not in city_codes_by_zone:
+            city_codes_by_zone[zone] = get_diffusion_zone_city_codes(City, *zone)
+        service.diffusion_city_codes = city_codes_by_zone[zone]
+        to_update.append(service)
+
+    Service.objects.bulk_update(to_update, ["diffusion_city_codes"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("admin_express", "0007_city_epcis_epci_departments_epci_regions"),
+        ("services", "0110_remove_service_fee_pass_numerique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="service",
+            name="diffusion_city_codes",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=5),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None,
+                verbose_name="Communes de la zone de diffusion",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="service",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["diffusion_city_codes"], name="service_diffusion_cities_idx"
+            ),
+        ),
+        migrations.RunPython(
+            populate_diffusion_city_codes, reverse_code=migrations.RunPython.noop
+        ),
+    ]
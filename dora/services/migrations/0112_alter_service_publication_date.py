@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("services", "0111_service_diffusion_city_codes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="service",
+            name="publication_date",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("services", "0112_alter_service_publication_date"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="savedsearch",
+            name="new_services_count",
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="savedsearch",
+            name="new_services_count_date",
+            field=models.DateField(editable=False, null=True),
+        ),
+    ]
@@ -5,7 +5,9 @@ from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.gis.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models import CharField, Q, URLField
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -13,12 +15,17 @@ from django.utils.crypto import get_random_string
 from django.utils.text import slugify
 
 from dora.admin_express.models import EPCI, AdminDivisionType, City, Department, Region
-from dora.admin_express.utils import arrdt_to_main_insee_code, get_clean_city_name
+from dora.admin_express.utils import (
+    arrdt_to_main_insee_code,
+    get_clean_city_name,
+    main_insee_code_to_arrdts,
+)
 from dora.core.constants import WGS84
 from dora.core.models import EnumModel, LogItem, ModerationMixin
 from dora.structures.models import Structure
 
 from .enums import ServiceStatus, ServiceUpdateStatus
+from .search_cache import invalidate_zone
 
 logger = logging.getLogger(__name__)
 
@@ -66,8 +73,19 @@ class CustomizableChoice(models.Model):
         return cached_value
 
     def save(self, *args, **kwargs):
+        from .options import invalidate_options
+
         cache.delete(self._get_cache_key("__str__"))
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        invalidate_options()
+        return result
+
+    def delete(self, *args, **kwargs):
+        from .options import invalidate_options
+
+        result = super().delete(*args, **kwargs)
+        invalidate_options()
+        return result
 
 
 class AccessCondition(CustomizableChoice):
@@ -200,6 +218,37 @@ def get_diffusion_zone_details_display(
     return item.name if item else ""
 
 
+def get_diffusion_zone_city_codes(
+    diffusion_zone_type: AdminDivisionType,
+    diffusion_zone_details: str,
+    cities=None,
+) -> list[str]:
+    """Codes INSEE des communes couvertes par une zone de diffusion.
+
+    La liste est vide pour une diffusion sur la France entière,
+    ce cas étant traité à part lors du filtrage.
+    """
+    if cities is None:
+        cities = City.objects.all()
+
+    if not diffusion_zone_details or diffusion_zone_type == AdminDivisionType.COUNTRY:
+        return []
+
+    if diffusion_zone_type == AdminDivisionType.CITY:
+        return [diffusion_zone_details]
+
+    if diffusion_zone_type == AdminDivisionType.EPCI:
+        cities = cities.filter(epcis__contains=[diffusion_zone_details])
+    elif diffusion_zone_type == AdminDivisionType.DEPARTMENT:
+        cities = cities.filter(department=diffusion_zone_details)
+    elif diffusion_zone_type == AdminDivisionType.REGION:
+        cities = cities.filter(region=diffusion_zone_details)
+    else:
+        return []
+
+    return sorted(cities.values_list("code", flat=True))
+
+
 def get_update_status(status: ServiceStatus, modification_date: datetime):
     if status != ServiceStatus.PUBLISHED:
         return ServiceUpdateStatus.NOT_NEEDED
@@ -375,6 +424,15 @@ class Service(ModerationMixin, models.Model):
         blank=True,
     )
     diffusion_zone_details = models.CharField(max_length=9, db_index=True, blank=True)
+    # dénormalisation de la zone de diffusion, utilisée pour le filtrage géographique :
+    # voir `get_diffusion_zone_city_codes` et `refresh_diffusion_city_codes`
+    diffusion_city_codes = ArrayField(
+        models.CharField(max_length=5),
+        verbose_name="Communes de la zone de diffusion",
+        blank=True,
+        default=list,
+        editable=False,
+    )
     qpv_or_zrr = models.BooleanField(default=False)
 
     recurrence = models.CharField(verbose_name="Récurrence", max_length=140, blank=True)
@@ -409,7 +467,7 @@ class Service(ModerationMixin, models.Model):
 
     creation_date = models.DateTimeField(auto_now_add=True)
     modification_date = models.DateTimeField(blank=True, null=True)
-    publication_date = models.DateTimeField(blank=True, null=True)
+    publication_date = models.DateTimeField(blank=True, null=True, db_index=True)
 
     creator = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True
@@ -451,6 +509,24 @@ class Service(ModerationMixin, models.Model):
                 check=Q(is_model=False) | Q(status__isnull=True),
             )
         ]
+        indexes = [
+            GinIndex(
+                name="service_diffusion_cities_idx",
+                fields=("diffusion_city_codes",),
+            )
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # permet de ne recalculer les communes de la zone de diffusion
+        # que si celle-ci a été modifiée
+        instance._loaded_diffusion_zone = (
+            instance.__dict__.get("diffusion_zone_type"),
+            instance.__dict__.get("diffusion_zone_details"),
+        )
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
 
     def __str__(self):
         return self.name
@@ -475,11 +551,77 @@ class Service(ModerationMixin, models.Model):
         except ServiceStatusHistoryItem.DoesNotExist:
             return None
 
+    def _search_cache_zones(self) -> set[tuple[str, str]]:
+        # zones de diffusion (ancienne et nouvelle) des recherches
+        # pouvant contenir ce service
+        was_published = getattr(self, "_loaded_status", None) == ServiceStatus.PUBLISHED
+        if self.status != ServiceStatus.PUBLISHED and not was_published:
+            return set()
+        zones = {(self.diffusion_zone_type, self.diffusion_zone_details)}
+        if loaded_zone := getattr(self, "_loaded_diffusion_zone", None):
+            zones.add(loaded_zone)
+        return zones
+
+    def invalidate_search_cache(self, zones=None):
+        """Invalide les recherches en cache pouvant contenir ce service.
+
+        L'invalidation a lieu une fois la transaction en cours validée :
+        une recherche simultanée ne peut pas remettre en cache l'état précédent.
+        """
+        if zones is None:
+            zones = self._search_cache_zones()
+
+        def invalidate():
+            for zone in zones:
+                invalidate_zone(*zone)
+
+        if zones:
+            transaction.on_commit(invalidate)
+
     def save(self, user=None, *args, **kwargs):
         if not self.slug:
             self.slug = make_unique_slug(self, self.structure.slug, self.name)
         self.city = get_clean_city_name(self.city_code)
-        return super().save(*args, **kwargs)
+
+        # avant la mise à jour de `_loaded_diffusion_zone` (ancienne zone de diffusion)
+        search_cache_zones = self._search_cache_zones()
+
+        diffusion_zone = (self.diffusion_zone_type, self.diffusion_zone_details)
+        if diffusion_zone != getattr(self, "_loaded_diffusion_zone", None):
+            self.diffusion_city_codes = get_diffusion_zone_city_codes(*diffusion_zone)
+            self._loaded_diffusion_zone = diffusion_zone
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {
+                    *kwargs["update_fields"],
+                    "diffusion_city_codes",
+                }
+
+        is_newly_published = (
+            self.status == ServiceStatus.PUBLISHED
+            and getattr(self, "_loaded_status", None) != ServiceStatus.PUBLISHED
+        )
+        self._loaded_status = self.status
+        result = super().save(*args, **kwargs)
+        self.invalidate_search_cache(search_cache_zones)
+
+        if is_newly_published:
+            # le nombre de nouveaux services des alertes concernées
+            # sera recalculé lors du prochain affichage (mise à jour différée :
+            # une diffusion nationale concerne toutes les alertes)
+            saved_searches = SavedSearch.objects.for_diffusion_zone(
+                self.diffusion_zone_type, self.diffusion_city_codes
+            )
+            transaction.on_commit(
+                lambda: saved_searches.update(new_services_count_date=None)
+            )
+
+        return result
+
+    def delete(self, *args, **kwargs):
+        search_cache_zones = self._search_cache_zones()
+        result = super().delete(*args, **kwargs)
+        self.invalidate_search_cache(search_cache_zones)
+        return result
 
     def can_read(self, user):
         return self.status == ServiceStatus.PUBLISHED or (
@@ -639,6 +781,25 @@ class Bookmark(models.Model):
         ]
 
 
+class SavedSearchQuerySet(models.QuerySet):
+    def for_diffusion_zone(self, diffusion_zone_type, diffusion_city_codes):
+        # recherches sauvegardées pouvant contenir un service de cette zone de diffusion
+        if diffusion_zone_type == AdminDivisionType.COUNTRY:
+            return self.all()
+        # les alertes peuvent porter sur un arrondissement (Paris, Lyon, Marseille)
+        main_codes = {arrdt_to_main_insee_code(code) for code in diffusion_city_codes}
+        return self.filter(
+            city_code__in={
+                *main_codes,
+                *(
+                    arrdt
+                    for code in main_codes
+                    for arrdt in main_insee_code_to_arrdts(code)
+                ),
+            }
+        )
+
+
 class SavedSearch(models.Model):
     user = models.ForeignKey("users.User", on_delete=models.CASCADE)
     creation_date = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -672,61 +833,31 @@ class SavedSearch(models.Model):
         verbose_name="Fréquence",
     )
     last_notification_date = models.DateField(default=datetime.now)
+    # nombre de nouveaux services, mis à jour quotidiennement
+    # (voir `dora.services.saved_searches.refresh_new_services_counts`)
+    new_services_count = models.IntegerField(null=True, editable=False)
+    new_services_count_date = models.DateField(null=True, editable=False)
+
+    objects = SavedSearchQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Recherche sauvegardé"
         verbose_name_plural = "Recherches sauvegardées"
 
     def get_recent_services(self, cutoff_date):
-        from dora import data_inclusion
-
-        di_client = (
-            data_inclusion.di_client_factory()
-            if settings.INCLUDES_DI_SERVICES_IN_SAVED_SEARCH_NOTIFICATIONS
-            else None
+        from .saved_searches import (
+            SavedSearchFilters,
+            get_saved_searches_di_client,
+            search_recent_services,
         )
 
-        category = None
-        if self.category:
-            category = self.category
-
-        subcategories = None
-        if self.subcategories.exists():
-            subcategories = self.subcategories.values_list("value", flat=True)
-
-        kinds = None
-        if self.kinds.exists():
-            kinds = self.kinds.values_list("value", flat=True)
-
-        fees = None
-        if self.fees.exists():
-            fees = self.fees.values_list("value", flat=True)
-
-        location_kinds = None
-        if self.location_kinds.exists():
-            location_kinds = self.location_kinds.values_list("value", flat=True)
-
-        # Récupération des résultats de la recherche
-        from .search import search_services
-
         city_code = arrdt_to_main_insee_code(self.city_code)
         city = get_object_or_404(City, pk=city_code)
 
-        results = search_services(
-            None,
-            self.city_code,
-            city,
-            [category.value] if category and not subcategories else None,
-            subcategories,
-            kinds,
-            fees,
-            location_kinds,
-            di_client,
-        )
-
         # On garde les contenus qui ont été publiés depuis la dernière notification
-        return [
-            r
-            for r in results
-            if datetime.fromisoformat(r["publication_date"]).date() > cutoff_date
-        ]
+        return search_recent_services(
+            SavedSearchFilters.from_saved_search(self),
+            city,
+            cutoff_date,
+            get_saved_searches_di_client(),
+        ).services
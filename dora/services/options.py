@@ -0,0 +1,172 @@
+import hashlib
+import itertools
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Value
+
+from dora.admin_express.models import AdminDivisionType
+from dora.core.enum_registry import get_enum
+from dora.stats.models import DeploymentLevel, DeploymentState
+from dora.structures.models import Structure, StructureMember
+
+from .models import (
+    AccessCondition,
+    BeneficiaryAccessMode,
+    CoachOrientationMode,
+    ConcernedPublic,
+    Credential,
+    LocationKind,
+    Requirement,
+    ServiceCategory,
+    ServiceFee,
+    ServiceKind,
+    ServiceSubCategory,
+)
+
+"""
+Options des services (`/services-options/`) :
+    La partie globale (énumérations, choix personnalisés globaux, départements déployés)
+    est calculée une fois par processus, et recalculée quand l'une des énumérations
+    (voir `dora.core.enum_registry`) ou la version des options (`invalidate_options`) change.
+    Les choix personnalisés propres aux structures de l'utilisateur sont ajoutés à la volée.
+"""
+
+OPTIONS_VERSION_KEY = "services-options:version"
+
+ENUMS = {
+    "categories": ServiceCategory,
+    "subcategories": ServiceSubCategory,
+    "kinds": ServiceKind,
+    "fee_conditions": ServiceFee,
+    "beneficiaries_access_modes": BeneficiaryAccessMode,
+    "coach_orientation_modes": CoachOrientationMode,
+    "location_kinds": LocationKind,
+}
+
+CUSTOM_CHOICES = {
+    "access_conditions": AccessCondition,
+    "concerned_public": ConcernedPublic,
+    "requirements": Requirement,
+    "credentials": Credential,
+}
+
+_global_options = None
+
+
+def invalidate_options():
+    # à appeler lors de la modification des données globales hors énumérations
+    # (choix personnalisés, états de déploiement) : la version change une fois
+    # la transaction validée, pour qu'un autre processus ne recalcule pas
+    # les options à partir des anciennes données sous la nouvelle version
+    transaction.on_commit(
+        lambda: cache.set(OPTIONS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    )
+
+
+def _get_version() -> str:
+    cache.add(OPTIONS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    return cache.get(OPTIONS_VERSION_KEY)
+
+
+def _digest(data) -> str:
+    return hashlib.sha1(
+        json.dumps(data, sort_keys=True).encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def _build_global_options(enums: dict) -> dict:
+    options = {
+        key: [{"value": entry.value, "label": entry.label} for entry in values]
+        for key, values in enums.items()
+    }
+    options["kinds"].sort(key=lambda kind: kind["label"])
+
+    for key, model in CUSTOM_CHOICES.items():
+        options[key] = [
+            {"value": choice["id"], "label": choice["name"], "structure": None}
+            for choice in model.objects.filter(structure=None)
+            .order_by("pk")
+            .values("id", "name")
+        ]
+
+    options["diffusion_zone_type"] = [
+        {"value": c[0], "label": c[1]} for c in AdminDivisionType.choices
+    ]
+    options["deployment_departments"] = list(
+        DeploymentState.objects.filter(
+            state__in=[DeploymentLevel.IN_PROGRESS, DeploymentLevel.FINALIZING]
+        ).values_list("department_code", flat=True)
+    )
+    return options
+
+
+def get_global_options() -> tuple[dict, str]:
+    """Partie globale des options, et son empreinte."""
+    global _global_options
+
+    enums = {key: get_enum(model) for key, model in ENUMS.items()}
+    stamp = (_get_version(), *(values.generation for values in enums.values()))
+
+    if _global_options is None or _global_options[0] != stamp:
+        options = _build_global_options(enums)
+        _global_options = (stamp, options, _digest(options))
+
+    return _global_options[1], _global_options[2]
+
+
+def get_user_custom_choices(user) -> dict[str, list[dict]]:
+    """Choix personnalisés des structures visibles par l'utilisateur (hors choix globaux)."""
+    if not user.is_authenticated:
+        return {}
+
+    if user.is_staff:
+        filters = Q()
+    else:
+        filters = Q(
+            structure_id__in=StructureMember.objects.filter(user=user).values(
+                "structure_id"
+            )
+        )
+        if user.is_manager and user.departments:
+            filters |= Q(
+                structure_id__in=Structure.objects.filter(
+                    department__in=user.departments
+                ).values("pk")
+            )
+
+    # une seule requête pour tous les types de choix
+    querysets = [
+        model.objects.filter(filters)
+        .exclude(structure=None)
+        .annotate(kind=Value(key))
+        .values_list("id", "name", "structure__slug", "kind")
+        for key, model in CUSTOM_CHOICES.items()
+    ]
+    rows = querysets[0].union(*querysets[1:], all=True).order_by("kind", "id")
+
+    return {
+        key: [
+            {"value": id, "label": name, "structure": structure}
+            for id, name, structure, _ in choices
+        ]
+        for key, choices in itertools.groupby(rows, key=lambda row: row[3])
+    }
+
+
+def get_options(user) -> tuple[dict, str]:
+    """Options des services pour l'utilisateur, et leur ETag."""
+    global_options, global_digest = get_global_options()
+    custom_choices = get_user_custom_choices(user)
+
+    options = {
+        **global_options,
+        **{
+            key: global_options[key] + choices
+            for key, choices in custom_choices.items()
+        },
+    }
+    etag = f'"{global_digest}-{_digest(custom_choices) if custom_choices else 0}"'
+    return options, etag
@@ -0,0 +1,190 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from dora import data_inclusion
+from dora.admin_express.models import City
+from dora.admin_express.utils import arrdt_to_main_insee_code
+
+from .models import SavedSearch
+from .search import SearchResults, search_services
+
+logger = logging.getLogger(__name__)
+
+# nombre maximal de recherches effectuées lors de l'affichage de la liste des alertes
+MAX_LAZY_NEW_SERVICES_COUNTS = 3
+
+"""
+Alertes des recherches sauvegardées :
+    Les recherches sauvegardées ayant les mêmes critères (commune et filtres)
+    sont regroupées : la recherche des nouveaux services n'est faite qu'une fois
+    par groupe, à partir de la plus ancienne date de dernière notification du groupe,
+    puis les résultats sont filtrés pour chaque recherche sauvegardée.
+"""
+
+
+class SavedSearchFilters(NamedTuple):
+    city_code: str
+    category: Optional[str]
+    subcategories: tuple[str, ...]
+    kinds: tuple[str, ...]
+    fees: tuple[str, ...]
+    location_kinds: tuple[str, ...]
+
+    @classmethod
+    def from_saved_search(cls, saved_search: SavedSearch) -> "SavedSearchFilters":
+        # utilise les relations M2M préchargées (`prefetch_related`), si disponibles
+        def values(related) -> tuple[str, ...]:
+            return tuple(sorted(obj.value for obj in related.all()))
+
+        return cls(
+            city_code=saved_search.city_code,
+            category=saved_search.category.value if saved_search.category else None,
+            subcategories=values(saved_search.subcategories),
+            kinds=values(saved_search.kinds),
+            fees=values(saved_search.fees),
+            location_kinds=values(saved_search.location_kinds),
+        )
+
+
+def get_saved_searches_di_client() -> Optional[data_inclusion.DataInclusionClient]:
+    return (
+        data_inclusion.di_client_factory()
+        if settings.INCLUDES_DI_SERVICES_IN_SAVED_SEARCH_NOTIFICATIONS
+        else None
+    )
+
+
+def _published_since(cutoff_date: date) -> datetime:
+    # début du jour suivant la date limite (dans le fuseau horaire courant)
+    return timezone.make_aware(
+        datetime.combine(cutoff_date + timedelta(days=1), time.min)
+    )
+
+
+def _is_published_after(result: dict, cutoff_date: date) -> bool:
+    return datetime.fromisoformat(result["publication_date"]).date() > cutoff_date
+
+
+def search_recent_services(
+    filters: SavedSearchFilters,
+    city: City,
+    cutoff_date: date,
+    di_client: Optional[data_inclusion.DataInclusionClient] = None,
+    wait_for_di: bool = False,
+) -> SearchResults:
+    """Services correspondant aux filtres, publiés après la date limite."""
+    results, di_degraded = search_services(
+        None,
+        filters.city_code,
+        city,
+        [filters.category] if filters.category and not filters.subcategories else None,
+        list(filters.subcategories) or None,
+        list(filters.kinds) or None,
+        list(filters.fees) or None,
+        list(filters.location_kinds) or None,
+        di_client,
+        published_since=_published_since(cutoff_date),
+        wait_for_di=wait_for_di,
+    )
+    # les résultats d·i ne sont pas filtrés lors de la recherche
+    return SearchResults(
+        [r for r in results if _is_published_after(r, cutoff_date)], di_degraded
+    )
+
+
+def get_recent_services_by_saved_search(
+    saved_searches: Iterable[SavedSearch],
+    di_client: Optional[data_inclusion.DataInclusionClient] = None,
+    cutoff_date: Optional[date] = None,
+    wait_for_di: bool = False,
+) -> dict[int, list[dict]]:
+    """Nouveaux services de chaque recherche sauvegardée,
+    publiés depuis sa dernière notification (ou depuis `cutoff_date`, si définie).
+
+    Les recherches sauvegardées dont les résultats d·i sont incomplets
+    (d·i en erreur ou trop lent) sont ignorées : elles seront traitées
+    lors d'une prochaine exécution.
+
+    Returns:
+        Les nouveaux services, par identifiant de recherche sauvegardée.
+    """
+
+    def get_cutoff_date(saved_search: SavedSearch) -> date:
+        return cutoff_date or saved_search.last_notification_date
+
+    groups = defaultdict(list)
+    for saved_search in saved_searches:
+        groups[SavedSearchFilters.from_saved_search(saved_search)].append(saved_search)
+
+    cities = City.objects.in_bulk(
+        {arrdt_to_main_insee_code(filters.city_code) for filters in groups}
+    )
+
+    recent_services = {}
+    for filters, group in groups.items():
+        city = cities.get(arrdt_to_main_insee_code(filters.city_code))
+        if city is None:
+            logger.warning("Commune inconnue : %s", filters.city_code)
+            recent_services.update((saved_search.pk, []) for saved_search in group)
+            continue
+
+        results, di_degraded = search_recent_services(
+            filters,
+            city,
+            min(get_cutoff_date(s) for s in group),
+            di_client,
+            wait_for_di=wait_for_di,
+        )
+        if di_degraded:
+            logger.warning(
+                "Résultats d·i incomplets, %s recherche(s) sauvegardée(s) ignorée(s)",
+                len(group),
+            )
+            continue
+        for saved_search in group:
+            recent_services[saved_search.pk] = [
+                r
+                for r in results
+                if _is_published_after(r, get_cutoff_date(saved_search))
+            ]
+
+    return recent_services
+
+
+def get_new_services_cutoff_date() -> date:
+    # nouveaux services affichés dans la liste des alertes
+    return (
+        timezone.now() - timedelta(days=settings.RECENT_SERVICES_CUTOFF_DAYS)
+    ).date()
+
+
+def refresh_new_services_counts(
+    saved_searches: list[SavedSearch],
+    di_client: Optional[data_inclusion.DataInclusionClient] = None,
+    wait_for_di: bool = False,
+):
+    """Met à jour le nombre de nouveaux services des recherches sauvegardées.
+
+    Le nombre des recherches dont les résultats d·i sont incomplets
+    n'est pas mis à jour (il sera recalculé à la demande).
+    """
+    recent_services = get_recent_services_by_saved_search(
+        saved_searches,
+        di_client,
+        cutoff_date=get_new_services_cutoff_date(),
+        wait_for_di=wait_for_di,
+    )
+    today = timezone.localdate()
+    refreshed = [s for s in saved_searches if s.pk in recent_services]
+    for saved_search in refreshed:
+        saved_search.new_services_count = len(recent_services[saved_search.pk])
+        saved_search.new_services_count_date = today
+
+    SavedSearch.objects.bulk_update(
+        refreshed, ["new_services_count", "new_services_count_date"]
+    )
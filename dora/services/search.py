@@ -1,58 +1,99 @@
+import binascii
+import logging
 import random
+import time
 from _operator import itemgetter
-from datetime import date
-from typing import Optional
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date, datetime
+from typing import Callable, NamedTuple, Optional
 
 import requests
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
-from django.db.models import IntegerField, Q, Value
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Value, When
 from django.utils import timezone
+from rest_framework import serializers
 
 import dora.services.models as models
 from dora import data_inclusion
 from dora.admin_express.models import City
 from dora.core.constants import WGS84
+from dora.core.enum_registry import get_enum
 from dora.data_inclusion.constants import THEMATIQUES_MAPPING_DORA_TO_DI
 from dora.structures.models import Structure
 
 from .constants import EXCLUDED_DI_SERVICES_THEMATIQUES
+from .enums import ServiceStatus
 from .serializers import SearchResultSerializer
 from .utils import filter_services_by_city_code
 
+logger = logging.getLogger(__name__)
+
 MAX_DISTANCE = 50
 
+# Pool de threads partagé par le processus (worker gunicorn) :
+# la recherche d·i (appel HTTP) est lancée en parallèle de la recherche DORA (PostGIS).
+# Seul l'appel distant est fait dans ce thread, aucun accès à la base de données.
+_di_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="di-search")
+
+
+def _has_related(field_name: str, **filters) -> Exists:
+    """Sous-requête `EXISTS` sur une relation M2M du service.
+
+    Remplace la jointure (et le `DISTINCT` qu'elle rendrait nécessaire)
+    par une semi-jointure sur la table de liaison.
+    """
+    field = models.Service._meta.get_field(field_name)
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    return Exists(
+        field.remote_field.through.objects.filter(
+            **{source: OuterRef("pk")},
+            **{f"{target}__{lookup}": value for lookup, value in filters.items()},
+        )
+    )
+
 
 def _filter_and_annotate_dora_services(services, location, with_remote, with_onsite):
-    no_services = models.Service.objects.none()
     # 1) services ayant un lieu de déroulement, à moins de MAX_DISTANCE km
-    services_on_site = (
-        services.filter(location_kinds__value="en-presentiel")
-        .annotate(distance=Distance("geom", location))
-        .filter(distance__lte=D(km=MAX_DISTANCE))
-        if with_onsite
-        else no_services
+    # (`dwithin` permet l'utilisation de l'index spatial)
+    on_site = _has_related("location_kinds", value="en-presentiel") & Q(
+        geom__dwithin=(location, D(km=MAX_DISTANCE))
     )
     # 2) services sans lieu de déroulement
-    services_remote = (
-        (
-            services.filter(
-                Q(location_kinds__value="a-distance")
-                | ~Q(location_kinds__value="en-presentiel")
-            )
-            .exclude(id__in=services_on_site)
-            .distinct()
-            .annotate(distance=Value(None, output_field=IntegerField()))
+    remote = (
+        _has_related("location_kinds", value="a-distance")
+        | ~_has_related("location_kinds", value="en-presentiel")
+    ) & ~on_site
+
+    if with_onsite and with_remote:
+        services = services.filter(on_site | remote)
+    elif with_onsite:
+        services = services.filter(on_site)
+    elif with_remote:
+        services = services.filter(
+            _has_related("location_kinds", value="a-distance")
+            | ~_has_related("location_kinds", value="en-presentiel")
+        )
+    else:
+        return services.none()
+
+    # la distance n'est calculée que pour les services sur site
+    return services.annotate(
+        distance=Case(
+            When(on_site, then=Distance("geom", location)),
+            default=None,
         )
-        if with_remote
-        else no_services
+        if with_onsite
+        else Value(None, output_field=IntegerField())
     )
-    return services_on_site | services_remote
 
 
-def _sort_services(services):
+def _sort_services(services, seed: Optional[str] = None):
     on_site_services = []
     remote_services = []
 
@@ -65,12 +106,13 @@ def _sort_services(services):
             on_site_services.append(s)
         elif "a-distance" in s["location_kinds"] or s["location_kinds"] == []:
             remote_services.append(s)
-    random.seed(date.today().isoformat())
-    random.shuffle(on_site_services)
+    # générateur local : même séquence que `random.seed`, sans modifier l'état global
+    rng = random.Random(seed or date.today().isoformat())
+    rng.shuffle(on_site_services)
     on_site_services = sorted(on_site_services, key=itemgetter("distance"))
     on_site_services = iter(on_site_services)
 
-    random.shuffle(remote_services)
+    rng.shuffle(remote_services)
     remote_services = iter(remote_services)
 
     results = []
@@ -89,37 +131,15 @@ def _sort_services(services):
     return results
 
 
-def _get_di_results(
-    di_client: data_inclusion.DataInclusionClient,
-    city_code: str,
+def _get_di_thematiques(
     categories: Optional[list[str]] = None,
     subcategories: Optional[list[str]] = None,
-    kinds: Optional[list[str]] = None,
-    fees: Optional[list[str]] = None,
-    location_kinds: Optional[list[str]] = None,
-    lat: Optional[float] = None,
-    lon: Optional[float] = None,
-) -> list:
-    """Search data.inclusion services.
-
-    The ``di_client`` acts as an entrypoint to the data.inclusion service repository.
-
-    The search will target the sources configured by the ``DATA_INCLUSION_STREAM_SOURCES``
-    environment variable.
-
-    The other arguments match the input parameters from the classical search.
-
-    This function essentially:
-
-    * maps the input parameters,
-    * offloads the search to the data.inclusion client,
-    * maps the output results.
-
-    This function should catch any client and upstream errors to prevent any impact on
-    the classical flow of dora.
+) -> Optional[list[str]]:
+    """Convertit les catégories et sous-catégories DORA en thématiques d·i.
 
     Returns:
-        A list of search results by SearchResultSerializer.
+        La liste des thématiques à rechercher, ``None`` pour ne pas filtrer sur
+        les thématiques, ou une liste vide si aucun résultat d·i n'est attendu.
     """
     thematiques = []
     if categories is not None:
@@ -141,22 +161,44 @@ def _get_di_results(
     if not thematiques and subcategories:
         return []
 
+    return thematiques if len(thematiques) > 0 else None
+
+
+def _search_di_services(
+    di_client: data_inclusion.DataInclusionClient,
+    city_code: str,
+    thematiques: Optional[list[str]] = None,
+    kinds: Optional[list[str]] = None,
+    fees: Optional[list[str]] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+) -> list[dict]:
+    """Effectue l'appel de recherche vers d·i et retourne les résultats bruts.
+
+    N'accède pas à la base de données : peut être exécutée dans un thread séparé.
+    """
     try:
         raw_di_results = di_client.search_services(
             sources=settings.DATA_INCLUSION_STREAM_SOURCES,
             code_insee=city_code,
-            thematiques=thematiques if len(thematiques) > 0 else None,
+            thematiques=thematiques,
             types=kinds,
             frais=fees,
             lat=lat,
             lon=lon,
+            max_items=settings.DATA_INCLUSION_SEARCH_MAX_RESULTS,
         )
     except requests.ConnectionError:
         return []
 
-    if raw_di_results is None:
-        return []
+    return raw_di_results or []
 
+
+def _map_di_results(
+    raw_di_results: list[dict],
+    location_kinds: Optional[list[str]] = None,
+) -> list:
+    """Filtre et convertit les résultats bruts de d·i au format de la recherche DORA."""
     raw_di_results = [
         result
         for result in raw_di_results
@@ -190,7 +232,10 @@ def _get_di_results(
         )
     ]
 
-    supported_service_kinds = models.ServiceKind.objects.values_list("value", flat=True)
+    if not raw_di_results:
+        return []
+
+    supported_service_kinds = get_enum(models.ServiceKind).by_value
 
     mapped_di_results = [
         data_inclusion.map_search_result(result, supported_service_kinds)
@@ -228,8 +273,117 @@ def _get_di_results(
     return mapped_di_results
 
 
-def _get_dora_results(
-    request,
+def _get_di_results(
+    di_client: data_inclusion.DataInclusionClient,
+    city_code: str,
+    categories: Optional[list[str]] = None,
+    subcategories: Optional[list[str]] = None,
+    kinds: Optional[list[str]] = None,
+    fees: Optional[list[str]] = None,
+    location_kinds: Optional[list[str]] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+) -> list:
+    """Search data.inclusion services.
+
+    The ``di_client`` acts as an entrypoint to the data.inclusion service repository.
+
+    The search will target the sources configured by the ``DATA_INCLUSION_STREAM_SOURCES``
+    environment variable.
+
+    The other arguments match the input parameters from the classical search.
+
+    This function essentially:
+
+    * maps the input parameters,
+    * offloads the search to the data.inclusion client,
+    * maps the output results.
+
+    This function should catch any client and upstream errors to prevent any impact on
+    the classical flow of dora.
+
+    Returns:
+        A list of search results by SearchResultSerializer.
+    """
+    thematiques = _get_di_thematiques(categories, subcategories)
+    if thematiques == []:
+        return []
+
+    raw_di_results = _search_di_services(
+        di_client,
+        city_code=city_code,
+        thematiques=thematiques,
+        kinds=kinds,
+        fees=fees,
+        lat=lat,
+        lon=lon,
+    )
+    return _map_di_results(raw_di_results, location_kinds)
+
+
+def _submit_di_search(
+    di_client: data_inclusion.DataInclusionClient,
+    city_code: str,
+    categories: Optional[list[str]] = None,
+    subcategories: Optional[list[str]] = None,
+    kinds: Optional[list[str]] = None,
+    fees: Optional[list[str]] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+) -> Optional[Future]:
+    """Lance la recherche d·i en tâche de fond.
+
+    Returns:
+        Un ``Future`` contenant les résultats bruts de d·i,
+        ou ``None`` si aucune recherche n'est nécessaire.
+    """
+    thematiques = _get_di_thematiques(categories, subcategories)
+    if thematiques == []:
+        return None
+
+    return _di_search_executor.submit(
+        _search_di_services,
+        di_client,
+        city_code=city_code,
+        thematiques=thematiques,
+        kinds=kinds,
+        fees=fees,
+        lat=lat,
+        lon=lon,
+    )
+
+
+def _collect_di_results(
+    future: Optional[Future],
+    location_kinds: Optional[list[str]] = None,
+    timeout: Optional[float] = None,
+) -> tuple[list, bool]:
+    """Récupère les résultats de la recherche d·i lancée par `_submit_di_search`.
+
+    Si d·i ne répond pas avant l'échéance ou est en erreur,
+    la recherche se poursuit avec les seuls résultats DORA (recherche "dégradée").
+
+    Returns:
+        Les résultats d·i, et un booléen indiquant si la recherche est dégradée.
+    """
+    if future is None:
+        return [], False
+
+    try:
+        raw_di_results = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # l'appel se terminera en tâche de fond (borné par le timeout du client)
+        future.cancel()
+        logger.warning("Recherche d·i : échéance de %ss dépassée", timeout)
+        return [], True
+    except Exception as err:
+        logger.exception("Recherche d·i : erreur inattendue (%s)", err)
+        return [], True
+
+    return _map_di_results(raw_di_results, location_kinds), False
+
+
+def _get_dora_services(
     city_code: str,
     city: City,
     categories: Optional[list[str]] = None,
@@ -239,22 +393,14 @@ def _get_dora_results(
     location_kinds: Optional[list[str]] = None,
     lat: Optional[float] = None,
     lon: Optional[float] = None,
+    published_since: Optional[datetime] = None,
 ):
-    services = (
-        models.Service.objects.published()
-        .select_related(
-            "structure",
-        )
-        .prefetch_related(
-            "kinds",
-            "fee_condition",
-            "location_kinds",
-            "categories",
-            "subcategories",
-            "coach_orientation_modes",
-            "beneficiaries_access_modes",
-        )
-    )
+    services = models.Service.objects.published()
+
+    if published_since:
+        # filtre sélectif (index sur la date de publication),
+        # appliqué avant le filtrage géographique
+        services = services.filter(publication_date__gte=published_since)
 
     # On exclus les services dont la structure est marquèe comme obsolète
     services = services.exclude(structure__is_obsolete=True)
@@ -265,20 +411,22 @@ def _get_dora_results(
     services = services.exclude(structure__in=Structure.objects.orphans())
 
     if kinds:
-        services = services.filter(kinds__value__in=kinds)
+        services = services.filter(_has_related("kinds", value__in=kinds))
 
     if fees:
         services = services.filter(fee_condition__value__in=fees)
 
     if location_kinds:
-        services = services.filter(location_kinds__value__in=location_kinds)
+        services = services.filter(
+            _has_related("location_kinds", value__in=location_kinds)
+        )
 
     with_remote = not location_kinds or "a-distance" in location_kinds
     with_onsite = not location_kinds or "en-presentiel" in location_kinds
 
     categories_filter = Q()
     if categories:
-        categories_filter = Q(categories__value__in=categories)
+        categories_filter = _has_related("categories", value__in=categories)
 
     subcategories_filter = Q()
     if subcategories:
@@ -287,32 +435,247 @@ def _get_dora_results(
             if subcat == "autre":
                 # Quand on cherche une sous-catégorie de type 'Autre', on veut
                 # aussi remonter les services sans sous-catégorie
-                all_sister_subcats = models.ServiceSubCategory.objects.filter(
-                    value__startswith=f"{cat}--"
-                )
-                subcategories_filter |= Q(subcategories__value=subcategory) | (
-                    Q(categories__value=cat) & ~Q(subcategories__in=all_sister_subcats)
+                subcategories_filter |= _has_related(
+                    "subcategories", value=subcategory
+                ) | (
+                    _has_related("categories", value=cat)
+                    & ~_has_related("subcategories", value__startswith=f"{cat}--")
                 )
             else:
-                subcategories_filter |= Q(subcategories__value=subcategory)
+                subcategories_filter |= _has_related("subcategories", value=subcategory)
 
-    services = services.filter(categories_filter | subcategories_filter).distinct()
+    if categories or subcategories:
+        services = services.filter(categories_filter | subcategories_filter)
 
     geofiltered_services = filter_services_by_city_code(services, city_code)
 
     # Exclude suspended services
     services_to_display = geofiltered_services.filter(
         Q(suspension_date=None) | Q(suspension_date__gte=timezone.now())
-    ).distinct()
+    )
 
-    results = _filter_and_annotate_dora_services(
+    return _filter_and_annotate_dora_services(
         services_to_display,
         city.geom if not lat or not lon else Point(lon, lat, srid=WGS84),
         with_remote,
         with_onsite,
     )
 
-    return SearchResultSerializer(results, many=True, context={"request": request}).data
+
+def _m2m_values(field_name: str) -> ArraySubquery:
+    """Valeurs (`value`) d'une relation M2M du service, agrégées dans un tableau."""
+    field = models.Service._meta.get_field(field_name)
+    return ArraySubquery(
+        field.remote_field.through.objects.filter(
+            **{field.m2m_field_name(): OuterRef("pk")}
+        )
+        .order_by("pk")
+        .values(f"{field.m2m_reverse_field_name()}__value")
+    )
+
+
+_STRUCTURE_INFO_FIELDS = [
+    "address1",
+    "address2",
+    "city",
+    "department",
+    "name",
+    "postal_code",
+    "short_desc",
+    "siret",
+    "slug",
+    "url",
+]
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _project_search_results(services) -> list[dict]:
+    """Projection des résultats de recherche DORA.
+
+    Produit les mêmes données que `SearchResultSerializer`, directement
+    à partir de `.values()` et de tableaux agrégés pour les relations M2M :
+    aucune instance de modèle n'est créée.
+    """
+    rows = services.values(
+        "address1",
+        "address2",
+        "city",
+        "contact_email",
+        "diffusion_zone_type",
+        "distance",
+        "geom",
+        "modification_date",
+        "name",
+        "postal_code",
+        "publication_date",
+        "short_desc",
+        "slug",
+        "status",
+        *(f"structure__{field}" for field in _STRUCTURE_INFO_FIELDS),
+        "structure__disable_orientation_form",
+        _fee_condition=F("fee_condition__value"),
+        _kinds=_m2m_values("kinds"),
+        _location_kinds=_m2m_values("location_kinds"),
+        _coach_orientation_modes=_m2m_values("coach_orientation_modes"),
+        _beneficiaries_access_modes=_m2m_values("beneficiaries_access_modes"),
+    )
+
+    results = []
+    for row in rows:
+        siret = row["structure__siret"]
+        results.append(
+            {
+                "address1": row["address1"],
+                "address2": row["address2"],
+                "city": row["city"],
+                "coordinates": (row["geom"].x, row["geom"].y) if row["geom"] else None,
+                "diffusion_zone_type": row["diffusion_zone_type"],
+                "distance": row["distance"].km if row["distance"] is not None else None,
+                "kinds": row["_kinds"],
+                "location_kinds": row["_location_kinds"],
+                "fee_condition": row["_fee_condition"],
+                "modification_date": _datetime_field.to_representation(
+                    row["modification_date"]
+                ),
+                "name": row["name"],
+                "postal_code": row["postal_code"],
+                "publication_date": _datetime_field.to_representation(
+                    row["publication_date"]
+                ),
+                "short_desc": row["short_desc"],
+                "slug": row["slug"],
+                "status": row["status"],
+                "structure_info": {
+                    field: row[f"structure__{field}"]
+                    for field in _STRUCTURE_INFO_FIELDS
+                },
+                "structure": row["structure__slug"],
+                # voir `Service.is_orientable`
+                "is_orientable": bool(
+                    row["status"] == ServiceStatus.PUBLISHED
+                    and not row["structure__disable_orientation_form"]
+                    and not (
+                        siret and siret[0:9] in settings.ORIENTATION_SIRENE_BLACKLIST
+                    )
+                    and row["contact_email"]
+                ),
+                "coach_orientation_modes": row["_coach_orientation_modes"],
+                "beneficiaries_access_modes": row["_beneficiaries_access_modes"],
+            }
+        )
+    return results
+
+
+def _serialize_search_results(request, services) -> list[dict]:
+    # sérialisation "historique" des résultats, conservée comme référence
+    # pour la projection (voir la commande `benchmark_search`)
+    services = services.select_related("structure").prefetch_related(
+        "kinds",
+        "fee_condition",
+        "location_kinds",
+        "categories",
+        "subcategories",
+        "coach_orientation_modes",
+        "beneficiaries_access_modes",
+    )
+    return SearchResultSerializer(
+        services, many=True, context={"request": request}
+    ).data
+
+
+def _get_dora_results(
+    city_code: str,
+    city: City,
+    categories: Optional[list[str]] = None,
+    subcategories: Optional[list[str]] = None,
+    kinds: Optional[list[str]] = None,
+    fees: Optional[list[str]] = None,
+    location_kinds: Optional[list[str]] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    published_since: Optional[datetime] = None,
+):
+    results = _get_dora_services(
+        city_code=city_code,
+        city=city,
+        categories=categories,
+        subcategories=subcategories,
+        kinds=kinds,
+        fees=fees,
+        location_kinds=location_kinds,
+        lat=lat,
+        lon=lon,
+        published_since=published_since,
+    )
+
+    return _project_search_results(results.order_by("pk"))
+
+
+def _get_dora_sort_keys(services) -> list[dict]:
+    # uniquement les champs nécessaires au tri (voir `_sort_services`),
+    # les résultats complets ne sont projetés que pour la page demandée
+    return [
+        {
+            "slug": row["slug"],
+            "distance": row["distance"].km if row["distance"] is not None else None,
+            "location_kinds": row["_location_kinds"],
+            "_dora_key": True,
+        }
+        for row in services.order_by("pk").values(
+            "slug", "distance", _location_kinds=_m2m_values("location_kinds")
+        )
+    ]
+
+
+def _run_search(
+    get_dora_results: Callable[[], list[dict]],
+    city_code: str,
+    categories: Optional[list[str]] = None,
+    subcategories: Optional[list[str]] = None,
+    kinds: Optional[list[str]] = None,
+    fees: Optional[list[str]] = None,
+    location_kinds: Optional[list[str]] = None,
+    di_client: Optional[data_inclusion.DataInclusionClient] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    wait_for_di: bool = False,
+) -> tuple[list[dict], bool]:
+    # La recherche d·i est lancée en parallèle de la recherche DORA :
+    # la latence de la recherche est celle du plus lent des deux (dans la limite
+    # de `DATA_INCLUSION_SEARCH_DEADLINE_SECONDS` pour d·i, sauf si `wait_for_di`).
+    di_deadline = time.monotonic() + settings.DATA_INCLUSION_SEARCH_DEADLINE_SECONDS
+    di_future = (
+        _submit_di_search(
+            di_client=di_client,
+            categories=categories,
+            subcategories=subcategories,
+            city_code=city_code,
+            kinds=kinds,
+            fees=fees,
+            lat=lat,
+            lon=lon,
+        )
+        if di_client is not None
+        else None
+    )
+
+    dora_results = get_dora_results()
+
+    di_results, di_degraded = _collect_di_results(
+        di_future,
+        location_kinds=location_kinds,
+        # sans échéance, l'attente reste bornée par le timeout du client d·i
+        timeout=None if wait_for_di else max(di_deadline - time.monotonic(), 0),
+    )
+
+    return [*dora_results, *di_results], di_degraded
+
+
+class SearchResults(NamedTuple):
+    services: list[dict]
+    # d·i n'a pas répondu à temps ou est en erreur : résultats DORA uniquement
+    di_degraded: bool
 
 
 def search_services(
@@ -327,7 +690,9 @@ def search_services(
     di_client: Optional[data_inclusion.DataInclusionClient] = None,
     lat: Optional[float] = None,
     lon: Optional[float] = None,
-) -> list[dict]:
+    published_since: Optional[datetime] = None,
+    wait_for_di: bool = False,
+) -> SearchResults:
     """Search services from all available repositories.
 
     It always includes results from dora own databases.
@@ -335,39 +700,148 @@ def search_services(
     If the ``di_client`` parameter is defined, results from data.inclusion will be
     added using the client dependency.
 
+    If ``published_since`` is defined, only dora services published since
+    this date are included (data.inclusion results are not filtered).
+
+    If ``wait_for_di`` is true, data.inclusion results are awaited without
+    the interactive search deadline (batch processing).
+
     Note : this is the only point where di_client is "injected"
 
     Returns:
-        A list of search results by SearchResultSerializer.
+        A list of search results by SearchResultSerializer,
+        and whether data.inclusion results are missing (timeout or error).
     """
-    di_results = (
-        _get_di_results(
-            di_client=di_client,
+    all_results, di_degraded = _run_search(
+        lambda: _get_dora_results(
+            city_code=city_code,
+            city=city,
             categories=categories,
             subcategories=subcategories,
-            city_code=city_code,
             kinds=kinds,
             fees=fees,
             location_kinds=location_kinds,
             lat=lat,
             lon=lon,
-        )
-        if di_client is not None
-        else []
+            published_since=published_since,
+        ),
+        city_code=city_code,
+        categories=categories,
+        subcategories=subcategories,
+        kinds=kinds,
+        fees=fees,
+        location_kinds=location_kinds,
+        di_client=di_client,
+        lat=lat,
+        lon=lon,
+        wait_for_di=wait_for_di,
     )
+    return SearchResults(_sort_services(all_results), di_degraded)
+
+
+def encode_search_cursor(seed: str, offset: int) -> str:
+    return urlsafe_b64encode(f"{seed}:{offset}".encode()).decode()
+
+
+def decode_search_cursor(cursor: str) -> tuple[str, int]:
+    """Décode un curseur de pagination de la recherche.
+
+    Raises:
+        ValueError: si le curseur est invalide.
+    """
+    try:
+        seed, offset = urlsafe_b64decode(cursor.encode()).decode().rsplit(":", 1)
+        date.fromisoformat(seed)
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as err:
+        raise ValueError(f"curseur invalide : {cursor}") from err
+    if offset < 0:
+        raise ValueError(f"curseur invalide : {cursor}")
+    return seed, offset
+
 
-    dora_results = _get_dora_results(
-        request=request,
+def search_services_page(
+    request,
+    city_code: str,
+    city: City,
+    page_size: int,
+    cursor: Optional[str] = None,
+    categories: Optional[list[str]] = None,
+    subcategories: Optional[list[str]] = None,
+    kinds: Optional[list[str]] = None,
+    fees: Optional[list[str]] = None,
+    location_kinds: Optional[list[str]] = None,
+    di_client: Optional[data_inclusion.DataInclusionClient] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+) -> dict:
+    """Version paginée de ``search_services``.
+
+    L'ordre des résultats est le même que celui de ``search_services`` ;
+    la graine du mélange est conservée dans le curseur, afin que l'ordre reste stable
+    d'une page à l'autre (y compris au changement de jour).
+
+    Seuls les services DORA de la page demandée sont projetés.
+
+    Returns:
+        Un dictionnaire contenant le nombre total de résultats (``count``),
+        le curseur de la page suivante (``next``, ou ``None``)
+        les résultats de la page (``services``)
+        et si les résultats d·i sont absents (``di_degraded``, échéance ou erreur).
+
+    Raises:
+        ValueError: si le curseur est invalide.
+    """
+    if cursor:
+        seed, offset = decode_search_cursor(cursor)
+    else:
+        seed, offset = date.today().isoformat(), 0
+
+    dora_services = _get_dora_services(
+        city_code=city_code,
+        city=city,
         categories=categories,
         subcategories=subcategories,
+        kinds=kinds,
+        fees=fees,
+        location_kinds=location_kinds,
+        lat=lat,
+        lon=lon,
+    )
+
+    all_results, di_degraded = _run_search(
+        lambda: _get_dora_sort_keys(dora_services),
         city_code=city_code,
-        city=city,
+        categories=categories,
+        subcategories=subcategories,
         kinds=kinds,
         fees=fees,
         location_kinds=location_kinds,
+        di_client=di_client,
         lat=lat,
         lon=lon,
     )
+    sorted_results = _sort_services(all_results, seed=seed)
+    page = sorted_results[offset : offset + page_size]
+
+    dora_slugs = [r["slug"] for r in page if r.get("_dora_key")]
+    dora_results = (
+        {
+            r["slug"]: r
+            for r in _project_search_results(dora_services.filter(slug__in=dora_slugs))
+        }
+        if dora_slugs
+        else {}
+    )
 
-    all_results = [*dora_results, *di_results]
-    return _sort_services(all_results)
+    next_offset = offset + page_size
+    return {
+        "count": len(sorted_results),
+        "next": encode_search_cursor(seed, next_offset)
+        if next_offset < len(sorted_results)
+        else None,
+        "services": [
+            dora_results[r["slug"]] if r.get("_dora_key") else r for r in page
+        ],
+        "di_degraded": di_degraded,
+    }
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from dora.admin_express.models import AdminDivisionType
+
+# Cache des réponses de la recherche (`dora.services.views.search`).
+#
+# Pour une journée donnée, l'ordre des résultats est déterministe (voir `_sort_services`) :
+# une même recherche produit donc toujours la même réponse.
+#
+# Chaque zone de diffusion (France entière, commune, EPCI, département, région)
+# possède un numéro de version, qui fait partie de la clé de cache des recherches
+# portant sur les communes de cette zone.
+# La modification d'un service publié change la version de sa zone de diffusion,
+# invalidant ainsi les recherches concernées.
+
+CACHE_KEY_PREFIX = "search-cache"
+
+# précision des coordonnées de la recherche (~100m) : des recherches
+# géolocalisées proches partagent la même réponse en cache
+COORDINATES_PRECISION = 3
+
+
+def round_coordinate(value: Optional[float]) -> Optional[float]:
+    return round(value, COORDINATES_PRECISION) if value is not None else None
+
+
+def _zone_version_key(zone_type: str, zone_details: str) -> str:
+    if zone_type == AdminDivisionType.COUNTRY:
+        # le détail n'est pas pris en compte pour une diffusion nationale
+        zone_details = ""
+    return f"{CACHE_KEY_PREFIX}:zone:{zone_type}:{zone_details or ''}"
+
+
+def _get_city_zones(city) -> list[tuple[str, str]]:
+    # zones de diffusion pouvant contenir la commune recherchée
+    return [
+        (AdminDivisionType.COUNTRY, ""),
+        (AdminDivisionType.CITY, city.code),
+        (AdminDivisionType.DEPARTMENT, city.department),
+        (AdminDivisionType.REGION, city.region),
+        *((AdminDivisionType.EPCI, epci) for epci in city.epcis),
+    ]
+
+
+def _get_zone_versions(zones: list[tuple[str, str]]) -> list[str]:
+    keys = [_zone_version_key(*zone) for zone in zones]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # une version absente (jamais définie ou évincée) est initialisée :
+            # elle ne peut pas correspondre à une réponse déjà en cache
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_zone(zone_type: str, zone_details: str):
+    cache.set(_zone_version_key(zone_type, zone_details), uuid.uuid4().hex, None)
+
+
+def make_search_cache_key(city, params: dict, seed: str) -> Optional[str]:
+    """Clé de cache d'une recherche (``None`` si le cache est désactivé).
+
+    Les paramètres sont normalisés (listes triées) ;
+    la clé dépend de la graine du mélange des résultats et des versions
+    des zones de diffusion couvrant la commune.
+    """
+    if settings.SEARCH_CACHE_TTL_SECONDS <= 0:
+        return None
+
+    normalized = {
+        key: sorted(set(value)) if isinstance(value, list) else value
+        for key, value in params.items()
+    }
+    digest = hashlib.sha1(
+        json.dumps(
+            [city.code, normalized, seed, _get_zone_versions(_get_city_zones(city))],
+            sort_keys=True,
+        ).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:response:{digest}"
+
+
+def _get_timeout() -> int:
+    # les réponses expirent au plus tard au changement de graine
+    # (`date.today()`, voir `_sort_services`)
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    return max(
+        min(
+            settings.SEARCH_CACHE_TTL_SECONDS,
+            int((midnight - now).total_seconds()),
+        ),
+        1,
+    )
+
+
+def get_cached_search(key: Optional[str]) -> Optional[dict]:
+    if key is None:
+        return None
+    return cache.get(key)
+
+
+def set_cached_search(key: Optional[str], response_data: dict):
+    if key is None:
+        return
+    cache.set(key, response_data, timeout=_get_timeout())
@@ -1,11 +1,9 @@
 import logging
-from datetime import timedelta
 
 import requests
-from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
-from django.utils.timezone import now
+from django.utils import timezone
 from rest_framework import exceptions, serializers
 from rest_framework.relations import PrimaryKeyRelatedField
 
@@ -620,6 +618,7 @@ class SavedSearchSerializer(serializers.ModelSerializer):
 
         if not with_counts:
             self.fields.pop("new_services_count")
+        self._num_lazy_counts = 0
 
     category = serializers.SlugRelatedField(
         slug_field="value",
@@ -693,12 +692,24 @@ class SavedSearchSerializer(serializers.ModelSerializer):
         ]
 
     def get_new_services_count(self, obj):
-        return len(
-            obj.get_recent_services(
-                (now() - timedelta(days=settings.RECENT_SERVICES_CUTOFF_DAYS)).date()
-            )
+        from .saved_searches import (
+            MAX_LAZY_NEW_SERVICES_COUNTS,
+            get_saved_searches_di_client,
+            refresh_new_services_counts,
         )
 
+        # nombre précalculé (voir la commande `refresh_saved_searches_counts`),
+        # recalculé à la demande s'il date d'un jour précédent ou si un service
+        # a été publié depuis, dans la limite de MAX_LAZY_NEW_SERVICES_COUNTS
+        # recherches par requête
+        if (
+            obj.new_services_count_date != timezone.localdate()
+            and self._num_lazy_counts < MAX_LAZY_NEW_SERVICES_COUNTS
+        ):
+            self._num_lazy_counts += 1
+            refresh_new_services_counts([obj], get_saved_searches_di_client())
+        return obj.new_services_count or 0
+
 
 class BookmarkListSerializer(serializers.ModelSerializer):
     slug = serializers.SerializerMethodField()
@@ -746,6 +757,11 @@ class BookmarkSerializer(BookmarkListSerializer):
             }
         else:
             source_di, di_service_id = obj.di_id.split("--")
+            # services D·I pré-chargés par la vue (voir `BookmarkViewSet.list`)
+            di_services = self.context.get("di_services")
+            if di_services is not None and obj.di_id in di_services:
+                return self._format_di_service(di_services[obj.di_id])
+
             # note : pour pouvoir être mocké correctement,
             # le client D·I doit être importé avec le *même* chemin que
             # celui utilisé au moment du `patch`
@@ -760,16 +776,19 @@ class BookmarkSerializer(BookmarkListSerializer):
                 )
             except requests.ConnectionError:
                 return {}
-            if di_service is None:
-                return {}
-            return {
-                "structure_name": di_service["structure"]["nom"],
-                "postal_code": di_service["code_postal"],
-                "city": di_service["commune"],
-                "name": di_service["nom"],
-                "shortDesc": di_service["presentation_resume"] or "",
-                "source": di_service["source"],
-            }
+            return self._format_di_service(di_service)
+
+    def _format_di_service(self, di_service):
+        if di_service is None:
+            return {}
+        return {
+            "structure_name": di_service["structure"]["nom"],
+            "postal_code": di_service["code_postal"],
+            "city": di_service["commune"],
+            "name": di_service["nom"],
+            "shortDesc": di_service["presentation_resume"] or "",
+            "source": di_service["source"],
+        }
 
 
 class SearchResultSerializer(ServiceListSerializer):
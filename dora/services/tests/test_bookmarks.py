@@ -1,4 +1,5 @@
 from datetime import timedelta
+from unittest import mock
 
 from django.utils.timezone import now
 from model_bakery import baker
@@ -10,6 +11,7 @@ from dora.core.test_utils import (
     make_structure,
     make_user,
 )
+from dora.data_inclusion.test_utils import FakeDataInclusionClient, make_di_service_data
 
 from ..enums import ServiceStatus
 from ..models import Bookmark
@@ -247,3 +249,35 @@ class ServiceBookmarkTestCase(APITestCase):
         response = self.client.get("/bookmarks/")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 2)
+
+    def test_list_bookmarks_retrieves_di_services_at_once(self):
+        user = make_user()
+        self.client.force_authenticate(user=user)
+        di_client = FakeDataInclusionClient()
+        for _ in range(3):
+            di_service = make_di_service_data()
+            di_client.services.append(di_service)
+            baker.make(
+                "services.Bookmark",
+                di_id=f"{di_service['source']}--{di_service['id']}",
+                user=user,
+            )
+        baker.make("services.Bookmark", di_id="di_source--inconnu", user=user)
+
+        with (
+            mock.patch("dora.data_inclusion.di_client_factory") as di_client_factory,
+            mock.patch.object(
+                di_client, "retrieve_services", wraps=di_client.retrieve_services
+            ) as retrieve_services,
+        ):
+            di_client_factory.return_value = di_client
+            response = self.client.get("/bookmarks/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(
+            sorted(b["service"].get("name", "") for b in response.data),
+            ["", "Munoz", "Munoz", "Munoz"],
+        )
+        # un seul appel groupé pour tous les favoris D·I
+        retrieve_services.assert_called_once()
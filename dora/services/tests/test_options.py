@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from dora.core.test_utils import make_structure, make_user
+from dora.stats.models import DeploymentLevel, DeploymentState
+
+OPTIONS_URL = "/services-options/"
+
+
+def test_options_not_modified(api_client):
+    baker.make("AccessCondition", name="global")
+
+    response = api_client.get(OPTIONS_URL)
+    assert response.status_code == 200
+    etag = response["ETag"]
+
+    response = api_client.get(OPTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+
+def test_options_etag_follows_global_changes(
+    api_client, django_capture_on_commit_callbacks
+):
+    response = api_client.get(OPTIONS_URL)
+    etag = response["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        condition = baker.make("AccessCondition", name="global")
+        # version inchangée tant que la transaction n'est pas validée
+        response = api_client.get(OPTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+    response = api_client.get(OPTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert condition.id in [c["value"] for c in response.data["access_conditions"]]
+    etag = response["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        baker.make("ServiceKind", value="kind1", label="Type 1")
+    response = api_client.get(OPTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert {"value": "kind1", "label": "Type 1"} in response.data["kinds"]
+    etag = response["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        state = DeploymentState.objects.create(
+            department_code="31",
+            department_name="Haute-Garonne",
+            state=DeploymentLevel.IN_PROGRESS,
+        )
+    response = api_client.get(OPTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "31" in response.data["deployment_departments"]
+    etag = response["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        state.delete()
+    response = api_client.get(OPTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "31" not in response.data["deployment_departments"]
+
+
+def test_options_user_custom_choices(api_client):
+    structure = make_structure()
+    user = make_user(structure=structure)
+    global_condition = baker.make("AccessCondition", name="global")
+    struct_condition = baker.make(
+        "AccessCondition", name="structure", structure=structure
+    )
+    struct_credential = baker.make("Credential", name="structure", structure=structure)
+    other_condition = baker.make(
+        "AccessCondition", name="autre", structure=make_structure()
+    )
+
+    anonymous_response = api_client.get(OPTIONS_URL)
+
+    api_client.force_authenticate(user=user)
+    # partie globale déjà calculée : une seule requête pour les choix de l'utilisateur
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(OPTIONS_URL)
+    assert len([q for q in queries if "services_accesscondition" in q["sql"]]) == 1
+
+    conditions = [c["value"] for c in response.data["access_conditions"]]
+    assert global_condition.id in conditions
+    assert struct_condition.id in conditions
+    assert other_condition.id not in conditions
+    assert {
+        "value": struct_credential.id,
+        "label": "structure",
+        "structure": structure.slug,
+    } in response.data["credentials"]
+    # les options dépendent de l'utilisateur
+    assert response["ETag"] != anonymous_response["ETag"]
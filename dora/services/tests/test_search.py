@@ -1,6 +1,12 @@
+import time
 from unittest import mock
 
 import pytest
+import requests
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from freezegun import freeze_time
 from model_bakery import baker
 
 from dora.admin_express.models import AdminDivisionType
@@ -12,6 +18,18 @@ from dora.core.test_utils import (
 )
 from dora.data_inclusion.test_utils import FakeDataInclusionClient, make_di_service_data
 from dora.services.enums import ServiceStatus
+from dora.services.models import LocationKind, Service
+from dora.services.search import (
+    _get_dora_services,
+    _project_search_results,
+    _serialize_search_results,
+)
+from dora.services.search_cache import _get_timeout, make_search_cache_key
+from dora.services.utils import (
+    filter_services_by_city_code,
+    filter_services_by_department,
+    refresh_diffusion_city_codes,
+)
 
 
 @pytest.fixture
@@ -128,3 +146,419 @@ def test_search_services_excludes_some_action_logement_results(api_client):
         assert (
             len(response.data["services"]) == 1
         ), "un seul service devrait être retourné"
+
+
+class SlowDataInclusionClient(FakeDataInclusionClient):
+    def search_services(self, **kwargs):
+        time.sleep(0.5)
+        return super().search_services(**kwargs)
+
+
+class FailingDataInclusionClient(FakeDataInclusionClient):
+    def search_services(self, **kwargs):
+        raise requests.ConnectionError("d·i indisponible")
+
+
+@pytest.mark.parametrize(
+    "di_client_class", [SlowDataInclusionClient, FailingDataInclusionClient]
+)
+def test_search_services_without_di_results(api_client, settings, di_client_class):
+    # une recherche d·i trop lente ou en erreur ne doit pas bloquer
+    # la recherche : seuls les services DORA sont retournés
+    settings.DATA_INCLUSION_SEARCH_DEADLINE_SECONDS = 0.1
+
+    service = make_published_service(diffusion_zone_type=AdminDivisionType.COUNTRY)
+    city = baker.make("City")
+
+    with mock.patch("dora.data_inclusion.di_client_factory") as mock_di_client_factory:
+        di_client = di_client_class()
+        di_client.services.append(make_di_service_data())
+        mock_di_client_factory.return_value = di_client
+
+        response = api_client.get(f"/search/?city={city.code}")
+
+    assert response.status_code == 200
+    [found] = response.data["services"]
+    assert found["slug"] == service.slug
+
+
+def test_search_services_with_di_results(api_client):
+    service = make_published_service(diffusion_zone_type=AdminDivisionType.COUNTRY)
+    city = baker.make("City")
+
+    with mock.patch("dora.data_inclusion.di_client_factory") as mock_di_client_factory:
+        di_client = FakeDataInclusionClient()
+        di_client.services.append(make_di_service_data(modes_accueil=["a-distance"]))
+        mock_di_client_factory.return_value = di_client
+
+        response = api_client.get(f"/search/?city={city.code}")
+
+    assert response.status_code == 200
+    assert len(response.data["services"]) == 2
+    assert service.slug in [s["slug"] for s in response.data["services"]]
+
+
+def test_diffusion_city_codes_follow_diffusion_zone():
+    city1 = baker.make("City", code="31555", department="31", region="76")
+    city2 = baker.make("City", code="31069", department="31", region="76")
+    baker.make("City", code="75056", department="75", region="11")
+
+    service = make_service(
+        diffusion_zone_type=AdminDivisionType.CITY, diffusion_zone_details=city1.code
+    )
+    assert service.diffusion_city_codes == [city1.code]
+
+    service = Service.objects.get(pk=service.pk)
+    service.diffusion_zone_type = AdminDivisionType.DEPARTMENT
+    service.diffusion_zone_details = "31"
+    service.save()
+    service.refresh_from_db()
+    assert service.diffusion_city_codes == sorted([city1.code, city2.code])
+
+    service.diffusion_zone_type = AdminDivisionType.COUNTRY
+    service.diffusion_zone_details = ""
+    service.save()
+    service.refresh_from_db()
+    assert service.diffusion_city_codes == []
+
+
+def test_refresh_diffusion_city_codes():
+    baker.make("City", code="31555", department="31", region="76")
+    service = make_service(
+        diffusion_zone_type=AdminDivisionType.REGION, diffusion_zone_details="76"
+    )
+    assert service.diffusion_city_codes == ["31555"]
+
+    # nouvelle commune importée dans la région
+    baker.make("City", code="09122", department="09", region="76")
+    refresh_diffusion_city_codes()
+
+    service.refresh_from_db()
+    assert service.diffusion_city_codes == ["09122", "31555"]
+
+
+def test_filter_services_by_diffusion_zone():
+    baker.make("City", code="31555", department="31", region="76")
+    baker.make("City", code="75056", department="75", region="11")
+    baker.make("Department", code="31", region="76")
+
+    in_toulouse = make_service(
+        diffusion_zone_type=AdminDivisionType.CITY, diffusion_zone_details="31555"
+    )
+    in_region = make_service(
+        diffusion_zone_type=AdminDivisionType.REGION, diffusion_zone_details="76"
+    )
+    in_country = make_service(diffusion_zone_type=AdminDivisionType.COUNTRY)
+    make_service(
+        diffusion_zone_type=AdminDivisionType.DEPARTMENT, diffusion_zone_details="75"
+    )
+
+    expected = {in_toulouse.pk, in_region.pk, in_country.pk}
+    assert {
+        s.pk for s in filter_services_by_city_code(Service.objects.all(), "31555")
+    } == expected
+    assert {
+        s.pk for s in filter_services_by_department(Service.objects.all(), "31")
+    } == expected
+
+
+def make_searchable_services(num, **kwargs):
+    location_kinds = LocationKind.objects.filter(
+        value__in=["en-presentiel", "a-distance"]
+    )
+    for _ in range(num):
+        service = make_published_service(
+            diffusion_zone_type=AdminDivisionType.COUNTRY,
+            categories="cat1",
+            subcategories="cat1--sub1,cat1--sub2",
+            **kwargs,
+        )
+        service.location_kinds.set(location_kinds)
+
+
+def test_search_num_queries_does_not_depend_on_results(api_client):
+    city = baker.make("City")
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    baker.make("ServiceSubCategory", value="cat1--sub2")
+    url = f"/search/?city={city.code}&cats=cat1&subs=cat1--sub1&locs=a-distance"
+
+    make_searchable_services(1)
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+    assert len(response.data["services"]) == 1
+    num_queries = len(queries)
+
+    make_searchable_services(5)
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+    # les jointures M2M ne doivent pas dupliquer les résultats
+    assert len(response.data["services"]) == 6
+    assert len(queries) == num_queries
+
+
+def test_search_dora_services_query_plan():
+    city = baker.make("City")
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    baker.make("ServiceSubCategory", value="cat1--sub2")
+    make_searchable_services(3)
+
+    services = _get_dora_services(
+        city_code=city.code,
+        city=city,
+        categories=["cat1"],
+        subcategories=["cat1--sub1", "cat1--autre"],
+        kinds=None,
+        location_kinds=["en-presentiel", "a-distance"],
+    )
+
+    # une seule requête, sans DISTINCT ni union :
+    # les relations M2M sont filtrées par des sous-requêtes EXISTS
+    sql = str(services.query)
+    assert "DISTINCT" not in sql
+    assert "UNION" not in sql
+    assert "EXISTS" in sql
+
+    # pas de dédoublonnage de l'ensemble des résultats
+    top_node = services.explain().splitlines()[0]
+    assert not top_node.startswith(("Unique", "HashAggregate", "GroupAggregate"))
+
+    assert services.count() == 3
+
+
+def test_search_projection_matches_serializer():
+    city = baker.make("City")
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    baker.make("ServiceSubCategory", value="cat1--sub2")
+    make_searchable_services(2, contact_email="test@example.com")
+    make_searchable_services(1, contact_email="")
+    Service.objects.update(geom="POINT(2.35 48.85)")
+    for service in Service.objects.all():
+        service.kinds.set([baker.make("ServiceKind")])
+
+    services = _get_dora_services(
+        city_code=city.code,
+        city=city,
+        categories=["cat1"],
+        lat=48.85,
+        lon=2.36,
+    ).order_by("pk")
+
+    projected = _project_search_results(services)
+    serialized = _serialize_search_results(None, services)
+
+    def normalize(result):
+        # l'ordre des valeurs M2M n'est pas garanti par le sérialiseur
+        return {
+            key: sorted(value)
+            if isinstance(value, list)
+            else dict(value)
+            if isinstance(value, dict)
+            else value
+            for key, value in result.items()
+        }
+
+    assert len(projected) == 3
+    assert [normalize(r) for r in serialized] == [normalize(r) for r in projected]
+    assert sorted(r["is_orientable"] for r in projected) == [False, True, True]
+
+
+def test_search_projection_num_queries():
+    city = baker.make("City")
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    baker.make("ServiceSubCategory", value="cat1--sub2")
+    make_searchable_services(4)
+
+    services = _get_dora_services(city_code=city.code, city=city)
+    with CaptureQueriesContext(connection) as queries:
+        results = _project_search_results(services)
+
+    assert len(results) == 4
+    # les relations M2M sont agrégées dans la requête principale
+    assert len(queries) == 1
+
+
+def test_search_pagination_follows_unpaginated_order(api_client):
+    city = baker.make("City")
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    baker.make("ServiceSubCategory", value="cat1--sub2")
+    make_searchable_services(5)
+
+    with mock.patch("dora.data_inclusion.di_client_factory") as mock_di_client_factory:
+        di_client = FakeDataInclusionClient()
+        di_client.services.append(make_di_service_data(modes_accueil=["a-distance"]))
+        mock_di_client_factory.return_value = di_client
+
+        response = api_client.get(f"/search/?city={city.code}")
+        expected = [s["slug"] for s in response.data["services"]]
+        assert len(expected) == 6
+
+        found = []
+        url = f"/search/?city={city.code}&page_size=4"
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == 200
+            assert response.data["count"] == 6
+            found += [s["slug"] for s in response.data["services"]]
+            cursor = response.data["next"]
+            url = (
+                f"/search/?city={city.code}&page_size=4&cursor={cursor}"
+                if cursor
+                else None
+            )
+
+    assert found == expected
+    # les services DORA de la page sont des résultats complets
+    assert all("structure_info" in s for s in response.data["services"])
+
+
+@pytest.mark.parametrize(
+    "params", ["page_size=0", "page_size=1000", "page_size=x", "page_size=2&cursor=x"]
+)
+def test_search_pagination_invalid_params(api_client, params):
+    city = baker.make("City")
+    response = api_client.get(f"/search/?city={city.code}&{params}")
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def search_cache(settings):
+    settings.SEARCH_CACHE_TTL_SECONDS = 60 * 60
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_search_response_is_cached(api_client, search_cache):
+    city = baker.make("City", department="31", region="76")
+    service = make_published_service(
+        diffusion_zone_type=AdminDivisionType.DEPARTMENT, diffusion_zone_details="31"
+    )
+    url = f"/search/?city={city.code}"
+
+    response = api_client.get(url)
+    assert [s["name"] for s in response.data["services"]] == [service.name]
+
+    # modification ne passant pas par `Service.save` : la réponse en cache est utilisée
+    Service.objects.filter(pk=service.pk).update(name="nouveau nom")
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url)
+    assert [s["name"] for s in response.data["services"]] == [service.name]
+    assert not any('"services_service"' in q["sql"] for q in queries)
+
+    # la clé ne dépend pas de l'ordre des valeurs
+    assert make_search_cache_key(
+        city, {"kinds": ["a", "b"]}, seed="2024-01-01"
+    ) == make_search_cache_key(city, {"kinds": ["b", "a"]}, seed="2024-01-01")
+
+
+def test_search_cache_invalidated_by_service_update(
+    api_client, search_cache, django_capture_on_commit_callbacks
+):
+    city = baker.make("City", department="31", region="76")
+    service = make_published_service(
+        diffusion_zone_type=AdminDivisionType.DEPARTMENT, diffusion_zone_details="31"
+    )
+    url = f"/search/?city={city.code}"
+    assert len(api_client.get(url).data["services"]) == 1
+
+    service = Service.objects.get(pk=service.pk)
+    service.status = ServiceStatus.DRAFT
+    with django_capture_on_commit_callbacks(execute=True):
+        service.save()
+        # invalidation après validation de la transaction
+        assert len(api_client.get(url).data["services"]) == 1
+    assert api_client.get(url).data["services"] == []
+
+    service = Service.objects.get(pk=service.pk)
+    service.status = ServiceStatus.PUBLISHED
+    with django_capture_on_commit_callbacks(execute=True):
+        service.save()
+    assert len(api_client.get(url).data["services"]) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        service.delete()
+    assert api_client.get(url).data["services"] == []
+
+
+@pytest.mark.parametrize(
+    "di_client_class", [SlowDataInclusionClient, FailingDataInclusionClient]
+)
+def test_degraded_search_is_not_cached(
+    api_client, settings, search_cache, di_client_class
+):
+    settings.DATA_INCLUSION_SEARCH_DEADLINE_SECONDS = 0.1
+    make_published_service(diffusion_zone_type=AdminDivisionType.COUNTRY)
+    city = baker.make("City")
+    url = f"/search/?city={city.code}"
+
+    with (
+        mock.patch("dora.data_inclusion.di_client_factory") as mock_di_client_factory,
+        mock.patch("dora.services.views.set_cached_search") as mock_set_cached_search,
+    ):
+        mock_di_client_factory.return_value = di_client_class()
+        assert len(api_client.get(url).data["services"]) == 1
+        assert len(api_client.get(f"{url}&page_size=10").data["services"]) == 1
+
+    mock_set_cached_search.assert_not_called()
+
+
+def test_search_cache_invalidation_is_limited_to_diffusion_zone(
+    api_client, search_cache, django_capture_on_commit_callbacks
+):
+    city = baker.make("City", department="31", region="76")
+    other_city = baker.make("City", department="75", region="11")
+    make_published_service(
+        diffusion_zone_type=AdminDivisionType.DEPARTMENT, diffusion_zone_details="31"
+    )
+    other_key = make_search_cache_key(other_city, {}, seed="2024-01-01")
+    key = make_search_cache_key(city, {}, seed="2024-01-01")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        make_published_service(
+            diffusion_zone_type=AdminDivisionType.DEPARTMENT,
+            diffusion_zone_details="31",
+        )
+    assert make_search_cache_key(other_city, {}, seed="2024-01-01") == other_key
+    assert make_search_cache_key(city, {}, seed="2024-01-01") != key
+
+    # les services diffusés sur la France entière invalident toutes les recherches
+    with django_capture_on_commit_callbacks(execute=True):
+        make_published_service(diffusion_zone_type=AdminDivisionType.COUNTRY)
+    assert make_search_cache_key(other_city, {}, seed="2024-01-01") != other_key
+
+
+def test_search_cache_key_uses_rounded_coordinates(api_client, search_cache):
+    city = baker.make("City")
+    make_published_service(diffusion_zone_type=AdminDivisionType.COUNTRY)
+    url = f"/search/?city={city.code}"
+    assert len(api_client.get(f"{url}&lat=43.60431&lon=1.44201").data["services"]) == 1
+
+    # recherche géolocalisée proche : la réponse en cache est utilisée
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(f"{url}&lat=43.60449&lon=1.44189")
+    assert len(response.data["services"]) == 1
+    assert not any('"services_service"' in q["sql"] for q in queries)
+
+
+def test_search_cache_disabled(api_client, settings):
+    settings.SEARCH_CACHE_TTL_SECONDS = 0
+    city = baker.make("City")
+
+    # pas d'accès aux versions des zones de diffusion si le cache est désactivé
+    with mock.patch("dora.services.search_cache.cache") as mock_cache:
+        assert api_client.get(f"/search/?city={city.code}").status_code == 200
+    mock_cache.get_many.assert_not_called()
+    mock_cache.get.assert_not_called()
+
+
+def test_search_cache_expires_at_seed_rollover(settings):
+    settings.SEARCH_CACHE_TTL_SECONDS = 60 * 60
+    with freeze_time("2024-01-01 23:50:00"):
+        assert _get_timeout() == 10 * 60
+    with freeze_time("2024-01-01 12:00:00"):
+        assert _get_timeout() == 60 * 60
@@ -1,14 +1,22 @@
+from collections import defaultdict
 from datetime import timedelta
 from io import StringIO
 
 from django.core import mail
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from freezegun import freeze_time
+from model_bakery import baker
 from rest_framework.test import APITestCase
 
 from dora.core.test_utils import make_service, make_structure, make_user
 from dora.services.enums import ServiceStatus
+from dora.services.management.commands.send_services_reminders import (
+    store_users_to_notify,
+)
+from dora.services.models import Service
 
 
 class ServicesNotificationsTestCase(APITestCase):
@@ -221,3 +229,45 @@ class ServicesNotificationsTestCase(APITestCase):
             )
         self.call_command()
         self.assertEqual(len(mail.outbox), 0)
+
+    ##########
+    # Requêtes
+    ##########
+
+    def make_old_drafts(self, count):
+        for _ in range(count):
+            structure = make_structure()
+            make_user(structure, is_admin=True)
+            with freeze_time(timezone.now() - timedelta(days=8)):
+                service = make_service(
+                    structure=structure,
+                    status=ServiceStatus.DRAFT,
+                    creator=make_user(structure),
+                    last_editor=make_user(structure),
+                    contact_email=make_user(structure).email,
+                )
+            baker.make(
+                "ServiceModificationHistoryItem",
+                service=service,
+                user=make_user(structure),
+                fields=["name"],
+            )
+
+    def count_recipients_queries(self):
+        users = defaultdict(lambda: defaultdict(set))
+        with CaptureQueriesContext(connection) as queries:
+            store_users_to_notify(
+                Service.objects.filter(status=ServiceStatus.DRAFT), users, "draft"
+            )
+        return len(queries), users
+
+    def test_recipients_queries_do_not_grow_with_services(self):
+        self.make_old_drafts(1)
+        num_queries, users = self.count_recipients_queries()
+        self.assertEqual(len(users), 5)
+
+        self.make_old_drafts(5)
+        self.assertEqual(num_queries, 1)
+        num_queries, users = self.count_recipients_queries()
+        self.assertEqual(num_queries, 1)
+        self.assertEqual(len(users), 30)
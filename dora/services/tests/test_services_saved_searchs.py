@@ -1,5 +1,6 @@
 from datetime import timedelta
 from io import StringIO
+from unittest import mock
 
 from django.core import mail
 from django.core.management import call_command
@@ -13,6 +14,7 @@ from dora.services.enums import ServiceStatus
 from dora.services.management.commands.send_saved_searches_notifications import (
     get_saved_search_notifications_to_send,
 )
+from dora.services.search import SearchResults, search_services
 
 from ..models import SavedSearch, SavedSearchFrequency
 
@@ -695,3 +697,164 @@ class ServiceSavedSearchNotificationTestCase(APITestCase):
 
         # ALORS je n'ai pas d'email
         self.assertEqual(len(mail.outbox), 0)
+
+    def test_saved_searches_with_same_filters_are_searched_once(self):
+        # ÉTANT DONNÉ deux utilisateurs avec une alerte sur les mêmes critères,
+        # notifiées à J-40 et J-15
+        for days in (40, 15):
+            baker.make(
+                "SavedSearch",
+                user=baker.make("users.User", is_valid=True),
+                frequency=SavedSearchFrequency.TWO_WEEKS,
+                city_label=SAVE_SEARCH_ARGS.get("city_label"),
+                city_code=SAVE_SEARCH_ARGS.get("city_code"),
+                last_notification_date=timezone.now() - timedelta(days=days),
+            )
+
+        # ET un service publié à J-20
+        make_service(
+            name=self.service_name,
+            status=ServiceStatus.PUBLISHED,
+            diffusion_zone_type=AdminDivisionType.CITY,
+            publication_date=timezone.now() - timedelta(days=20),
+            diffusion_zone_details=SAVE_SEARCH_ARGS.get("city_code"),
+        )
+
+        # QUAND j'envoie les notifications
+        with mock.patch(
+            "dora.services.saved_searches.search_services", wraps=search_services
+        ) as search_mock:
+            self.call_command()
+
+        # ALORS une seule recherche est effectuée
+        self.assertEqual(search_mock.call_count, 1)
+        # ET seule l'alerte notifiée avant la publication du service envoie un e-mail
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            SavedSearch.objects.filter(
+                last_notification_date=timezone.localdate()
+            ).count(),
+            2,
+        )
+
+    def test_saved_searches_are_postponed_when_di_results_are_degraded(self):
+        # ÉTANT DONNÉ une alerte notifiée à J-40
+        saved_search = baker.make(
+            "SavedSearch",
+            user=baker.make("users.User", is_valid=True),
+            frequency=SavedSearchFrequency.MONTHLY,
+            city_label=SAVE_SEARCH_ARGS.get("city_label"),
+            city_code=SAVE_SEARCH_ARGS.get("city_code"),
+            last_notification_date=timezone.now() - timedelta(days=40),
+        )
+        saved_search.refresh_from_db()
+        last_notification_date = saved_search.last_notification_date
+
+        # ET un service publié à J-20
+        make_service(
+            name=self.service_name,
+            status=ServiceStatus.PUBLISHED,
+            diffusion_zone_type=AdminDivisionType.CITY,
+            publication_date=timezone.now() - timedelta(days=20),
+            diffusion_zone_details=SAVE_SEARCH_ARGS.get("city_code"),
+        )
+
+        # QUAND j'envoie les notifications alors que d·i est en erreur
+        def degraded_search_services(*args, **kwargs):
+            # les alertes attendent d·i sans l'échéance de la recherche interactive
+            self.assertTrue(kwargs["wait_for_di"])
+            return SearchResults(search_services(*args, **kwargs).services, True)
+
+        with mock.patch(
+            "dora.services.saved_searches.search_services",
+            side_effect=degraded_search_services,
+        ):
+            self.call_command()
+
+        # ALORS aucune alerte partielle n'est envoyée, et l'alerte est reportée
+        self.assertEqual(len(mail.outbox), 0)
+        saved_search.refresh_from_db()
+        self.assertEqual(saved_search.last_notification_date, last_notification_date)
+
+        # QUAND d·i est de nouveau disponible
+        self.call_command()
+
+        # ALORS l'alerte est envoyée
+        self.assertEqual(len(mail.outbox), 1)
+        saved_search.refresh_from_db()
+        self.assertEqual(saved_search.last_notification_date, timezone.localdate())
+
+
+class SavedSearchNewServicesCountTestCase(APITestCase):
+    def setUp(self):
+        baker.make(Department, code="58", name="Nièvre")
+        baker.make(City, code="58211", name="Poil")
+        self.user = baker.make("users.User", is_valid=True)
+        self.saved_search = baker.make(
+            "SavedSearch",
+            user=self.user,
+            city_label=SAVE_SEARCH_ARGS.get("city_label"),
+            city_code=SAVE_SEARCH_ARGS.get("city_code"),
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def publish_service(self):
+        return make_service(
+            status=ServiceStatus.PUBLISHED,
+            diffusion_zone_type=AdminDivisionType.CITY,
+            publication_date=timezone.now() - timedelta(days=2),
+            diffusion_zone_details=SAVE_SEARCH_ARGS.get("city_code"),
+        )
+
+    def list_saved_searches(self):
+        with mock.patch(
+            "dora.services.saved_searches.search_services", wraps=search_services
+        ) as search_mock:
+            response = self.client.get("/saved-searches/")
+        self.assertEqual(response.status_code, 200)
+        return response.data[0]["new_services_count"], search_mock.call_count
+
+    def test_count_is_computed_once_a_day(self):
+        self.publish_service()
+
+        # le nombre n'a pas encore été calculé : une recherche est effectuée
+        self.assertEqual(self.list_saved_searches(), (1, 1))
+        # puis il est lu directement
+        self.assertEqual(self.list_saved_searches(), (1, 0))
+
+    def test_count_is_refreshed_on_publication(self):
+        call_command("refresh_saved_searches_counts", stdout=StringIO())
+        self.assertEqual(self.list_saved_searches(), (0, 0))
+
+        # un service est publié sur la commune de l'alerte
+        with self.captureOnCommitCallbacks(execute=True):
+            self.publish_service()
+        self.saved_search.refresh_from_db()
+        self.assertIsNone(self.saved_search.new_services_count_date)
+
+        self.assertEqual(self.list_saved_searches(), (1, 1))
+
+    def test_arrondissement_count_is_refreshed_on_publication(self):
+        saved_search = baker.make(
+            "SavedSearch",
+            user=self.user,
+            city_label="Paris 12e Arrondissement (75)",
+            city_code="75112",
+        )
+        SavedSearch.objects.update(
+            new_services_count=0, new_services_count_date=timezone.localdate()
+        )
+
+        # un service est publié sur la commune de Paris
+        with self.captureOnCommitCallbacks(execute=True):
+            make_service(
+                status=ServiceStatus.PUBLISHED,
+                diffusion_zone_type=AdminDivisionType.CITY,
+                diffusion_zone_details="75056",
+            )
+
+        saved_search.refresh_from_db()
+        self.assertIsNone(saved_search.new_services_count_date)
+        # les alertes des autres communes ne sont pas concernées
+        self.saved_search.refresh_from_db()
+        self.assertIsNotNone(self.saved_search.new_services_count_date)
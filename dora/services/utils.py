@@ -1,15 +1,17 @@
 import hashlib
 
 from django.contrib.gis.geos import Point
+from django.contrib.postgres.expressions import ArraySubquery
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
-from dora.admin_express.models import EPCI, AdminDivisionType, City, Department, Region
+from dora.admin_express.models import AdminDivisionType, City, Department, Region
 from dora.admin_express.utils import arrdt_to_main_insee_code
 from dora.core.constants import WGS84
 from dora.core.models import ModerationStatus
 from dora.services.enums import ServiceStatus
+from dora.services.models import Service, get_diffusion_zone_city_codes
 
 SYNC_FIELDS = [
     "name",
@@ -133,86 +135,66 @@ def update_sync_checksum(service):
     return result
 
 
+def refresh_diffusion_city_codes(services=None):
+    """Recalcule les communes couvertes par la zone de diffusion des services.
+
+    À lancer après une mise à jour du référentiel géographique (Admin Express).
+    """
+    if services is None:
+        services = Service.objects.all()
+
+    services = services.exclude(
+        Q(diffusion_zone_type=AdminDivisionType.COUNTRY) | Q(diffusion_zone_details="")
+    ).only("id", "diffusion_zone_type", "diffusion_zone_details")
+
+    # une seule requête par zone de diffusion distincte
+    city_codes_by_zone = {}
+    to_update = []
+    for service in services.iterator(chunk_size=1000):
+        zone = (service.diffusion_zone_type, service.diffusion_zone_details)
+        if zone not in city_codes_by_zone:
+            city_codes_by_zone[zone] = get_diffusion_zone_city_codes(*zone)
+        service.diffusion_city_codes = city_codes_by_zone[zone]
+        to_update.append(service)
+
+    Service.objects.bulk_update(to_update, ["diffusion_city_codes"], batch_size=1000)
+    return len(to_update)
+
+
 def filter_services_by_city_code(services, city_code):
     # Si la requete entrante contient un code insee d'arrondissement
     # on le converti pour récupérer le code de la commune entière
     city_code = arrdt_to_main_insee_code(city_code)
     city = get_object_or_404(City, pk=city_code)
 
+    # voir `Service.diffusion_city_codes` (index GIN)
     return services.filter(
         Q(diffusion_zone_type=AdminDivisionType.COUNTRY)
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.CITY)
-            & Q(diffusion_zone_details=city.code)
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.EPCI)
-            & Q(diffusion_zone_details__in=city.epcis)
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.DEPARTMENT)
-            & Q(diffusion_zone_details=city.department)
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.REGION)
-            & Q(diffusion_zone_details=city.region)
-        )
+        | Q(diffusion_city_codes__contains=[city.code])
     )
 
 
 def filter_services_by_department(services, dept_code):
-    department = get_object_or_404(Department, pk=dept_code)
+    get_object_or_404(Department, pk=dept_code)
 
     return services.filter(
         Q(diffusion_zone_type=AdminDivisionType.COUNTRY)
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.CITY)
-            & Q(diffusion_zone_details__in=City.objects.filter(department=dept_code))
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.EPCI)
-            & Q(
-                diffusion_zone_details__in=EPCI.objects.filter(
-                    departments__contains=[dept_code]
-                )
+        | Q(
+            diffusion_city_codes__overlap=ArraySubquery(
+                City.objects.filter(department=dept_code).values("code")
             )
         )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.DEPARTMENT)
-            & Q(diffusion_zone_details=department.code)
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.REGION)
-            & Q(diffusion_zone_details=department.region)
-        )
     )
 
 
 def filter_services_by_region(services, region_code):
-    region = get_object_or_404(Region, pk=region_code)
+    get_object_or_404(Region, pk=region_code)
 
     return services.filter(
         Q(diffusion_zone_type=AdminDivisionType.COUNTRY)
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.CITY)
-            & Q(diffusion_zone_details__in=City.objects.filter(region=region_code))
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.EPCI)
-            & Q(
-                diffusion_zone_details__in=EPCI.objects.filter(
-                    regions__contains=[region_code]
-                )
-            )
-        )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.DEPARTMENT)
-            & Q(
-                diffusion_zone_details__in=Department.objects.filter(region=region_code)
+        | Q(
+            diffusion_city_codes__overlap=ArraySubquery(
+                City.objects.filter(region=region_code).values("code")
             )
         )
-        | (
-            Q(diffusion_zone_type=AdminDivisionType.REGION)
-            & Q(diffusion_zone_details=region.code)
-        )
     )
@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import date, timedelta
 from operator import itemgetter
 
 import requests
@@ -7,6 +7,7 @@ from django.db.models import Q
 from django.http.response import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.utils.timezone import now
 from rest_framework import (
     exceptions,
@@ -31,29 +32,23 @@ from dora.core.utils import TRUTHY_VALUES
 from dora.services.emails import send_service_feedback_email, send_service_sharing_email
 from dora.services.enums import ServiceStatus
 from dora.services.models import (
-    AccessCondition,
-    AdminDivisionType,
-    BeneficiaryAccessMode,
     Bookmark,
-    CoachOrientationMode,
-    ConcernedPublic,
-    Credential,
-    LocationKind,
-    Requirement,
     SavedSearch,
     Service,
-    ServiceCategory,
-    ServiceFee,
-    ServiceKind,
     ServiceModel,
     ServiceModificationHistoryItem,
     ServiceStatusHistoryItem,
-    ServiceSubCategory,
 )
 from dora.services.utils import synchronize_service_from_model
-from dora.stats.models import DeploymentLevel, DeploymentState
 from dora.structures.models import Structure, StructureMember
 
+from .options import get_options
+from .search_cache import (
+    get_cached_search,
+    make_search_cache_key,
+    round_coordinate,
+    set_cached_search,
+)
 from .serializers import (
     AnonymousServiceSerializer,
     BookmarkSerializer,
@@ -101,6 +96,7 @@ def get_visible_services(user):
         Service.objects.all()
         .select_related(
             "structure",
+            "model",
         )
         .prefetch_related(
             "kinds",
@@ -218,6 +214,8 @@ class ServiceViewSet(
             publication_date=pub_date,
             modification_date=timezone.now(),
         )
+        # les relations M2M sont enregistrées après le service
+        service.invalidate_search_cache()
 
         if service.status == ServiceStatus.PUBLISHED:
             send_moderation_notification(
@@ -284,6 +282,8 @@ class ServiceViewSet(
             last_sync_checksum=last_sync_checksum,
             modification_date=timezone.now(),
         )
+        # les relations M2M sont enregistrées après le service
+        service.invalidate_search_cache()
 
         # Historique des statuts
         if status_before_update != service.status:
@@ -376,10 +376,49 @@ class BookmarkViewSet(
         visible_and_active_services = get_visible_services(user).exclude(
             status=ServiceStatus.ARCHIVED
         )
-        return Bookmark.objects.filter(
-            Q(service__isnull=True) | Q(service__in=visible_and_active_services),
-            user=user,
-        ).order_by("-creation_date")
+        return (
+            Bookmark.objects.filter(
+                Q(service__isnull=True) | Q(service__in=visible_and_active_services),
+                user=user,
+            )
+            .select_related("service__structure")
+            .order_by("-creation_date")
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        bookmarks = page if page is not None else list(queryset)
+
+        # Les services D·I de la page sont récupérés en une seule fois,
+        # plutôt qu'un appel à D·I par favori lors de la sérialisation.
+        context = self.get_serializer_context()
+        context["di_services"] = self._retrieve_di_services(bookmarks)
+        serializer = self.get_serializer(bookmarks, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def _retrieve_di_services(self, bookmarks) -> dict:
+        di_ids = [b.di_id for b in bookmarks if not b.service_id and b.di_id]
+        if not di_ids:
+            return {}
+
+        di_client = data_inclusion.di_client_factory()
+        if di_client is None:
+            return {}
+
+        try:
+            di_services = di_client.retrieve_services(
+                [tuple(di_id.split("--")) for di_id in di_ids]
+            )
+        except requests.ConnectionError:
+            return {}
+        return {
+            f"{source}--{id}": di_service
+            for (source, id), di_service in di_services.items()
+        }
 
     def create(self, request):
         slug = request.data.get("slug")
@@ -416,7 +455,12 @@ class SavedSearchViewSet(
 
     def get_queryset(self):
         user = self.request.user
-        return SavedSearch.objects.filter(user=user).order_by("-creation_date")
+        return (
+            SavedSearch.objects.filter(user=user)
+            .select_related("category")
+            .prefetch_related("subcategories", "kinds", "fees", "location_kinds")
+            .order_by("-creation_date")
+        )
 
     def get_serializer(self, *args, **kwargs):
         if self.action == "list":
@@ -572,145 +616,15 @@ class ModelViewSet(ServiceViewSet):
 @api_view()
 @permission_classes([permissions.AllowAny])
 def options(request):
-    class CustomChoiceSerializer(serializers.ModelSerializer):
-        value = serializers.IntegerField(source="id")
-        label = serializers.CharField(source="name")
-        structure = serializers.SlugRelatedField(slug_field="slug", read_only=True)
-
-        class Meta:
-            fields = ["value", "label", "structure"]
-
-    class AccessConditionSerializer(CustomChoiceSerializer):
-        class Meta(CustomChoiceSerializer.Meta):
-            model = AccessCondition
-
-    class ConcernedPublicSerializer(CustomChoiceSerializer):
-        class Meta(CustomChoiceSerializer.Meta):
-            model = ConcernedPublic
-
-    class RequirementSerializer(CustomChoiceSerializer):
-        class Meta(CustomChoiceSerializer.Meta):
-            model = Requirement
-
-    class CredentialSerializer(CustomChoiceSerializer):
-        class Meta(CustomChoiceSerializer.Meta):
-            model = Credential
-
-    class ServiceCategorySerializer(serializers.ModelSerializer):
-        class Meta:
-            model = ServiceCategory
-            fields = ["value", "label"]
-
-    class ServiceSubCategorySerializer(serializers.ModelSerializer):
-        class Meta:
-            model = ServiceSubCategory
-            fields = ["value", "label"]
-
-    class ServiceKindSerializer(serializers.ModelSerializer):
-        class Meta:
-            model = ServiceKind
-            fields = ["value", "label"]
-
-    class BeneficiaryAccessModeSerializer(serializers.ModelSerializer):
-        class Meta:
-            model = BeneficiaryAccessMode
-            fields = ["value", "label"]
-
-    class CoachOrientationModeSerializer(serializers.ModelSerializer):
-        class Meta:
-            model = CoachOrientationMode
-            fields = ["value", "label"]
-
-    class LocationKindSerializer(serializers.ModelSerializer):
-        class Meta:
-            model = LocationKind
-            fields = ["value", "label"]
-
-    class ServiceFeeSerializer(serializers.ModelSerializer):
-        class Meta:
-            model = ServiceFee
-            fields = ["value", "label"]
-
-    def filter_custom_choices(choices):
-        user = request.user
-        if user.is_staff:
-            return choices
-
-        filters = Q(structure_id=None)
-
-        if user.is_authenticated:
-            user_structures = StructureMember.objects.filter(user=user).values_list(
-                "structure_id", flat=True
-            )
-            filters |= Q(structure_id__in=user_structures)
-
-            if user.is_manager and user.departments:
-                manager_structures = Structure.objects.filter(
-                    department__in=user.departments
-                )
-                filters |= Q(structure__in=manager_structures)
-
-        return choices.filter(filters)
-
-    result = {
-        "categories": ServiceCategorySerializer(
-            ServiceCategory.objects.all(), many=True
-        ).data,
-        "subcategories": ServiceSubCategorySerializer(
-            ServiceSubCategory.objects.all(), many=True
-        ).data,
-        "kinds": ServiceKindSerializer(
-            ServiceKind.objects.all().order_by("label"), many=True
-        ).data,
-        "fee_conditions": ServiceFeeSerializer(
-            ServiceFee.objects.all(), many=True
-        ).data,
-        "beneficiaries_access_modes": BeneficiaryAccessModeSerializer(
-            BeneficiaryAccessMode.objects.all(), many=True
-        ).data,
-        "coach_orientation_modes": CoachOrientationModeSerializer(
-            CoachOrientationMode.objects.all(), many=True
-        ).data,
-        "location_kinds": LocationKindSerializer(
-            LocationKind.objects.all(), many=True
-        ).data,
-        "access_conditions": AccessConditionSerializer(
-            filter_custom_choices(
-                AccessCondition.objects.select_related("structure").all()
-            ),
-            many=True,
-            context={"request": request},
-        ).data,
-        "concerned_public": ConcernedPublicSerializer(
-            filter_custom_choices(
-                ConcernedPublic.objects.select_related("structure").all()
-            ),
-            many=True,
-            context={"request": request},
-        ).data,
-        "requirements": RequirementSerializer(
-            filter_custom_choices(
-                Requirement.objects.select_related("structure").all()
-            ),
-            many=True,
-            context={"request": request},
-        ).data,
-        "credentials": CredentialSerializer(
-            filter_custom_choices(Credential.objects.select_related("structure").all()),
-            many=True,
-            context={"request": request},
-        ).data,
-        "diffusion_zone_type": [
-            {"value": c[0], "label": c[1]} for c in AdminDivisionType.choices
-        ],
-        "deployment_departments": [
-            s["department_code"]
-            for s in DeploymentState.objects.filter(
-                state__in=[DeploymentLevel.IN_PROGRESS, DeploymentLevel.FINALIZING]
-            ).values()
-        ],
+    result, etag = get_options(request.user)
+    headers = {
+        "ETag": etag,
+        # réponse propre à l'utilisateur, à revalider à chaque utilisation
+        "Cache-Control": "private, no-cache",
     }
-    return Response(result)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(result, headers=headers)
 
 
 @api_view()
@@ -764,6 +678,9 @@ def share_di_service(
     return share_service(request, serialized_service, is_di=True)
 
 
+MAX_SEARCH_PAGE_SIZE = 100
+
+
 @api_view()
 @permission_classes([permissions.AllowAny])
 def search(request):
@@ -781,16 +698,70 @@ def search(request):
     kinds_list = kinds.split(",") if kinds is not None else None
     fees_list = fees.split(",") if fees is not None else None
     locs_list = locs.split(",") if locs is not None else None
-    lat = float(lat) if lat else None
-    lon = float(lon) if lon else None
-    from .search import search_services
+    lat = round_coordinate(float(lat)) if lat else None
+    lon = round_coordinate(float(lon)) if lon else None
+    from .search import search_services, search_services_page
 
     city_code = arrdt_to_main_insee_code(city_code)
     city = get_object_or_404(City, pk=city_code)
 
+    cache_key = make_search_cache_key(
+        city,
+        {
+            "categories": categories_list,
+            "subcategories": subcategories_list,
+            "kinds": kinds_list,
+            "fees": fees_list,
+            "location_kinds": locs_list,
+            "lat": lat,
+            "lon": lon,
+            "page_size": request.GET.get("page_size"),
+            "cursor": request.GET.get("cursor"),
+        },
+        seed=date.today().isoformat(),
+    )
+    if (response_data := get_cached_search(cache_key)) is not None:
+        return Response(response_data)
+
     di_client = data_inclusion.di_client_factory()
 
-    sorted_services = search_services(
+    # pagination optionnelle : si `page_size` est renseigné, le résultat est paginé
+    # (voir `OptionalPageNumberPagination`) et la page suivante est obtenue avec `cursor`
+    if page_size := request.GET.get("page_size"):
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            raise serializers.ValidationError("`page_size` doit être un entier")
+        if not 0 < page_size <= MAX_SEARCH_PAGE_SIZE:
+            raise serializers.ValidationError(
+                f"`page_size` doit être compris entre 1 et {MAX_SEARCH_PAGE_SIZE}"
+            )
+        try:
+            page = search_services_page(
+                request=request,
+                di_client=di_client,
+                city_code=city_code,
+                city=city,
+                page_size=page_size,
+                cursor=request.GET.get("cursor"),
+                categories=categories_list,
+                subcategories=subcategories_list,
+                kinds=kinds_list,
+                fees=fees_list,
+                location_kinds=locs_list,
+                lat=lat,
+                lon=lon,
+            )
+        except ValueError as err:
+            raise serializers.ValidationError(str(err))
+        di_degraded = page.pop("di_degraded")
+        response_data = {"city_bounds": city.geom.extent, **page}
+        # une réponse sans les résultats d·i n'est pas mise en cache
+        if not di_degraded:
+            set_cached_search(cache_key, response_data)
+        return Response(response_data)
+
+    sorted_services, di_degraded = search_services(
         request=request,
         di_client=di_client,
         city_code=city_code,
@@ -804,7 +775,10 @@ def search(request):
         lon=lon,
     )
 
-    return Response({"city_bounds": city.geom.extent, "services": sorted_services})
+    response_data = {"city_bounds": city.geom.extent, "services": sorted_services}
+    if not di_degraded:
+        set_cached_search(cache_key, response_data)
+    return Response(response_data)
 
 
 def share_service(request, service, is_di):
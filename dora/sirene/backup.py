@@ -1,8 +1,8 @@
 import random
+import time
+from typing import Callable, Iterable, Optional
 
-from django.db import connection, transaction
-
-from .models import Establishment
+from django.db import connection
 
 """
 Backup lors de l'import SIRENE:
@@ -96,21 +96,49 @@ def clean_tmp_tables(*tmp_tables):
             c.execute(f"DROP TABLE IF EXISTS {tmp_table}")
 
 
-def create_insert_statement(table_name: str) -> tuple[str, list[str]]:
-    fields = [f.name for f in Establishment._meta.fields]
-    stmt = f"INSERT INTO public.{table_name}({",".join(fields)}) VALUES({ ",".join(["%s"]*len(fields)) })"
-    return stmt, fields
-
-
-def add_establishment(stmt: str, e: Establishment, fields: list[str]):
-    # non-transactionnel
-    values = [getattr(e, f) for f in fields]
-    with connection.cursor() as c:
-        c.execute(stmt, values)
-
-
-@transaction.atomic
-def bulk_add_establishments(table_name: str, ee: list[Establishment]):
-    stmt, fields = create_insert_statement(table_name)
-    for e in ee:
-        add_establishment(stmt, e, fields)
+# colonnes de la table des établissements, dans l'ordre attendu par `copy_establishments`
+ESTABLISHMENT_COLUMNS = [
+    "siret",
+    "siren",
+    "ape",
+    "city_code",
+    "postal_code",
+    "is_siege",
+    "longitude",
+    "latitude",
+    "full_search_text",
+    "address1",
+    "address2",
+    "city",
+    "name",
+    "parent_name",
+]
+
+
+def copy_establishments(
+    table_name: str,
+    rows: Iterable[tuple],
+    progress: Optional[Callable[[int, float], None]] = None,
+    progress_every: int = 100_000,
+) -> int:
+    """Insère les établissements dans `table_name` via `COPY ... FROM STDIN`.
+
+    Les lignes sont des tuples de valeurs dans l'ordre de `ESTABLISHMENT_COLUMNS`,
+    transmises au fil de l'eau à PostgreSQL (aucune instance de modèle n'est créée).
+    `progress` est appelé tous les `progress_every` établissements
+    avec le nombre de lignes insérées et le temps écoulé (en secondes).
+
+    Retourne le nombre de lignes insérées.
+    """
+    stmt = f"COPY public.{table_name} ({", ".join(ESTABLISHMENT_COLUMNS)}) FROM STDIN"
+    num_rows = 0
+    start = time.monotonic()
+    with connection.cursor() as c, c.copy(stmt) as copy:
+        for row in rows:
+            copy.write_row(row)
+            num_rows += 1
+            if progress and num_rows % progress_every == 0:
+                progress(num_rows, time.monotonic() - start)
+    if progress:
+        progress(num_rows, time.monotonic() - start)
+    return num_rows
@@ -7,17 +7,15 @@ import tempfile
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.utils import DataError
 
 from dora.sirene.backup import (
-    bulk_add_establishments,
     clean_tmp_tables,
+    copy_establishments,
     create_indexes,
     create_table,
     rename_table,
     vacuum_analyze,
 )
-from dora.sirene.models import Establishment
 
 # Documentation des variables SIRENE : https://www.sirene.fr/static-resources/htm/v_sommaire.htm
 USE_TEMP_DIR = not settings.DEBUG
@@ -30,10 +28,6 @@ def clean_spaces(string):
     return string.replace("  ", " ").strip()
 
 
-def commit(rows):
-    bulk_add_establishments(TMP_TABLE, rows)
-
-
 class Command(BaseCommand):
     help = "Import de la dernière base SIRENE géolocalisée"
 
@@ -151,29 +145,35 @@ class Command(BaseCommand):
             f'{row["libelleCedexEtablissement"] or row["libelleCommuneEtablissement"]} {row["distributionSpecialeEtablissement"]}'
         )
 
-    def create_establishment(self, siren, parent_name, row):
+    def get_establishment_row(self, siren, parent_name, row) -> tuple:
+        # valeurs dans l'ordre de `ESTABLISHMENT_COLUMNS`
         name = self.get_name(row)[:255]
         parent_name = parent_name[:255]
         full_search_text = f"{name} {parent_name}" if name != parent_name else name
-        return Establishment(
-            siren=siren[:9],
-            siret=row["siret"][:14],
-            name=name,
-            parent_name=parent_name,
-            address1=self.get_address1(row)[:255],
-            address2=row["complementAdresseEtablissement"][:255],
-            city=self.get_city_name(row)[:255],
-            city_code=row["codeCommuneEtablissement"][:5],
-            postal_code=(
-                row["codeCedexEtablissement"] or row["codePostalEtablissement"]
-            )[:5],
-            ape=row["activitePrincipaleEtablissement"][:6],
-            is_siege=row["etablissementSiege"] == "true",
-            longitude=row["longitude"] if row["longitude"] else None,
-            latitude=row["latitude"] if row["latitude"] else None,
-            full_search_text=full_search_text,
+        return (
+            row["siret"][:14],
+            siren[:9],
+            row["activitePrincipaleEtablissement"][:6],
+            row["codeCommuneEtablissement"][:5],
+            (row["codeCedexEtablissement"] or row["codePostalEtablissement"])[:5],
+            row["etablissementSiege"] == "true",
+            row["longitude"] or None,
+            row["latitude"] or None,
+            full_search_text,
+            self.get_address1(row)[:255],
+            row["complementAdresseEtablissement"][:255],
+            self.get_city_name(row)[:255],
+            name,
+            parent_name,
         )
 
+    def iter_establishment_rows(self, reader, legal_units):
+        for row in reader:
+            siren = row["siren"]
+            # on ignore les établissements des unités légales fermées
+            if parent := legal_units.get(siren):
+                yield self.get_establishment_row(siren, parent, row)
+
     def handle(self, *args, **options):
         if options.get("activate"):
             # activation de la table temporaire (si existante),
@@ -247,7 +247,6 @@ class Command(BaseCommand):
                 num_establishments = 0
                 with open(estab_file) as f:
                     num_establishments = sum(1 for _ in f)
-                last_prog = 0
 
                 self.stdout.write(
                     self.style.NOTICE(f" > {num_establishments} établissements")
@@ -257,40 +256,29 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.NOTICE(" > import des établissements..."))
                 reader = csv.DictReader(establishment_file, delimiter=",")
 
+                def report_progress(num_rows, elapsed):
+                    prog = round(100 * reader.line_num / num_establishments)
+                    self.stdout.write(
+                        self.style.NOTICE(
+                            f"{prog}% done : {num_rows} établissements, "
+                            f"{round(num_rows / elapsed) if elapsed else 0} lignes/s"
+                        )
+                    )
+
                 with transaction.atomic(durable=True):
                     self.stdout.write(
                         self.style.WARNING(
                             " > insertion des données dans la table temporaire..."
                         )
                     )
-                    # Establishment.objects.all().delete()
-                    batch_size = 1_000
-                    rows = []
-                    for i, row in enumerate(reader):
-                        if (i % batch_size) == 0:
-                            prog = round(100 * i / num_establishments)
-                            if prog != last_prog:
-                                last_prog = prog
-                            self.stdout.write(self.style.NOTICE(f"{prog}% done"))
-                            commit(rows)
-                            rows = []
-                        try:
-                            siren = row["siren"]
-                            parent = legal_units.get(siren)
-                            if parent:
-                                rows.append(
-                                    self.create_establishment(
-                                        siren,
-                                        parent,
-                                        row,
-                                    )
-                                )
-
-                        except DataError as err:
-                            self.stdout.write(self.style.ERROR(err))
-                            self.stdout.write(self.style.ERROR(row))
-
-                    commit(rows)
+                    num_rows = copy_establishments(
+                        TMP_TABLE,
+                        self.iter_establishment_rows(reader, legal_units),
+                        progress=report_progress,
+                    )
+                    self.stdout.write(
+                        self.style.NOTICE(f" > {num_rows} établissements insérés")
+                    )
 
                 # recréation des indexes sur la table de travail
                 self.stdout.write(self.style.NOTICE(" > re-création des indexes"))
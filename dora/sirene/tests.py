@@ -0,0 +1,49 @@
+from django.db import connection
+
+from dora.sirene.backup import clean_tmp_tables, copy_establishments, create_table
+
+TMP_TABLE = "_sirene_establishment_test"
+
+
+def make_row(siret, **kwargs):
+    values = {
+        "siret": siret,
+        "siren": siret[:9],
+        "ape": "84.11Z",
+        "city_code": "31555",
+        "postal_code": "31000",
+        "is_siege": True,
+        "longitude": "1.44",
+        "latitude": None,
+        "full_search_text": "MAIRIE",
+        "address1": "1 place du Capitole",
+        "address2": "",
+        "city": "Toulouse",
+        "name": "MAIRIE",
+        "parent_name": "COMMUNE DE TOULOUSE",
+    } | kwargs
+    return tuple(values.values())
+
+
+def test_copy_establishments():
+    create_table(TMP_TABLE)
+    progress = []
+
+    num_rows = copy_establishments(
+        TMP_TABLE,
+        (make_row(f"2131055500{i:04d}", name=f"tab\tet\nretour {i}") for i in range(5)),
+        progress=lambda num_rows, elapsed: progress.append(num_rows),
+        progress_every=2,
+    )
+
+    assert num_rows == 5
+    assert progress == [2, 4, 5]
+    with connection.cursor() as c:
+        c.execute(
+            f"SELECT name, is_siege, longitude, latitude FROM {TMP_TABLE} ORDER BY siret"
+        )
+        rows = c.fetchall()
+    assert len(rows) == 5
+    assert rows[0] == ("tab\tet\nretour 0", True, 1.44, None)
+
+    clean_tmp_tables(TMP_TABLE)
@@ -0,0 +1,48 @@
+import json
+from functools import cache
+
+import redis
+from django.conf import settings
+
+"""
+Buffer des événements analytics :
+    Les événements envoyés par le front-end sont ajoutés à une liste Redis,
+    puis enregistrés par lots par la commande `drain_analytics_events`.
+    Les événements ne sont retirés de la liste qu'une fois enregistrés :
+    la commande ne doit donc pas être lancée plusieurs fois en parallèle.
+    Les événements ne pouvant pas être enregistrés sont déplacés dans une liste
+    distincte (`FAILED_EVENTS_KEY`), pour analyse ou rejeu.
+"""
+
+EVENTS_BUFFER_KEY = "stats:events"
+FAILED_EVENTS_KEY = "stats:events:failed"
+
+
+@cache
+def _get_client() -> redis.Redis:
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def push_event(payload: dict):
+    _get_client().rpush(EVENTS_BUFFER_KEY, json.dumps(payload))
+
+
+def peek_events(count: int) -> list[dict]:
+    # les plus anciens événements, sans les retirer du buffer
+    return [
+        json.loads(value)
+        for value in _get_client().lrange(EVENTS_BUFFER_KEY, 0, count - 1)
+    ]
+
+
+def ack_events(count: int):
+    # retire du buffer les `count` plus anciens événements
+    _get_client().ltrim(EVENTS_BUFFER_KEY, count, -1)
+
+
+def push_failed_events(payloads: list[dict]):
+    _get_client().rpush(FAILED_EVENTS_KEY, *(json.dumps(p) for p in payloads))
+
+
+def get_buffer_size() -> int:
+    return _get_client().llen(EVENTS_BUFFER_KEY)
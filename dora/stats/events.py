@@ -0,0 +1,457 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from dora.core.enum_registry import get_enum
+from dora.core.utils import code_insee_to_code_dept, get_object_or_none
+from dora.orientations.models import Orientation
+from dora.services.models import (
+    LocationKind,
+    Service,
+    ServiceCategory,
+    ServiceFee,
+    ServiceKind,
+    ServiceSubCategory,
+)
+from dora.structures.models import Structure, StructureMember
+from dora.users.models import User
+
+from .enums import Tag
+from .models import (
+    AbstractAnalyticsEvent,
+    DiMobilisationEvent,
+    DiServiceView,
+    MobilisationEvent,
+    OrientationView,
+    PageView,
+    SearchView,
+    ServiceShare,
+    ServiceView,
+    StructureInfosView,
+    StructureView,
+)
+
+logger = logging.getLogger(__name__)
+
+"""
+Événements analytics :
+    Construction des événements à partir des données envoyées par le front-end,
+    et enregistrement groupé (`bulk_create`) des événements et de leurs relations M2M.
+    Utilisé directement par `log_event`, ou de manière différée via le buffer d'événements
+    (voir `dora.stats.buffer` et la commande `drain_analytics_events`).
+"""
+
+# événement non-enregistré, et valeurs de ses relations M2M (clés primaires)
+Event = tuple[AbstractAnalyticsEvent, dict[str, list[int]]]
+
+
+class UnknownTagError(ValueError):
+    pass
+
+
+class InvalidEventError(ValueError):
+    pass
+
+
+# champs texte enregistrés tels quels, et leur longueur maximale en base
+STRING_FIELDS = {
+    "path": 255,
+    "title": 255,
+    "user_hash": 32,
+    "search_city_code": 5,
+    "di_structure_id": 255,
+    "di_structure_name": 255,
+    "di_structure_department": 3,
+    "di_service_id": 255,
+    "di_service_name": 255,
+    "di_source": 255,
+    "recipient_email": 254,
+    "recipient_kind": 30,
+    "external_link": 200,
+    "service": None,
+    "structure": None,
+}
+INTEGER_FIELDS = (
+    "search_id",
+    "orientation",
+    "search_num_results",
+    "num_di_results",
+    "num_di_results_top10",
+)
+LIST_FIELDS = (
+    "category_ids",
+    "sub_category_ids",
+    "kinds",
+    "fee_conditions",
+    "location_kinds",
+    "results_slugs_top10",
+    "di_categories",
+    "di_subcategories",
+)
+
+
+def validate_tag(tag: Optional[str]) -> Tag:
+    try:
+        return Tag(tag)
+    except ValueError:
+        raise UnknownTagError(f"Unknown analytics tag: {tag}")
+
+
+def validate_event_data(data: dict) -> Tag:
+    """Vérifie les données d'un événement avant son enregistrement (éventuellement différé).
+
+    Raises:
+        UnknownTagError: si le tag de l'événement est inconnu.
+        InvalidEventError: si une valeur ne pourrait pas être enregistrée.
+    """
+    tag = validate_tag(data.get("tag"))
+
+    if not isinstance(data.get("path"), str):
+        raise InvalidEventError("Missing path")
+    for field, max_length in STRING_FIELDS.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise InvalidEventError(f"Invalid {field}: {value!r}")
+        if max_length and len(value) > max_length:
+            raise InvalidEventError(f"{field} is too long")
+    for field in INTEGER_FIELDS:
+        value = data.get(field)
+        if value in (None, ""):
+            continue
+        if not str(value).isdigit():
+            raise InvalidEventError(f"Invalid {field}: {value!r}")
+    for field in LIST_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        if not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            raise InvalidEventError(f"Invalid {field}: {value!r}")
+
+    return tag
+
+
+def _get_categories(cats_values, subcats_values) -> tuple[list[int], list[int]]:
+    # On loggue également toutes les catégories des sous-catégories demandées
+    subcats_cats_values = set(subcat.split("--")[0] for subcat in subcats_values)
+
+    categories = get_enum(ServiceCategory).ids({*cats_values, *subcats_cats_values})
+
+    all_subcategories = get_enum(ServiceSubCategory)
+    subcategories = set(all_subcategories.ids(subcats_values))
+    for category_value in cats_values:
+        subcategories.update(
+            entry.id for entry in all_subcategories.with_prefix(category_value)
+        )
+
+    return categories, sorted(subcategories)
+
+
+def _get_service_categories(service) -> dict[str, list[int]]:
+    return {
+        "categories": list(service.categories.values_list("pk", flat=True)),
+        "subcategories": list(service.subcategories.values_list("pk", flat=True)),
+    }
+
+
+def _get_di_categories(data) -> dict[str, list[int]]:
+    categories, subcategories = _get_categories(
+        data.get("di_categories", []), data.get("di_subcategories", [])
+    )
+    return {"categories": categories, "subcategories": subcategories}
+
+
+def build_event(data: dict, user, date: datetime) -> Event:
+    """Construit un événement (non-enregistré) à partir des données du front-end.
+
+    Raises:
+        UnknownTagError: si le tag de l'événement est inconnu.
+    """
+    tag = validate_tag(data.get("tag"))
+    service_slug = data.get("service", "")
+    structure_slug = data.get("structure", "")
+    service = structure = orientation = None
+    orientation_id = data.get("orientation", "")
+
+    search_view = None
+    if search_view_id := data.get("search_id"):
+        try:
+            search_view = SearchView.objects.get(id=search_view_id)
+        except (SearchView.DoesNotExist, ValueError):
+            search_view = None
+
+    if orientation_id:
+        orientation = get_object_or_none(Orientation, id=orientation_id)
+        if orientation:
+            service = orientation.service
+            structure = orientation.service.structure if service else None
+    if not service and service_slug:
+        service = get_object_or_none(Service, slug=service_slug)
+        if service:
+            structure = service.structure
+    if not structure and structure_slug:
+        structure = get_object_or_none(Structure, slug=structure_slug)
+
+    common_analytics_data = {
+        "date": date,
+        "path": data.get("path"),
+        "user": user if user.is_authenticated else None,
+        "is_logged": user.is_authenticated,
+        "is_staff": user.is_staff,
+        "is_manager": user.is_manager if user.is_authenticated else False,
+        "is_an_admin": StructureMember.objects.filter(user=user, is_admin=True).exists()
+        if user.is_authenticated
+        else False,
+        "user_kind": user.main_activity if user.is_authenticated else "",
+        "anonymous_user_hash": data.get("user_hash", ""),
+    }
+
+    structure_membership = (
+        StructureMember.objects.filter(structure_id=structure.id, user=user).first()
+        if structure and user.is_authenticated
+        else None
+    )
+    structure_data = {
+        "structure": structure,
+        "is_structure_member": structure_membership is not None,
+        "is_structure_admin": structure_membership.is_admin
+        if structure_membership
+        else False,
+        "structure_department": structure.department if structure else "",
+        "structure_city_code": structure.city_code if structure else "",
+        "structure_source": structure.source.value
+        if structure and structure.source
+        else "",
+    }
+
+    service_data = {
+        "service": service,
+        "update_status": service.get_update_status() if service else "",
+        "status": service.status if service else "",
+        "service_source": service.source.value if service and service.source else "",
+        "search_view": search_view,
+    }
+
+    di_service_data = {
+        "structure_id": data.get("di_structure_id", ""),
+        "structure_name": data.get("di_structure_name", ""),
+        "structure_department": data.get("di_structure_department", ""),
+        "service_id": data.get("di_service_id", ""),
+        "service_name": data.get("di_service_name", ""),
+        "source": data.get("di_source", ""),
+        "search_view": search_view,
+    }
+
+    m2m = {}
+
+    match tag:
+        case Tag.PAGEVIEW:
+            event = PageView(
+                **common_analytics_data,
+                title=data.get("title", ""),
+            )
+
+        case Tag.SEARCH:
+            city_code = data.get("search_city_code", "")
+            department = code_insee_to_code_dept(city_code) if city_code else ""
+            num_results = int(data.get("search_num_results", "0"))
+            num_di_results = int(data.get("num_di_results", "0"))
+            num_di_results_top10 = int(data.get("num_di_results_top10", "0"))
+            kinds = data.get("kinds", [])
+            fee_conditions = data.get("fee_conditions")
+            location_kinds = data.get("location_kinds")
+            results_slugs_top10 = data.get("results_slugs_top10", [])
+            event = SearchView(
+                **common_analytics_data,
+                city_code=city_code,
+                department=department,
+                num_results=num_results,
+                num_di_results=num_di_results,
+                num_di_results_top10=num_di_results_top10,
+                results_slugs_top10=results_slugs_top10,
+            )
+            categories, subcategories = _get_categories(
+                data.get("category_ids", []), data.get("sub_category_ids", [])
+            )
+            m2m = {
+                "categories": categories,
+                "subcategories": subcategories,
+                "kinds": get_enum(ServiceKind).ids(kinds),
+                "fee_conditions": get_enum(ServiceFee).ids(fee_conditions),
+                "location_kinds": get_enum(LocationKind).ids(location_kinds),
+            }
+
+        case Tag.STRUCTURE:
+            event = StructureView(**common_analytics_data, **structure_data)
+
+        case Tag.STRUCTURE_INFOS:
+            event = StructureInfosView(**common_analytics_data, **structure_data)
+
+        case Tag.SERVICE:
+            event = ServiceView(
+                **common_analytics_data,
+                **structure_data,
+                **service_data,
+                is_orientable=service.is_orientable() is True,
+            )
+            m2m = _get_service_categories(service)
+
+        case Tag.DI_SERVICE:
+            event = DiServiceView(**common_analytics_data, **di_service_data)
+            m2m = _get_di_categories(data)
+
+        case Tag.ORIENTATION:
+            is_di = not service
+            event = OrientationView(
+                orientation=orientation,
+                orientation_status=orientation.status,
+                **common_analytics_data,
+                **structure_data,
+                **service_data,
+                is_di=is_di,
+                di_structure_name=data.get("di_structure_name", ""),
+                di_service_id=data.get("di_service_id", ""),
+                di_service_name=data.get("di_service_name", ""),
+            )
+            if not is_di:
+                m2m = _get_service_categories(service)
+
+        case Tag.SHARE:
+            recipient_email = data.get("recipient_email", "")
+            recipient_kind = data.get("recipient_kind", "")
+            is_di = not service
+            if is_di:
+                event = ServiceShare(
+                    recipient_email=recipient_email,
+                    recipient_kind=recipient_kind,
+                    is_structure_member=False,
+                    is_structure_admin=False,
+                    is_di=True,
+                    di_structure_name=data.get("di_structure_name", ""),
+                    di_service_id=data.get("di_service_id", ""),
+                    di_service_name=data.get("di_service_name", ""),
+                    structure_department=data.get("di_structure_department", ""),
+                    structure_source=data.get("di_source", ""),
+                    search_view=search_view,
+                    **common_analytics_data,
+                )
+                m2m = _get_di_categories(data)
+            else:
+                event = ServiceShare(
+                    recipient_email=recipient_email,
+                    recipient_kind=recipient_kind,
+                    is_di=False,
+                    **common_analytics_data,
+                    **structure_data,
+                    **service_data,
+                )
+                m2m = _get_service_categories(service)
+
+        case Tag.MOBILISATION:
+            event = MobilisationEvent(
+                external_link=data.get("external_link"),
+                **common_analytics_data,
+                **structure_data,
+                **service_data,
+            )
+            m2m = _get_service_categories(service)
+
+        case Tag.DI_MOBILISATION:
+            event = DiMobilisationEvent(
+                external_link=data.get("external_link"),
+                **common_analytics_data,
+                **di_service_data,
+            )
+            m2m = _get_di_categories(data)
+
+    return event, m2m
+
+
+@transaction.atomic
+def save_events(events: list[Event]):
+    """Enregistre les événements, groupés par type, ainsi que leurs relations M2M.
+
+    Une seule requête `INSERT` est faite par type d'événement
+    et par table de liaison M2M.
+    """
+    events_by_model = defaultdict(list)
+    for event, m2m in events:
+        events_by_model[type(event)].append((event, m2m))
+
+    for model, model_events in events_by_model.items():
+        model.objects.bulk_create([event for event, _ in model_events])
+
+        field_names = {field_name for _, m2m in model_events for field_name in m2m}
+        for field_name in field_names:
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source_attname = f"{field.m2m_field_name()}_id"
+            target_attname = f"{field.m2m_reverse_field_name()}_id"
+            through.objects.bulk_create(
+                [
+                    through(**{source_attname: event.pk, target_attname: value})
+                    for event, m2m in model_events
+                    for value in set(m2m.get(field_name, []))
+                ]
+            )
+
+
+def record_events(
+    payloads: list[dict],
+) -> tuple[list[AbstractAnalyticsEvent], list[dict]]:
+    """Construit et enregistre des événements à partir de données sérialisées.
+
+    Chaque élément contient les données du front-end (`data`),
+    l'identifiant de l'utilisateur (`user_id`) et la date de l'événement (`date`).
+    Si l'enregistrement groupé échoue, les événements sont enregistrés un par un.
+    Retourne les événements enregistrés, et les données des événements
+    n'ayant pas pu être construits ou enregistrés (loggués).
+    """
+    users = User.objects.in_bulk(
+        {payload["user_id"] for payload in payloads if payload.get("user_id")}
+    )
+
+    built, failed = [], []
+    for payload in payloads:
+        try:
+            event = build_event(
+                payload["data"],
+                users.get(payload.get("user_id")) or AnonymousUser(),
+                datetime.fromisoformat(payload["date"]),
+            )
+            built.append((payload, event))
+        except Exception:
+            logger.exception("Événement analytics invalide : %s", payload)
+            failed.append(payload)
+
+    try:
+        save_events([event for _, event in built])
+        saved = built
+    except DatabaseError:
+        saved = []
+        for payload, (event, m2m) in built:
+            # clé éventuellement affectée lors de l'enregistrement groupé annulé
+            event.pk = None
+            try:
+                save_events([(event, m2m)])
+                saved.append((payload, (event, m2m)))
+            except DatabaseError:
+                logger.exception("Événement analytics non enregistré : %s", payload)
+                failed.append(payload)
+
+    return [event for _, (event, _) in saved], failed
+
+
+def make_payload(data: dict, user, date: Optional[datetime] = None) -> dict:
+    # données sérialisables (JSON) d'un événement à enregistrer
+    return {
+        "data": dict(data),
+        "user_id": user.pk if user.is_authenticated else None,
+        "date": (date or timezone.now()).isoformat(),
+    }
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from dora.stats.buffer import (
+    ack_events,
+    get_buffer_size,
+    peek_events,
+    push_failed_events,
+)
+from dora.stats.events import record_events
+
+LOCK_KEY = "stats:drain-lock"
+LOCK_TIMEOUT = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Enregistre par lots les événements analytics en attente dans le buffer Redis"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Nombre d'événements enregistrés par lot",
+        )
+
+    def handle(self, *args, **options):
+        # une seule exécution à la fois (voir `dora.stats.buffer`)
+        if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+            self.stdout.write(self.style.WARNING("Enregistrement déjà en cours"))
+            return
+        try:
+            self.drain(options["batch_size"])
+        finally:
+            cache.delete(LOCK_KEY)
+
+    def drain(self, batch_size):
+        self.stdout.write(
+            self.style.NOTICE(f"{get_buffer_size()} événements en attente")
+        )
+
+        num_events = num_failed = 0
+        while payloads := peek_events(batch_size):
+            events, failed = record_events(payloads)
+            # les événements en erreur sont mis de côté : ils ne bloquent pas le buffer
+            if failed:
+                push_failed_events(failed)
+            # les événements ne sont retirés du buffer qu'une fois enregistrés
+            ack_events(len(payloads))
+            num_events += len(events)
+            num_failed += len(failed)
+            self.stdout.write(f" > {num_events} événements enregistrés")
+
+        self.stdout.write(self.style.SUCCESS(f"{num_events} événements enregistrés"))
+        if num_failed:
+            self.stdout.write(
+                self.style.WARNING(f"{num_failed} événements en erreur mis de côté")
+            )
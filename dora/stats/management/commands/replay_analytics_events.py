@@ -0,0 +1,36 @@
+import json
+from itertools import batched
+
+from django.core.management.base import BaseCommand
+
+from dora.stats.events import record_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Enregistre des événements analytics à partir d'un fichier JSON lines "
+        "(un événement par ligne, au format du buffer : `data`, `user_id`, `date`)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="fichier des événements à rejouer")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Nombre d'événements enregistrés par lot",
+        )
+
+    def handle(self, *args, **options):
+        num_events = num_lines = 0
+        with open(options["path"]) as f:
+            payloads = (json.loads(line) for line in f if line.strip())
+            for batch in batched(payloads, options["batch_size"]):
+                num_lines += len(batch)
+                events, _ = record_events(list(batch))
+                num_events += len(events)
+                self.stdout.write(f" > {num_events}/{num_lines} événements enregistrés")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{num_events}/{num_lines} événements enregistrés")
+        )
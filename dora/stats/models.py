@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.utils import timezone
 
 from dora.orientations.models import Orientation, OrientationStatus
 from dora.services.enums import ServiceStatus, ServiceUpdateStatus
@@ -40,6 +41,19 @@ class DeploymentState(models.Model):
     def __str__(self):
         return f"{self.department_name} ({self.department_code})"
 
+    def save(self, *args, **kwargs):
+        from dora.services.options import invalidate_options
+
+        super().save(*args, **kwargs)
+        invalidate_options()
+
+    def delete(self, *args, **kwargs):
+        from dora.services.options import invalidate_options
+
+        result = super().delete(*args, **kwargs)
+        invalidate_options()
+        return result
+
 
 #####################################################################################################
 # Analytics
@@ -53,7 +67,8 @@ class DeploymentState(models.Model):
 
 class AbstractAnalyticsEvent(models.Model):
     path = models.CharField(max_length=255)
-    date = models.DateTimeField(auto_now_add=True, db_index=True)
+    # pas de `auto_now_add` : la date des événements différés est celle de leur réception
+    date = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
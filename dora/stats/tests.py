@@ -0,0 +1,186 @@
+import json
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from freezegun import freeze_time
+from model_bakery import baker
+
+from dora.core.test_utils import make_published_service
+from dora.stats.buffer import (
+    EVENTS_BUFFER_KEY,
+    FAILED_EVENTS_KEY,
+    _get_client,
+    get_buffer_size,
+    push_event,
+)
+from dora.stats.events import make_payload
+from dora.stats.models import DiServiceView, PageView, SearchView, ServiceView
+
+
+@pytest.fixture
+def buffered_events(settings):
+    settings.STATS_BUFFERED_EVENTS = True
+    _get_client().delete(EVENTS_BUFFER_KEY, FAILED_EVENTS_KEY)
+    yield
+    _get_client().delete(EVENTS_BUFFER_KEY, FAILED_EVENTS_KEY)
+
+
+def test_log_unknown_event(api_client):
+    response = api_client.post("/stats/event/", {"tag": "inconnu"}, format="json")
+    assert response.status_code == 404
+
+
+def test_log_search_event(api_client):
+    cat = baker.make("ServiceCategory", value="cat1")
+    sub1 = baker.make("ServiceSubCategory", value="cat1--sub1")
+    sub2 = baker.make("ServiceSubCategory", value="cat1--sub2")
+    kind = baker.make("ServiceKind", value="kind1")
+
+    response = api_client.post(
+        "/stats/event/",
+        {
+            "tag": "search",
+            "path": "/recherche",
+            "search_city_code": "31555",
+            "search_num_results": "3",
+            "category_ids": ["cat1"],
+            "kinds": ["kind1"],
+            "fee_conditions": [],
+            "location_kinds": [],
+        },
+        format="json",
+    )
+
+    assert response.status_code == 201
+    event = SearchView.objects.get(pk=response.data["event"])
+    assert event.department == "31"
+    assert list(event.categories.all()) == [cat]
+    assert set(event.subcategories.all()) == {sub1, sub2}
+    assert list(event.kinds.all()) == [kind]
+
+
+def test_log_buffered_events(api_client, buffered_events):
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    service = make_published_service(categories="cat1", subcategories="cat1--sub1")
+
+    with freeze_time("2024-01-01 10:00:00"):
+        response = api_client.post(
+            "/stats/event/",
+            {"tag": "pageview", "path": "/", "title": "Accueil"},
+            format="json",
+        )
+        assert response.status_code == 202
+        response = api_client.post(
+            "/stats/event/",
+            {"tag": "service", "path": "/services", "service": service.slug},
+            format="json",
+        )
+        assert response.status_code == 202
+
+    assert get_buffer_size() == 2
+    assert not PageView.objects.exists()
+
+    call_command("drain_analytics_events", batch_size=1)
+
+    assert get_buffer_size() == 0
+    page_view = PageView.objects.get()
+    assert page_view.title == "Accueil"
+    # la date est celle de la réception de l'événement
+    assert page_view.date.isoformat() == "2024-01-01T10:00:00+00:00"
+
+    service_view = ServiceView.objects.get()
+    assert service_view.service == service
+    assert list(service_view.categories.values_list("value", flat=True)) == ["cat1"]
+    assert list(service_view.subcategories.values_list("value", flat=True)) == [
+        "cat1--sub1"
+    ]
+
+
+def test_drain_skips_invalid_events(api_client, buffered_events):
+    # un service inconnu ne doit pas bloquer l'enregistrement des autres événements
+    api_client.post(
+        "/stats/event/",
+        {"tag": "service", "path": "/services", "service": "inconnu"},
+        format="json",
+    )
+    api_client.post("/stats/event/", {"tag": "pageview", "path": "/"}, format="json")
+
+    call_command("drain_analytics_events")
+
+    assert get_buffer_size() == 0
+    assert PageView.objects.count() == 1
+    assert not ServiceView.objects.exists()
+
+
+def test_drain_sets_aside_events_failing_to_insert(buffered_events):
+    # événement accepté (ex. : données d'une version précédente), mais non enregistrable
+    push_event(make_payload({"tag": "pageview", "path": "/" * 300}, AnonymousUser()))
+    push_event(make_payload({"tag": "pageview", "path": "/"}, AnonymousUser()))
+
+    call_command("drain_analytics_events")
+
+    assert get_buffer_size() == 0
+    assert PageView.objects.get().path == "/"
+    [failed] = _get_client().lrange(FAILED_EVENTS_KEY, 0, -1)
+    assert json.loads(failed)["data"]["path"] == "/" * 300
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"tag": "pageview"},
+        {"tag": "pageview", "path": "/" * 300},
+        {"tag": "di_service", "path": "/", "search_id": "abc"},
+        {"tag": "di_service", "path": "/", "di_categories": "cat1"},
+    ],
+)
+def test_log_invalid_event(api_client, buffered_events, data):
+    response = api_client.post("/stats/event/", data, format="json")
+
+    assert response.status_code == 400
+    assert get_buffer_size() == 0
+
+
+def test_log_di_service_event_with_unknown_search(api_client, buffered_events):
+    response = api_client.post(
+        "/stats/event/",
+        {"tag": "di_service", "path": "/", "search_id": "999999"},
+        format="json",
+    )
+    assert response.status_code == 202
+
+    call_command("drain_analytics_events")
+
+    assert DiServiceView.objects.get().search_view is None
+
+
+def test_replay_events_with_few_queries(tmp_path, django_assert_max_num_queries):
+    baker.make("ServiceCategory", value="cat1")
+    baker.make("ServiceSubCategory", value="cat1--sub1")
+    baker.make("ServiceKind", value="kind1")
+    baker.make("LocationKind", value="a-distance")
+
+    events_file = tmp_path / "events.jsonl"
+    with open(events_file, "w") as f:
+        for i in range(20):
+            data = {
+                "tag": "di_service",
+                "path": f"/services/di--{i}",
+                "di_service_id": f"di--{i}",
+                "di_categories": ["cat1"],
+            }
+            f.write(json.dumps(make_payload(data, AnonymousUser())) + "\n")
+
+    # les valeurs des énumérations sont chargées une seule fois :
+    # le nombre de requêtes ne dépend pas du nombre d'événements
+    with django_assert_max_num_queries(10):
+        call_command("replay_analytics_events", events_file)
+
+    assert DiServiceView.objects.count() == 20
+    assert (
+        DiServiceView.categories.through.objects.count()
+        == DiServiceView.subcategories.through.objects.count()
+        == 20
+    )
@@ -4,9 +4,8 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.encoding import iri_to_uri
 from furl import furl
-from mjml import mjml2html
 
-from dora.core.emails import send_mail
+from dora.core.emails import render_mjml, send_mail
 
 
 def send_invitation_email(member, inviter_name):
@@ -27,7 +26,7 @@ def send_invitation_email(member, inviter_name):
         "with_legal_info": True,
         "with_dora_info": True,
     }
-    body = mjml2html(render_to_string("invitation.mjml", params))
+    body = render_mjml("invitation.mjml", params)
 
     send_mail(
         "[DORA] Votre invitation sur DORA",
@@ -60,7 +59,7 @@ def send_invitation_for_pe_members_email(member, inviter_name):
         "with_legal_info": True,
         "with_dora_info": True,
     }
-    body = mjml2html(render_to_string("invitation_pe.mjml", params))
+    body = render_mjml("invitation_pe.mjml", params)
 
     send_mail(
         f"Rejoignez la structure «{structure.name}» sur DORA",
@@ -185,7 +184,7 @@ def send_orphan_structure_notification(structure):
     send_mail(
         f"Votre structure n’a pas encore de membre actif sur DORA ({ structure.name})",
         structure.email,
-        mjml2html(render_to_string("notification-orphan-structure.mjml", context)),
+        render_mjml("notification-orphan-structure.mjml", context),
         from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
         tags=["notification"],
     )
@@ -205,9 +204,7 @@ def send_admin_invited_users_20_notification(structure, user):
         send_mail(
             "Invitation non acceptée : Action requise",
             admin.email,
-            mjml2html(
-                render_to_string("notification-invitation-stalled-20.mjml", context)
-            ),
+            render_mjml("notification-invitation-stalled-20.mjml", context),
             from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
             tags=["notification"],
         )
@@ -225,9 +222,7 @@ def send_admin_invited_users_90_notification(structure, user):
         send_mail(
             "Action requise : une de vos invitations sera bientôt désactivée",
             admin.email,
-            mjml2html(
-                render_to_string("notification-invitation-stalled-90.mjml", context)
-            ),
+            render_mjml("notification-invitation-stalled-90.mjml", context),
             from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
             tags=["notification"],
         )
@@ -259,9 +254,7 @@ def send_admin_self_invited_users_notification(structure, user):
         send_mail(
             "Rappel : Demande de rattachement en attente",
             admin.email,
-            mjml2html(
-                render_to_string("notification-self-invited-users.mjml", context)
-            ),
+            render_mjml("notification-self-invited-users.mjml", context),
             from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
             tags=["notification"],
         )
@@ -295,9 +288,7 @@ def send_structure_activation_notification(structure):
         send_mail(
             f"Votre structure n’a pas encore publié de service sur DORA ({ structure.name})",
             admin.email,
-            mjml2html(
-                render_to_string("notification-service-activation.mjml", context),
-            ),
+            render_mjml("notification-service-activation.mjml", context),
             from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
             tags=["notification"],
         )
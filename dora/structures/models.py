@@ -152,6 +152,16 @@ class StructureManager(models.Manager):
     def create_from_establishment(
         self, establishment, name="", parent=None, structure_id=None, **kwargs
     ):
+        structure = self.build_from_establishment(
+            establishment, name, parent, structure_id, **kwargs
+        )
+        structure.save()
+        return structure
+
+    def build_from_establishment(
+        self, establishment, name="", parent=None, structure_id=None, **kwargs
+    ):
+        # comme `create_from_establishment`, sans enregistrement (ex. : `bulk_create`)
         data = EstablishmentSerializer(establishment).data
         siret = data["siret"]
         structure = self.model(
@@ -171,7 +181,6 @@ class StructureManager(models.Manager):
         )
         if structure_id:
             structure.id = structure_id
-        structure.save()
         return structure
 
     def orphans(self):
@@ -233,34 +233,55 @@ class StructureAdminSerializer(StructureSerializer):
         logs = LogItem.objects.filter(structure=obj).order_by("-date")
         return LogItemSerializer(logs, many=True).data
 
+    # les valeurs du tableau de bord sont annotées par `StructureAdminViewSet`
+    # (voir `annotate_structures_for_admin`) : requêtes par structure sinon
+
+    def _admin_members(self, obj):
+        if hasattr(obj, "admin_members"):
+            return obj.admin_members
+        return obj.membership.filter(
+            is_admin=True, user__is_valid=True, user__is_active=True
+        ).select_related("user")
+
     def get_has_admin(self, obj):
+        if hasattr(obj, "admin_members"):
+            return bool(obj.admin_members)
         return obj.has_admin()
 
     def get_num_draft_services(self, obj):
+        if hasattr(obj, "num_draft_services"):
+            return obj.num_draft_services
         return obj.services.draft().count()
 
     def get_num_published_services(self, obj):
+        if hasattr(obj, "num_published_services"):
+            return obj.num_published_services
         return obj.services.published().count()
 
     def get_num_outdated_services(self, obj):
+        if hasattr(obj, "num_outdated_services"):
+            return obj.num_outdated_services
         return obj.services.update_advised().count()
 
     def get_num_services(self, obj):
+        if hasattr(obj, "num_services"):
+            return obj.num_services
         return obj.services.active().count()
 
     def get_categories(self, obj):
+        if hasattr(obj, "category_values"):
+            return obj.category_values
         return obj.services.values_list("categories__value", flat=True).distinct()
 
     def get_admins(self, obj):
-        admins = obj.membership.filter(
-            is_admin=True, user__is_valid=True, user__is_active=True
-        )
-        return [a.user.email for a in admins]
+        return [a.user.email for a in self._admin_members(obj)]
 
     def get_editors(self, obj):
+        if hasattr(obj, "editor_emails"):
+            return set(obj.editor_emails)
         return set(
             s.last_editor.email
-            for s in obj.services.published()
+            for s in obj.services.published().select_related("last_editor")
             if s.last_editor is not None
             and s.last_editor.email != settings.DORA_BOT_USER
         )
@@ -271,16 +292,21 @@ class StructureAdminSerializer(StructureSerializer):
         return []
 
     def get_admins_to_remind(self, obj):
-        if not obj.has_admin():
-            admins = obj.putative_membership.filter(
-                is_admin=True,
-                invited_by_admin=True,
-                user__is_active=True,
-            )
+        if not self.get_has_admin(obj):
+            if hasattr(obj, "putative_admins_to_remind"):
+                admins = obj.putative_admins_to_remind
+            else:
+                admins = obj.putative_membership.filter(
+                    is_admin=True,
+                    invited_by_admin=True,
+                    user__is_active=True,
+                ).select_related("user")
             return [a.user.email for a in admins]
         return []
 
     def get_num_potential_members_to_validate(self, obj):
+        if hasattr(obj, "num_potential_members_to_validate"):
+            return obj.num_potential_members_to_validate
         return obj.putative_membership.filter(
             invited_by_admin=False,
             user__is_valid=True,
@@ -288,6 +314,8 @@ class StructureAdminSerializer(StructureSerializer):
         ).count()
 
     def get_num_potential_members_to_remind(self, obj):
+        if hasattr(obj, "num_potential_members_to_remind"):
+            return obj.num_potential_members_to_remind
         # les membres invités n'ont pas forcément validé leur adresse e-mail
         return obj.putative_membership.filter(
             invited_by_admin=True,
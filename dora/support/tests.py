@@ -1,8 +1,12 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
 
-from dora.core.test_utils import make_service, make_structure
+from dora.core.test_utils import make_service, make_structure, make_user
 from dora.services.enums import ServiceStatus
+from dora.structures.models import Structure, StructurePutativeMember
+from dora.support.serializers import StructureAdminListSerializer
 
 
 class SupportTestCase(APITestCase):
@@ -202,3 +206,70 @@ class ManagerTestCase(APITestCase):
         self.client.force_authenticate(user=self.bimanager)
         response = self.client.get(f"/structures-admin/{structure.slug}/")
         self.assertEqual(response.status_code, 404)
+
+
+class StructureAdminListTestCase(APITestCase):
+    def setUp(self):
+        self.staff = baker.make("users.User", is_valid=True, is_staff=True)
+
+    def make_structures(self, count):
+        for _ in range(count):
+            structure = make_structure(user=make_user())
+            make_user(structure=structure, is_admin=True)
+            for status in (
+                ServiceStatus.DRAFT,
+                ServiceStatus.PUBLISHED,
+                ServiceStatus.ARCHIVED,
+            ):
+                make_service(
+                    structure=structure, status=status, last_editor=make_user()
+                )
+            for invited_by_admin in (True, False):
+                baker.make(
+                    StructurePutativeMember,
+                    structure=structure,
+                    user=make_user(),
+                    invited_by_admin=invited_by_admin,
+                    is_admin=True,
+                )
+
+    def get_structures_list(self):
+        self.client.force_authenticate(user=self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/structures-admin/")
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_structures_list_num_queries(self):
+        self.make_structures(2)
+        _, num_queries = self.get_structures_list()
+
+        self.make_structures(4)
+        data, num_queries_more = self.get_structures_list()
+
+        self.assertEqual(len(data), 6)
+        # nombre de requêtes indépendant du nombre de structures
+        self.assertEqual(num_queries, num_queries_more)
+
+    def test_structures_list_values(self):
+        self.make_structures(2)
+        data, _ = self.get_structures_list()
+
+        # mêmes valeurs que les requêtes faites pour chaque structure
+        request = APIRequestFactory().get("/structures-admin/")
+        request.user = self.staff
+        for item in data:
+            structure = Structure.objects.get(slug=item["slug"])
+            expected = StructureAdminListSerializer(
+                structure, context={"request": request}
+            ).data
+            for field, value in expected.items():
+                if field in ("categories", "editors"):
+                    self.assertCountEqual(item[field], value, field)
+                else:
+                    self.assertEqual(item[field], value, field)
+            self.assertEqual(item["num_services"], 2)
+            self.assertEqual(item["num_draft_services"], 1)
+            self.assertEqual(item["num_potential_members_to_validate"], 1)
+            self.assertEqual(item["num_potential_members_to_remind"], 1)
+            self.assertEqual(len(item["editors"]), 1)
@@ -1,3 +1,7 @@
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import mixins, permissions, serializers, viewsets
 from rest_framework.exceptions import PermissionDenied
 
@@ -7,7 +11,11 @@ from dora.core.pagination import OptionalPageNumberPagination
 from dora.core.utils import TRUTHY_VALUES
 from dora.services.enums import ServiceStatus
 from dora.services.models import Service
-from dora.structures.models import Structure
+from dora.structures.models import (
+    Structure,
+    StructureMember,
+    StructurePutativeMember,
+)
 from dora.support.serializers import (
     ServiceAdminListSerializer,
     ServiceAdminSerializer,
@@ -16,6 +24,73 @@ from dora.support.serializers import (
 )
 
 
+def _count(queryset):
+    # nombre d'éléments d'un queryset filtré sur la structure (`OuterRef`)
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values("structure")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def annotate_structures_for_admin(structures):
+    # valeurs du tableau de bord (voir `StructureAdminSerializer`) :
+    # calculées pour toutes les structures en une requête (et quelques prefetch),
+    # plutôt que par des requêtes pour chaque structure
+    def services(manager_method="all"):
+        # filtres de `ServiceManager` (services hors modèles)
+        return getattr(Service.objects, manager_method)().filter(
+            structure=OuterRef("pk")
+        )
+
+    putative_members = StructurePutativeMember.objects.filter(
+        structure=OuterRef("pk"), user__is_active=True
+    )
+    return structures.annotate(
+        num_draft_services=_count(services("draft")),
+        num_published_services=_count(services("published")),
+        num_outdated_services=_count(services("update_advised")),
+        num_services=_count(services("active")),
+        num_potential_members_to_validate=_count(
+            putative_members.filter(invited_by_admin=False, user__is_valid=True)
+        ),
+        num_potential_members_to_remind=_count(
+            putative_members.filter(invited_by_admin=True)
+        ),
+        category_values=ArraySubquery(
+            services().order_by().values("categories__value").distinct()
+        ),
+        editor_emails=ArraySubquery(
+            services("published")
+            .filter(last_editor__isnull=False)
+            .exclude(last_editor__email=settings.DORA_BOT_USER)
+            .order_by()
+            .values("last_editor__email")
+            .distinct()
+        ),
+    ).prefetch_related(
+        "national_labels",
+        Prefetch(
+            "membership",
+            queryset=StructureMember.objects.filter(
+                is_admin=True, user__is_valid=True, user__is_active=True
+            ).select_related("user"),
+            to_attr="admin_members",
+        ),
+        Prefetch(
+            "putative_membership",
+            queryset=StructurePutativeMember.objects.filter(
+                is_admin=True, invited_by_admin=True, user__is_active=True
+            ).select_related("user"),
+            to_attr="putative_admins_to_remind",
+        ),
+    )
+
+
 class StructureAdminPermission(permissions.BasePermission):
     def has_permission(self, request, view):
         user = request.user
@@ -71,15 +146,15 @@ class StructureAdminViewSet(
         user = self.request.user
         department = self.request.query_params.get("department")
 
-        structures = (
-            Structure.objects.all()
-            .prefetch_related(
+        structures = annotate_structures_for_admin(
+            Structure.objects.all().select_related("parent")
+        )
+        if self.action != "list":
+            structures = structures.prefetch_related(
                 "membership",
                 "putative_membership",
                 "services",
             )
-            .select_related("parent")
-        )
 
         if department:
             if user.is_manager:
@@ -1,12 +1,10 @@
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
-from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.encoding import iri_to_uri
 from furl import furl
-from mjml import mjml2html
 
-from dora.core.emails import send_mail
+from dora.core.emails import render_mjml, send_mail
 
 
 def send_invitation_reminder(user, structure, notification=False):
@@ -32,7 +30,7 @@ def send_invitation_reminder(user, structure, notification=False):
     send_mail(
         f"Rappel : Acceptez l'invitation à rejoindre {structure.name} sur DORA",
         user.email,
-        mjml2html(render_to_string("invitation_reminder.mjml", context)),
+        render_mjml("invitation_reminder.mjml", context),
         from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
         tags=["notification"],
     )
@@ -59,13 +57,11 @@ def send_user_without_structure_notification(user, deletion=False):
         if deletion
         else "Rappel : Identifiez votre structure sur DORA",
         user.email,
-        mjml2html(
-            render_to_string(
-                "notification_user_without_structure_deletion.mjml"
-                if deletion
-                else "notification_user_without_structure.mjml",
-                context,
-            )
+        render_mjml(
+            "notification_user_without_structure_deletion.mjml"
+            if deletion
+            else "notification_user_without_structure.mjml",
+            context,
         ),
         from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
         tags=["notification"],
@@ -90,7 +86,7 @@ def send_account_deletion_notification(user):
     send_mail(
         "DORA - Suppression prochaine de votre compte",
         user.email,
-        mjml2html(render_to_string("notification_account_deletion.mjml", context)),
+        render_mjml("notification_account_deletion.mjml", context),
         from_email=("La plateforme DORA", settings.NO_REPLY_EMAIL),
         tags=["notification"],
     )
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+echo "Enregistrement des événements analytics en attente"
+python /app/manage.py drain_analytics_events
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+echo "Journalisation des compteurs du cache d·i"
+python /app/manage.py log_di_cache_stats
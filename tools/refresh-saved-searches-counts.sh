@@ -0,0 +1,4 @@
+#!/bin/bash
+
+echo "Mise à jour du nombre de nouveaux services des recherches sauvegardées"
+python /app/manage.py refresh_saved_searches_counts